@@ -1,45 +1,269 @@
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, UploadFile, File, Form, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import ClientDisconnect
 from sqlalchemy.orm import Session
-from . import models, crud, db, config
-from .ml import model as ml_model
-import shutil
+from pydantic import BaseModel
+from typing import List, Optional
+from . import models, crud, db, config, tiles, encoding, export, storage, thumbnails, media, cache, partitions, ingest, resumable, idempotency, profiling, broadcast
+import asyncio
 import os
-import uuid
+import time
 from datetime import datetime
+from email.utils import formatdate
 from geoalchemy2.shape import to_shape
 
 app = FastAPI()
 
-# CORS
+# Worker roles: 'ingest' workers take every write (uploads, which load the ML model, and
+# status updates), 'read' workers serve the dashboard's reads and never import the ML
+# stack, 'all' does both
+ingest_routes = APIRouter()
+read_routes = APIRouter()
+
+if config.SERVES_READS:
+    # Mount uploads (original images)
+    app.mount("/uploads", media.ImageFiles(directory=config.UPLOAD_DIR, offload_prefix=media.offload_prefix("uploads")), name="uploads")
+
+    # Mount annotated images (YOLO boxed images)
+    app.mount("/annotated", media.ImageFiles(directory=config.ANNOTATED_DIR, offload_prefix=media.offload_prefix("annotated")), name="annotated")
+
+# Monthly partitions: create upcoming months at startup and then periodically
+def _maintain_partitions():
+    removed = partitions.maintain()
+    if removed:
+        # Reports left the table: drop everything derived from them
+        cache.reports.clear()
+        tiles.clear()
+
+@app.on_event("startup")
+async def start_partition_maintenance():
+    async def run():
+        while True:
+            try:
+                await run_in_threadpool(_maintain_partitions)
+            except Exception as e:
+                print(f"[PARTITIONS ERROR] Maintenance failed: {e}")
+            if config.PARTITION_MAINTENANCE_HOURS <= 0:
+                return
+            await asyncio.sleep(config.PARTITION_MAINTENANCE_HOURS * 3600)
+
+    app.state.partition_maintenance = asyncio.create_task(run())
+
+# Apply the report changes made by other worker processes to this one's caches
+@app.on_event("startup")
+async def start_change_polling():
+    if not config.CHANGE_BROADCAST:
+        return
+
+    async def run():
+        while True:
+            try:
+                await run_in_threadpool(broadcast.poll)
+            except Exception as e:
+                print(f"[BROADCAST ERROR] Polling for changes failed: {e}")
+            await asyncio.sleep(config.CHANGE_POLL_SECONDS)
+
+    app.state.change_polling = asyncio.create_task(run())
+
+# Drop resumable uploads that were abandoned before completing
+@ingest_routes.on_event("startup")
+async def start_resumable_gc():
+    async def run():
+        while config.RESUMABLE_GC_MINUTES > 0:
+            try:
+                await run_in_threadpool(resumable.collect_garbage)
+            except Exception as e:
+                print(f"[RESUMABLE ERROR] Garbage collection failed: {e}")
+            await asyncio.sleep(config.RESUMABLE_GC_MINUTES * 60)
+
+    app.state.resumable_gc = asyncio.create_task(run())
+
+def _ml_model():
+    """backend.ml.model, imported on first use: it pulls in ultralytics, torch and OpenCV"""
+    from .ml import model
+    return model
+
+# Load the model in the background so the worker serves requests while it loads
+@ingest_routes.on_event("startup")
+async def preload_ml_model():
+    if not config.ML_PRELOAD:
+        return
+
+    async def run():
+        try:
+            await run_in_threadpool(lambda: _ml_model().load_model())
+        except Exception as e:
+            print(f"[ML MODEL ERROR] Preload failed: {e}")
+
+    app.state.ml_preload = asyncio.create_task(run())
+
+# Dependency
+def get_db():
+    db_session = db.SessionLocal()
+    try:
+        yield db_session
+    finally:
+        db_session.close()
+
+# Retried uploads with the same Idempotency-Key replay the first response (registered
+# before stamp_writes so replays are stamped as writes too)
+@app.middleware("http")
+async def idempotent_uploads(request: Request, call_next):
+    return await idempotency.handle(request, call_next)
+
+# Read-your-writes: writes stamp the client, recent writers read from the primary.
+# Browsers (the dashboard) send the cookie back; other clients may echo the header.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+@app.middleware("http")
+async def stamp_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        stamp = f"{time.time():.3f}"
+        response.headers[LAST_WRITE_HEADER] = stamp
+        # Cross-site fetches only carry SameSite=None cookies, which browsers require to be Secure
+        secure = request.url.scheme == "https"
+        response.set_cookie(LAST_WRITE_COOKIE, stamp, max_age=max(int(config.READ_YOUR_WRITES_SECONDS), 1),
+                            secure=secure, samesite="none" if secure else "lax")
+    return response
+
+# On-demand profiling, registered after the others so it covers them
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    return await profiling.handle(request, call_next)
+
+# CORS, registered last so it is the outermost middleware: responses made by the
+# middlewares above (idempotent replays, their 409/422/503) get the CORS headers too
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], # Allow all for now
+    # Allow all for now. A regex rather than "*" so the origin is echoed back: the
+    # dashboard sends credentials (the last_write cookie), which "*" does not allow
+    allow_origin_regex=".*",
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER, idempotency.REPLAY_HEADER, profiling.ID_HEADER],
 )
 
-# Mount uploads (original images)
-app.mount("/uploads", StaticFiles(directory=config.UPLOAD_DIR), name="uploads")
-
-# Mount annotated images (YOLO boxed images)
-app.mount("/annotated", StaticFiles(directory=config.ANNOTATED_DIR), name="annotated")
+def _wrote_recently(request: Request):
+    stamp = request.headers.get(LAST_WRITE_HEADER.lower()) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        age = time.time() - float(stamp)
+    except (TypeError, ValueError):
+        return False
+    # A stamp from the future (or inf/nan) would pin the client to the primary forever
+    return 0 <= age < config.READ_YOUR_WRITES_SECONDS
 
-# Dependency
-def get_db():
-    db_session = db.SessionLocal()
+def get_read_db(request: Request):
+    """Session for GET endpoints: a read replica, or the primary for a client that just wrote"""
+    if _wrote_recently(request):
+        db_session = db.SessionLocal()
+        db_session.info["read_your_writes"] = True
+    else:
+        db_session = db.ReadSessionLocal()
     try:
         yield db_session
     finally:
         db_session.close()
 
+def cached_read(db_session: Session, key, loader, dependency=("all",)):
+    """Read through the report cache, except for read-your-writes requests"""
+    if db_session.info.get("read_your_writes"):
+        return loader()
+    return cache.reports.get_or_load(key, loader, dependency)
+
+def report_to_dict(r):
+    """Serialize a GarbageReport row for the API"""
+    point = to_shape(r.geom)
+    return {
+        "id": r.id,
+        "image_path": f"/uploads/{r.image_path}" if r.image_path else None,
+        "boxed_image_path": f"/annotated/{r.boxed_image_path}" if r.boxed_image_path else None,
+        "thumbnail_url": thumbnails.url_for("uploads", r.image_path),
+        "boxed_thumbnail_url": thumbnails.url_for("annotated", r.boxed_image_path),
+        "prediction": r.prediction,
+        "confidence": r.confidence,
+        "status": r.status,
+        "latitude": point.y,
+        "longitude": point.x,
+        "created_at": r.created_at,
+        "sighting_count": r.sighting_count,
+        "last_seen_at": r.last_seen_at
+    }
+
+VALID_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+
+def is_image_upload(file: UploadFile):
+    """Lenient check - image/* content type OR an image file extension"""
+    if file.content_type and file.content_type.startswith("image/"):
+        return True
+    if file.filename:
+        return any(file.filename.lower().endswith(ext) for ext in VALID_IMAGE_EXTENSIONS)
+    return False
+
+def save_upload(file: UploadFile):
+    """Save an uploaded image to the image store, returns (filename, file_path)"""
+    file_ext = file.filename.split(".")[-1] if file.filename and "." in file.filename else "jpg"
+    return storage.save_stream(file.file, config.UPLOAD_DIR, file_ext)
+
+def summarize_detections(all_detections):
+    """Returns (prediction, confidence, detections_json) for a list of detections"""
+    if not all_detections:
+        return "No Waste Detected", 0.0, None
+    
+    # Primary detection is the one with highest confidence
+    primary = all_detections[0]
+    detections_json = {
+        "count": len(all_detections),
+        "primary": {
+            "class": primary["class"],
+            "confidence": primary["confidence"],
+            "bbox": primary["bbox"]
+        },
+        "all": all_detections
+    }
+    return primary["class"], primary["confidence"], detections_json
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
-@app.post("/predict")
+@app.get("/admin/db-pool")
+def db_pool_stats():
+    """Connection pool statistics for the primary and read replicas"""
+    return db.pool_stats()
+
+@app.get("/admin/ingest")
+def ingest_stats():
+    """Group-commit writer statistics (queued reports, batches, average batch size)"""
+    return ingest.writer.stats()
+
+@app.get("/admin/cache")
+def cache_stats():
+    """Read cache statistics (entries, bytes, hits, misses, coalesced loads)"""
+    return cache.reports.stats()
+
+class ProfilingSettings(BaseModel):
+    enabled: Optional[bool] = None  # profile every request
+    sample_every: Optional[int] = None  # profile 1 in N requests, 0 = off
+    path_prefix: Optional[str] = None  # only profile matching paths, "" = all
+
+@app.get("/admin/profiling")
+def profiling_stats():
+    """Profiler settings, the last profiled request and the newest profile files"""
+    return {**profiling.profiler.stats(), "recent": profiling.profiler.recent()}
+
+@app.post("/admin/profiling")
+def configure_profiling(settings: ProfilingSettings, request: Request):
+    """Switch profiling of every request on or off, or change 1-in-N sampling (X-Profile-Token: PROFILE_TOKEN)"""
+    if not profiling.token_matches(request.headers.get(profiling.TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail=f"Set PROFILE_TOKEN and send it in {profiling.TOKEN_HEADER}")
+    return profiling.profiler.configure(settings.enabled, settings.sample_every, settings.path_prefix)
+
+@ingest_routes.post("/predict")
 async def predict_garbage(
     file: UploadFile = File(...),
     latitude: float = Form(...),
@@ -47,8 +271,7 @@ async def predict_garbage(
     category: str = Form(None),
     severity: int = Form(None),
     title: str = Form(None),
-    description: str = Form(None),
-    db: Session = Depends(get_db)
+    description: str = Form(None)
 ):
     """
     Endpoint for mobile app to upload image and get prediction
@@ -61,34 +284,16 @@ async def predict_garbage(
         print(f"[PREDICT] File content type: {file.content_type}")
         
         # More lenient validation - accept if content_type is image/* OR if filename has image extension
-        is_valid_image = False
-        
-        if file.content_type and file.content_type.startswith("image/"):
-            is_valid_image = True
-        elif file.filename:
-            # Check file extension
-            valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-            file_lower = file.filename.lower()
-            if any(file_lower.endswith(ext) for ext in valid_extensions):
-                is_valid_image = True
-        
-        if not is_valid_image:
+        if not is_image_upload(file):
             print(f"[PREDICT ERROR] Invalid file - content_type: {file.content_type}, filename: {file.filename}")
             raise HTTPException(status_code=400, detail="File must be an image")
         
         print(f"[PREDICT] File validation passed")
         
-        # Save file
-        file_ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-        filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}.{file_ext}"
-        file_path = os.path.join(config.UPLOAD_DIR, filename)
+        # Save file (content-addressed, identical photos are stored once)
+        filename, file_path = save_upload(file)
         
-        print(f"[PREDICT] Saving file to: {file_path}")
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        print(f"[PREDICT] File saved successfully")
+        print(f"[PREDICT] File saved to: {file_path}")
         
         # Run ML prediction with annotated image generation
         prediction = "pending"
@@ -99,31 +304,14 @@ async def predict_garbage(
         
         try:
             print(f"[PREDICT] Running ML prediction...")
-            all_detections, boxed_filename = ml_model.run_inference(file_path)
+            all_detections, boxed_filename = _ml_model().run_inference(file_path)
+            
+            prediction, confidence, detections_json = summarize_detections(all_detections)
             
             if all_detections:
-                # Primary detection is the one with highest confidence
-                primary = all_detections[0]
-                prediction = primary["class"]
-                confidence = primary["confidence"]
-                
                 print(f"[PREDICT] Primary prediction: {prediction}, Confidence: {confidence}")
                 print(f"[PREDICT] Total detections: {len(all_detections)}")
                 print(f"[PREDICT] Boxed image: {boxed_filename}")
-                
-                # Prepare detections JSON for database
-                detections_json = {
-                    "count": len(all_detections),
-                    "primary": {
-                        "class": prediction,
-                        "confidence": confidence,
-                        "bbox": all_detections[0]["bbox"]
-                    },
-                    "all": all_detections
-                }
-            else:
-                prediction = "No Waste Detected"
-                confidence = 0.0
             
         except Exception as e:
             print(f"[PREDICT WARNING] ML prediction failed: {str(e)}")
@@ -136,10 +324,23 @@ async def predict_garbage(
             detections_json = None
             boxed_filename = None
         
+        # Pre-render the dashboard renditions off the request path
+        thumbnails.schedule("uploads", filename)
+        thumbnails.schedule("annotated", boxed_filename)
+        
         # Create DB entry
         print(f"[PREDICT] Creating database entry...")
         try:
-            report = crud.create_garbage_report(db, filename, latitude, longitude, prediction, confidence, detections_json, boxed_filename)
+            # Shares a transaction with concurrent uploads, returns once committed
+            report = await run_in_threadpool(ingest.create_report, {
+                "image_path": filename,
+                "boxed_image_path": boxed_filename,
+                "lat": latitude,
+                "lon": longitude,
+                "prediction": prediction,
+                "confidence": confidence,
+                "detections": detections_json,
+            })
             print(f"[PREDICT] Database entry created")
             print(f"[PREDICT] Report object: {report}")
             print(f"[PREDICT] Report ID: {report.id}")
@@ -158,6 +359,8 @@ async def predict_garbage(
         response = {
             "success": True,
             "report_id": report.id,
+            "merged": report.merged,  # attached to an existing nearby report
+            "sighting_count": report.sighting_count,
             "prediction": prediction,
             "confidence": confidence,
             "image_path": f"/uploads/{filename}",
@@ -182,7 +385,7 @@ async def predict_garbage(
 
 
 
-@app.post("/upload-report")
+@ingest_routes.post("/upload-report")
 async def upload_report(
     file: UploadFile = File(...),
     latitude: float = Form(...),
@@ -190,8 +393,7 @@ async def upload_report(
     category: str = Form(None),
     severity: int = Form(None),
     title: str = Form(None),
-    description: str = Form(None),
-    db: Session = Depends(get_db)
+    description: str = Form(None)
 ):
     print(f"[UPLOAD-REPORT] Received request - lat: {latitude}, lon: {longitude}, file: {file.filename}")
     print(f"[UPLOAD-REPORT] Optional fields - category: {category}, severity: {severity}, title: {title}, description: {description}")
@@ -201,34 +403,16 @@ async def upload_report(
         print(f"[UPLOAD-REPORT] File content type: {file.content_type}")
         
         # More lenient validation - accept if content_type is image/* OR if filename has image extension
-        is_valid_image = False
-        
-        if file.content_type and file.content_type.startswith("image/"):
-            is_valid_image = True
-        elif file.filename:
-            # Check file extension
-            valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-            file_lower = file.filename.lower()
-            if any(file_lower.endswith(ext) for ext in valid_extensions):
-                is_valid_image = True
-        
-        if not is_valid_image:
+        if not is_image_upload(file):
             print(f"[UPLOAD-REPORT ERROR] Invalid file - content_type: {file.content_type}, filename: {file.filename}")
             raise HTTPException(status_code=400, detail="File must be an image")
         
         print(f"[UPLOAD-REPORT] File validation passed")
         
-        # Save file
-        file_ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-        filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}.{file_ext}"
-        file_path = os.path.join(config.UPLOAD_DIR, filename)
-        
-        print(f"[UPLOAD-REPORT] Saving file to: {file_path}")
+        # Save file (content-addressed, identical photos are stored once)
+        filename, file_path = save_upload(file)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        print(f"[UPLOAD-REPORT] File saved successfully")
+        print(f"[UPLOAD-REPORT] File saved to: {file_path}")
             
         # Run ML prediction with annotated image generation (same as /predict endpoint)
         prediction = "pending"
@@ -239,31 +423,14 @@ async def upload_report(
         
         try:
             print(f"[UPLOAD-REPORT] Running ML prediction...")
-            all_detections, boxed_filename = ml_model.run_inference(file_path)
+            all_detections, boxed_filename = _ml_model().run_inference(file_path)
+            
+            prediction, confidence, detections_json = summarize_detections(all_detections)
             
             if all_detections:
-                # Primary detection is the one with highest confidence
-                primary = all_detections[0]
-                prediction = primary["class"]
-                confidence = primary["confidence"]
-                
                 print(f"[UPLOAD-REPORT] Primary prediction: {prediction}, Confidence: {confidence}")
                 print(f"[UPLOAD-REPORT] Total detections: {len(all_detections)}")
                 print(f"[UPLOAD-REPORT] Boxed image: {boxed_filename}")
-                
-                # Prepare detections JSON for database
-                detections_json = {
-                    "count": len(all_detections),
-                    "primary": {
-                        "class": prediction,
-                        "confidence": confidence,
-                        "bbox": all_detections[0]["bbox"]
-                    },
-                    "all": all_detections
-                }
-            else:
-                prediction = "No Waste Detected"
-                confidence = 0.0
             
         except Exception as e:
             print(f"[UPLOAD-REPORT WARNING] ML prediction failed: {str(e)}")
@@ -276,9 +443,22 @@ async def upload_report(
             detections_json = None
             boxed_filename = None
         
+        # Pre-render the dashboard renditions off the request path
+        thumbnails.schedule("uploads", filename)
+        thumbnails.schedule("annotated", boxed_filename)
+        
         print(f"[UPLOAD-REPORT] Creating database entry...")
         try:
-            report = crud.create_garbage_report(db, filename, latitude, longitude, prediction, confidence, detections_json, boxed_filename)
+            # Shares a transaction with concurrent uploads, returns once committed
+            report = await run_in_threadpool(ingest.create_report, {
+                "image_path": filename,
+                "boxed_image_path": boxed_filename,
+                "lat": latitude,
+                "lon": longitude,
+                "prediction": prediction,
+                "confidence": confidence,
+                "detections": detections_json,
+            })
             print(f"[UPLOAD-REPORT] Database entry created")
             print(f"[UPLOAD-REPORT] Report object: {report}")
             print(f"[UPLOAD-REPORT] Report ID: {report.id}")
@@ -297,6 +477,8 @@ async def upload_report(
         response = {
             "success": True,
             "report_id": report.id,
+            "merged": report.merged,  # attached to an existing nearby report
+            "sighting_count": report.sighting_count,
             "prediction": prediction,
             "confidence": confidence,
             "image_path": f"/uploads/{filename}",
@@ -319,65 +501,378 @@ async def upload_report(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.get("/reports")
-def read_reports(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    reports = crud.get_reports(db, skip=skip, limit=limit)
-    results = []
-    for r in reports:
-        point = to_shape(r.geom)
-        results.append({
-            "id": r.id,
-            "image_path": f"/uploads/{r.image_path}" if r.image_path else None,
-            "boxed_image_path": f"/annotated/{r.boxed_image_path}" if r.boxed_image_path else None,
-            "prediction": r.prediction,
-            "confidence": r.confidence,
-            "status": r.status,
-            "latitude": point.y,
-            "longitude": point.x,
-            "created_at": r.created_at
+def _save_batch(files, results):
+    """Save the image uploads of a batch, recording errors in results; returns (index, filename, file_path)"""
+    saved = []
+    for index, file in enumerate(files):
+        if not is_image_upload(file):
+            results[index]["error"] = "File must be an image"
+            continue
+        try:
+            filename, file_path = save_upload(file)
+            saved.append((index, filename, file_path))
+        except Exception as e:
+            print(f"[BATCH-UPLOAD ERROR] Failed to save {file.filename}: {str(e)}")
+            results[index]["error"] = f"Failed to save file: {str(e)}"
+    return saved
+
+@ingest_routes.post("/upload-reports/batch")
+async def upload_reports_batch(
+    files: List[UploadFile] = File(...),
+    latitudes: List[float] = Form(...),
+    longitudes: List[float] = Form(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload many images in one multipart request
+    
+    files, latitudes and longitudes are parallel lists (repeat each form field
+    once per image). Images are classified as batches and all reports are
+    written in one transaction, merged into nearby incidents (and into each
+    other) like single uploads. Returns one result per image, in order.
+    """
+    print(f"[BATCH-UPLOAD] Received {len(files)} file(s)")
+    
+    if len(files) != len(latitudes) or len(files) != len(longitudes):
+        raise HTTPException(status_code=400, detail="files, latitudes and longitudes must have the same length")
+    if len(files) > config.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_UPLOAD_MAX_FILES} files per batch")
+    
+    results = [{"index": i, "filename": f.filename, "success": False} for i, f in enumerate(files)]
+    
+    # Validate and save (disk I/O, off the event loop)
+    saved = await run_in_threadpool(_save_batch, files, results)  # (index, filename, file_path)
+    
+    # Classify everything that was saved as real batches
+    try:
+        # The first call imports ultralytics/torch/cv2 when the model was not preloaded
+        ml_model = await run_in_threadpool(_ml_model)
+        outcomes = await run_in_threadpool(ml_model.run_inference_batch, [path for _, _, path in saved])
+    except Exception as e:
+        print(f"[BATCH-UPLOAD WARNING] ML prediction failed: {str(e)}")
+        outcomes = [e] * len(saved)
+    
+    items = []
+    for (index, filename, _), outcome in zip(saved, outcomes):
+        if isinstance(outcome, Exception):
+            # Same fallback as single uploads - keep the report as pending
+            all_detections, boxed_filename = [], None
+            prediction, confidence, detections_json = "pending", None, None
+        else:
+            all_detections, boxed_filename = outcome
+            prediction, confidence, detections_json = summarize_detections(all_detections)
+        
+        items.append({
+            "image_path": filename,
+            "boxed_image_path": boxed_filename,
+            "lat": latitudes[index],
+            "lon": longitudes[index],
+            "prediction": prediction,
+            "confidence": confidence,
+            "detections": detections_json,
         })
-    return results
+        results[index].update({
+            "prediction": prediction,
+            "confidence": confidence,
+            "image_path": f"/uploads/{filename}",
+            "boxed_image_path": f"/annotated/{boxed_filename}" if boxed_filename else None,
+            "detections": {
+                "count": len(all_detections),
+                "items": all_detections[:5]
+            } if all_detections else None
+        })
+    
+    for item in items:
+        thumbnails.schedule("uploads", item["image_path"])
+        thumbnails.schedule("annotated", item["boxed_image_path"])
+    
+    # One transaction for the whole batch, deduplicated like /upload-report
+    try:
+        ingested = await run_in_threadpool(crud.ingest_reports, db, items)
+    except Exception as db_error:
+        print(f"[BATCH-UPLOAD DB ERROR] {type(db_error).__name__}: {str(db_error)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(db_error)}")
+    
+    for (index, _, _), (report_id, sighting_count, merged) in zip(saved, ingested):
+        results[index].update(success=True, report_id=report_id, merged=merged, sighting_count=sighting_count)
+    
+    created = len(ingested)
+    merged = sum(1 for *_, was_merged in ingested if was_merged)
+    print(f"[BATCH-UPLOAD] Created {created} report(s) ({merged} merged), {len(files) - created} failed")
+    
+    return {
+        "success": created == len(files),
+        "count": len(files),
+        "created": created,
+        "merged": merged,
+        "failed": len(files) - created,
+        "results": results
+    }
 
-@app.get("/reports/{report_id}")
-def read_report(report_id: int, db: Session = Depends(get_db)):
-    r = crud.get_report(db, report_id)
-    if r is None:
-        raise HTTPException(status_code=404, detail="Report not found")
+# Resumable uploads (tus 1.0): create, PATCH chunks at the current offset, HEAD for the offset.
+# Upload-Metadata carries filename, latitude and longitude; the PATCH that completes
+# the upload classifies the image and answers with the same body as /upload-report.
+
+def _tus_headers(**headers):
+    return {"Tus-Resumable": resumable.TUS_VERSION, **headers}
+
+def _upload_http_error(e: resumable.UploadError):
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=_tus_headers())
+
+def _upload_state(upload_id: str):
+    try:
+        return resumable.get(upload_id)
+    except resumable.UploadError as e:
+        raise _upload_http_error(e)
+
+def _store_staged(upload_id: str, ext: str):
+    with open(resumable.data_path(upload_id), "rb") as f:
+        return storage.save_stream(f, config.UPLOAD_DIR, ext)
+
+async def _complete_upload(state):
+    """Classify a fully received upload and create its report, returns the /upload-report response"""
+    try:
+        return await _process_upload(state)
+    except Exception as e:
+        # Whatever went wrong, don't leave the upload in 'processing' forever
+        detail = e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {str(e)}"
+        print(f"[RESUMABLE ERROR] Upload {state['id']} failed: {detail}")
+        await run_in_threadpool(resumable.fail, state["id"], detail)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=detail, headers=_tus_headers())
+
+async def _process_upload(state):
+    upload_id = state["id"]
+    metadata = state["metadata"]
+    name = metadata.get("filename") or ""
+    filename, file_path = await run_in_threadpool(_store_staged, upload_id, name.rsplit(".", 1)[-1] if "." in name else "jpg")
     
-    point = to_shape(r.geom)
+    try:
+        all_detections, boxed_filename = await run_in_threadpool(_ml_model().run_inference, file_path)
+        prediction, confidence, detections_json = summarize_detections(all_detections)
+    except Exception as e:
+        print(f"[RESUMABLE WARNING] ML prediction failed: {str(e)}")
+        all_detections, boxed_filename = [], None
+        prediction, confidence, detections_json = "pending", None, None
+    
+    thumbnails.schedule("uploads", filename)
+    thumbnails.schedule("annotated", boxed_filename)
+    
+    try:
+        report = await run_in_threadpool(ingest.create_report, {
+            "image_path": filename,
+            "boxed_image_path": boxed_filename,
+            "lat": float(metadata["latitude"]),
+            "lon": float(metadata["longitude"]),
+            "prediction": prediction,
+            "confidence": confidence,
+            "detections": detections_json,
+        })
+    except Exception as db_error:
+        print(f"[RESUMABLE DB ERROR] {type(db_error).__name__}: {str(db_error)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(db_error)}", headers=_tus_headers())
     
+    response = {
+        "success": True,
+        "report_id": report.id,
+        "merged": report.merged,
+        "sighting_count": report.sighting_count,
+        "prediction": prediction,
+        "confidence": confidence,
+        "image_path": f"/uploads/{filename}",
+        "boxed_image_path": f"/annotated/{boxed_filename}" if boxed_filename else None,
+        "detections": {
+            "count": len(all_detections),
+            "items": all_detections[:5]
+        } if all_detections else None
+    }
+    await run_in_threadpool(resumable.finish, upload_id, response)
+    print(f"[RESUMABLE] Upload {upload_id} completed as report {report.id}")
+    return response
+
+@ingest_routes.options("/resumable-uploads")
+def resumable_upload_options():
+    return Response(status_code=204, headers=_tus_headers(**{
+        "Tus-Version": resumable.TUS_VERSION,
+        "Tus-Extension": resumable.TUS_EXTENSIONS,
+        "Tus-Max-Size": str(config.RESUMABLE_MAX_BYTES),
+    }))
+
+@ingest_routes.post("/resumable-uploads", status_code=201)
+def create_resumable_upload(request: Request):
+    """Start an upload: Upload-Length header and Upload-Metadata with filename, latitude, longitude"""
+    try:
+        length = int(request.headers.get("upload-length", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Length header is required", headers=_tus_headers())
+    try:
+        metadata = resumable.parse_metadata(request.headers.get("upload-metadata"))
+        float(metadata["latitude"]), float(metadata["longitude"])
+    except resumable.UploadError as e:
+        raise _upload_http_error(e)
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Upload-Metadata needs numeric latitude and longitude", headers=_tus_headers())
+    filename = metadata.get("filename") or ""
+    if "." in filename and not any(filename.lower().endswith(ext) for ext in VALID_IMAGE_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="File must be an image", headers=_tus_headers())
+    
+    try:
+        state = resumable.create(length, metadata)
+    except resumable.UploadError as e:
+        raise _upload_http_error(e)
+    print(f"[RESUMABLE] Created upload {state['id']} ({length} bytes)")
+    return Response(status_code=201, headers=_tus_headers(**{
+        "Location": f"/resumable-uploads/{state['id']}",
+        "Upload-Offset": "0",
+        "Upload-Expires": formatdate(state["expires_at"], usegmt=True),
+    }))
+
+@ingest_routes.head("/resumable-uploads/{upload_id}")
+def resumable_upload_offset(upload_id: str):
+    state = _upload_state(upload_id)
+    return Response(status_code=200, headers=_tus_headers(**{
+        "Upload-Offset": str(state["offset"]),
+        "Upload-Length": str(state["length"]),
+        "Upload-Expires": formatdate(state["expires_at"], usegmt=True),
+        "Cache-Control": "no-store",
+    }))
+
+@ingest_routes.get("/resumable-uploads/{upload_id}")
+def resumable_upload_status(upload_id: str):
+    """Progress and, once complete, the report created from the upload"""
+    state = _upload_state(upload_id)
     return {
-        "id": r.id,
-        "image_path": f"/uploads/{r.image_path}" if r.image_path else None,
-        "boxed_image_path": f"/annotated/{r.boxed_image_path}" if r.boxed_image_path else None,
-        "prediction": r.prediction,
-        "confidence": r.confidence,
-        "status": r.status,
-        "latitude": point.y,
-        "longitude": point.x,
-        "created_at": r.created_at
+        "id": state["id"],
+        "state": state["state"],
+        "offset": state["offset"],
+        "length": state["length"],
+        "result": state["result"],
     }
 
-@app.get("/reports-in-area")
-def read_reports_in_area(min_lon: float, min_lat: float, max_lon: float, max_lat: float, db: Session = Depends(get_db)):
-    reports = crud.get_reports_in_area(db, min_lon, min_lat, max_lon, max_lat)
+@ingest_routes.patch("/resumable-uploads/{upload_id}")
+async def append_resumable_upload(upload_id: str, request: Request):
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream", headers=_tus_headers())
+    try:
+        offset = int(request.headers.get("upload-offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required", headers=_tus_headers())
+    
+    state = _upload_state(upload_id)
+    if state["state"] != resumable.STATE_UPLOADING:
+        raise HTTPException(status_code=409, detail=f"Upload is already {state['state']}", headers=_tus_headers())
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and offset + int(content_length) > state["length"]:
+        raise HTTPException(status_code=413, detail="Chunk runs past Upload-Length", headers=_tus_headers())
+    
+    # Stream the body into the staging file: a dropped connection keeps the bytes received
+    disconnected = False
+    try:
+        appender = await run_in_threadpool(resumable.Appender, upload_id, offset)
+        try:
+            async for block in request.stream():
+                if block:
+                    await run_in_threadpool(appender.write, block)
+        except ClientDisconnect:
+            disconnected = True
+        finally:
+            state, completed = await run_in_threadpool(appender.close)
+    except resumable.UploadError as e:
+        raise _upload_http_error(e)
+    if disconnected:
+        print(f"[RESUMABLE] Upload {upload_id}: client disconnected at offset {state['offset']}")
+    
+    headers = _tus_headers(**{"Upload-Offset": str(state["offset"])})
+    if not completed:
+        return Response(status_code=204, headers=headers)
+    response = await _complete_upload(state)
+    return JSONResponse(response, headers=headers)
+
+@ingest_routes.delete("/resumable-uploads/{upload_id}", status_code=204)
+def delete_resumable_upload(upload_id: str):
+    try:
+        resumable.delete(upload_id)
+    except resumable.UploadError as e:
+        raise _upload_http_error(e)
+    return Response(status_code=204, headers=_tus_headers())
+
+@read_routes.get("/reports")
+def read_reports(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
+    results = cached_read(
+        db,
+        ("reports", skip, limit),
+        lambda: [report_to_dict(r) for r in crud.get_reports(db, skip=skip, limit=limit)],
+    )
+    return encoding.reports_response(request, results)
+
+NEARBY_MAX_LIMIT = 500
+
+# Declared before /reports/{report_id} so "nearby" is not taken for an id
+@read_routes.get("/reports/nearby")
+def read_reports_nearby(
+    request: Request,
+    lat: float,
+    lon: float,
+    radius_m: float = None,
+    limit: int = 20,
+    status: str = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Reports closest to a point, nearest first, each with its distance_m
+    
+    Args:
+        lat, lon: Reference point
+        radius_m: Only reports within this many metres (optional)
+        limit: Maximum number of reports (at most NEARBY_MAX_LIMIT)
+        status: Filter by status ('pending' or 'cleaned')
+    """
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="lat must be in [-90, 90] and lon in [-180, 180]")
+    if radius_m is not None and radius_m <= 0:
+        raise HTTPException(status_code=400, detail="radius_m must be positive")
+    if not 1 <= limit <= NEARBY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {NEARBY_MAX_LIMIT}")
+    if status is not None and status not in models.VALID_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Must be one of: {', '.join(models.VALID_STATUSES)}"
+        )
+    
     results = []
-    for r in reports:
-        point = to_shape(r.geom)
-        results.append({
-            "id": r.id,
-            "image_path": f"/uploads/{r.image_path}" if r.image_path else None,
-            "boxed_image_path": f"/annotated/{r.boxed_image_path}" if r.boxed_image_path else None,
-            "prediction": r.prediction,
-            "confidence": r.confidence,
-            "status": r.status,
-            "latitude": point.y,
-            "longitude": point.x,
-            "created_at": r.created_at
-        })
-    return results
+    for r, distance_m in crud.get_reports_nearby(db, lat, lon, radius_m, limit, status):
+        result = report_to_dict(r)
+        result["distance_m"] = round(distance_m, 1)
+        results.append(result)
+    return encoding.reports_response(request, results)
+
+@read_routes.get("/reports/{report_id}")
+def read_report(report_id: int, db: Session = Depends(get_read_db)):
+    def load():
+        r = crud.get_report(db, report_id)
+        return report_to_dict(r) if r is not None else None
+    
+    result = cached_read(db, ("report", report_id), load, dependency=("report", report_id))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    return result
+
+@read_routes.get("/reports-in-area")
+def read_reports_in_area(request: Request, min_lon: float, min_lat: float, max_lon: float, max_lat: float, db: Session = Depends(get_read_db)):
+    bbox = (min_lon, min_lat, max_lon, max_lat)
+    results = cached_read(
+        db,
+        ("reports-in-area",) + bbox,
+        lambda: [report_to_dict(r) for r in crud.get_reports_in_area(db, *bbox)],
+        dependency=("area", bbox),
+    )
+    return encoding.reports_response(request, results)
 
-@app.patch("/reports/{report_id}/status")
+@ingest_routes.patch("/reports/{report_id}/status")
 def update_report_status(report_id: int, status: str, db: Session = Depends(get_db)):
     """
     Update the status of a garbage report
@@ -390,23 +885,18 @@ def update_report_status(report_id: int, status: str, db: Session = Depends(get_
     status = status.lower().strip()
     
     # Validate status
-    valid_statuses = ['pending', 'cleaned']
+    valid_statuses = models.VALID_STATUSES
     if status not in valid_statuses:
         raise HTTPException(
             status_code=400, 
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    # Get the report
-    report = crud.get_report(db, report_id)
+    # Update status
+    report = crud.update_report_status(db, report_id, status)
     if report is None:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    # Update status
-    report.status = status
-    db.commit()
-    db.refresh(report)
-    
     print(f"[UPDATE STATUS] Report #{report_id} status updated to: {status}")
     
     return {
@@ -416,8 +906,61 @@ def update_report_status(report_id: int, status: str, db: Session = Depends(get_
         "message": f"Report status updated to '{status}'"
     }
 
-@app.get("/reports/by-status/{status}")
-def get_reports_by_status(status: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+class BulkStatusUpdate(BaseModel):
+    status: str
+    report_ids: Optional[List[int]] = None
+    bbox: Optional[List[float]] = None  # [min_lon, min_lat, max_lon, max_lat]
+    current_status: Optional[str] = None
+    prediction: Optional[str] = None
+
+@ingest_routes.patch("/reports/bulk-status")
+def bulk_update_report_status(body: BulkStatusUpdate, db: Session = Depends(get_db)):
+    """
+    Update the status of many reports in a single transaction
+    
+    Reports are selected by report_ids and/or bbox, optionally narrowed by
+    current_status and prediction. Returns the outcome for every report touched
+    ('updated', 'unchanged' or 'not_found').
+    """
+    status = body.status.lower().strip()
+    if status not in models.VALID_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Must be one of: {', '.join(models.VALID_STATUSES)}"
+        )
+    if body.current_status is not None and body.current_status not in models.VALID_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid current_status. Must be one of: {', '.join(models.VALID_STATUSES)}"
+        )
+    if body.report_ids is None and body.bbox is None:
+        raise HTTPException(status_code=400, detail="Provide report_ids and/or bbox")
+    if body.bbox is not None and len(body.bbox) != 4:
+        raise HTTPException(status_code=400, detail="bbox must be [min_lon, min_lat, max_lon, max_lat]")
+    if body.report_ids is not None and len(body.report_ids) > config.BULK_UPDATE_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {config.BULK_UPDATE_MAX_IDS} report_ids per request")
+    
+    outcomes = crud.bulk_update_status(
+        db,
+        status,
+        report_ids=body.report_ids,
+        bbox=tuple(body.bbox) if body.bbox is not None else None,
+        current_status=body.current_status,
+        prediction=body.prediction,
+    )
+    updated = sum(1 for outcome in outcomes.values() if outcome == "updated")
+    
+    print(f"[BULK STATUS] {updated} report(s) updated to: {status}")
+    
+    return {
+        "success": True,
+        "status": status,
+        "updated": updated,
+        "results": [{"report_id": rid, "outcome": outcome} for rid, outcome in outcomes.items()],
+    }
+
+@read_routes.get("/reports/by-status/{status}")
+def get_reports_by_status(request: Request, status: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     Get reports filtered by status
     
@@ -427,7 +970,7 @@ def get_reports_by_status(status: str, skip: int = 0, limit: int = 100, db: Sess
         limit: Maximum number of records to return
     """
     # Validate status
-    valid_statuses = ['pending', 'cleaned']
+    valid_statuses = models.VALID_STATUSES
     if status not in valid_statuses:
         raise HTTPException(
             status_code=400,
@@ -435,27 +978,185 @@ def get_reports_by_status(status: str, skip: int = 0, limit: int = 100, db: Sess
         )
     
     # Query reports by status
-    reports = db.query(models.GarbageReport).filter(
-        models.GarbageReport.status == status
-    ).offset(skip).limit(limit).all()
+    results = cached_read(
+        db,
+        ("by-status", status, skip, limit),
+        lambda: [report_to_dict(r) for r in crud.get_reports_by_status(db, status, skip=skip, limit=limit)],
+        dependency=("status", status),
+    )
     
-    results = []
-    for r in reports:
-        point = to_shape(r.geom)
-        results.append({
-            "id": r.id,
-            "image_path": f"/uploads/{r.image_path}" if r.image_path else None,
-            "boxed_image_path": f"/annotated/{r.boxed_image_path}" if r.boxed_image_path else None,
-            "prediction": r.prediction,
-            "confidence": r.confidence,
-            "status": r.status,
-            "latitude": point.y,
-            "longitude": point.x,
-            "created_at": r.created_at
-        })
-    
-    return {
+    return encoding.json_response(request, {
         "status_filter": status,
         "count": len(results),
         "reports": results
-    }
+    })
+
+@read_routes.get("/tiles/{z}/{x}/{y}.mvt")
+def read_tile(z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """
+    Mapbox Vector Tile of the report layer ('reports')
+    
+    Each feature carries id, status, prediction, confidence and sighting_count attributes.
+    Tiles are cached and invalidated when a report is added or changes status.
+    Rendered from the primary: a miss usually follows an invalidating write, and a
+    replica that has not replayed it yet would get its stale tile cached with no expiry
+    (cache hits never touch the session, so they cost the primary nothing).
+    """
+    if not tiles.is_valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    if db.get_bind().dialect.name == "sqlite":
+        raise HTTPException(status_code=501, detail="Vector tiles need PostGIS (not available in SQLite mode)")
+    
+    data = tiles.get_tile(db, z, x, y)
+    if not data:
+        return Response(status_code=204)
+    
+    return Response(content=data, media_type=tiles.MVT_MEDIA_TYPE)
+
+@read_routes.get("/export")
+def export_reports(
+    format: str = "ndjson",
+    status: str = None,
+    prediction: str = None,
+    start: datetime = None,
+    end: datetime = None,
+    min_lon: float = None,
+    min_lat: float = None,
+    max_lon: float = None,
+    max_lat: float = None,
+):
+    """
+    Stream every matching report as NDJSON, CSV or GeoJSON
+    
+    Args:
+        format: 'ndjson', 'csv' or 'geojson'
+        status: Filter by status ('pending' or 'cleaned')
+        prediction: Filter by predicted class
+        start, end: created_at range (start inclusive, end exclusive)
+        min_lon, min_lat, max_lon, max_lat: Bounding box filter (all four or none)
+    """
+    if format not in export.FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {', '.join(sorted(export.FORMATS))}"
+        )
+    
+    bbox_values = [min_lon, min_lat, max_lon, max_lat]
+    if any(v is not None for v in bbox_values) and any(v is None for v in bbox_values):
+        raise HTTPException(status_code=400, detail="Bounding box needs min_lon, min_lat, max_lon and max_lat")
+    bbox = bbox_values if min_lon is not None else None
+    
+    chunks = export.stream_export(format, status=status, prediction=prediction, start=start, end=end, bbox=bbox)
+    return StreamingResponse(
+        chunks,
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="garbage_reports.{format}"'}
+    )
+
+@read_routes.get("/detections/search")
+def search_detections(
+    request: Request,
+    class_name: str = None,
+    min_confidence: float = None,
+    start: datetime = None,
+    end: datetime = None,
+    min_lon: float = None,
+    min_lat: float = None,
+    max_lon: float = None,
+    max_lat: float = None,
+    status: str = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Search individual detections, newest first
+    
+    Args:
+        class_name: Detected class (e.g. 'Cigarette')
+        min_confidence: Lowest confidence to include (0-1)
+        start, end: Report created_at range (start inclusive, end exclusive)
+        min_lon, min_lat, max_lon, max_lat: Bounding box filter (all four or none)
+        status: Report status ('pending' or 'cleaned')
+    """
+    if status is not None and status not in models.VALID_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Must be one of: {', '.join(models.VALID_STATUSES)}"
+        )
+    
+    bbox_values = [min_lon, min_lat, max_lon, max_lat]
+    if any(v is not None for v in bbox_values) and any(v is None for v in bbox_values):
+        raise HTTPException(status_code=400, detail="Bounding box needs min_lon, min_lat, max_lon and max_lat")
+    bbox = tuple(bbox_values) if min_lon is not None else None
+    
+    def load():
+        rows = crud.search_detections(db, class_name, min_confidence, start, end, bbox, status, skip=skip, limit=limit)
+        results = []
+        for detection, report_status, image_path, boxed_image_path in rows:
+            point = to_shape(detection.geom)
+            results.append({
+                "id": detection.id,
+                "report_id": detection.report_id,
+                "class": detection.class_name,
+                "class_id": detection.class_id,
+                "confidence": detection.confidence,
+                "bbox": detection.bbox,
+                "status": report_status,
+                "image_path": f"/uploads/{image_path}" if image_path else None,
+                "boxed_image_path": f"/annotated/{boxed_image_path}" if boxed_image_path else None,
+                "latitude": point.y,
+                "longitude": point.x,
+                "created_at": detection.created_at,
+            })
+        return results
+    
+    key = ("detections", class_name, min_confidence, start, end, bbox, status, skip, limit)
+    results = cached_read(db, key, load)
+    return encoding.json_response(request, {"count": len(results), "detections": results})
+
+@read_routes.get("/media/{kind}/{size}/{name:path}")
+async def read_derivative(request: Request, kind: str, size: str, name: str, format: str = thumbnails.DEFAULT_FORMAT):
+    """
+    Resized rendition of an original ('uploads') or annotated image
+    
+    Args:
+        kind: 'uploads' or 'annotated'
+        size: 'thumb' or 'medium'
+        name: Image name as stored in image_path / boxed_image_path
+        format: 'webp' (default) or 'jpeg'
+    
+    Renditions missing for older images are generated on first request.
+    """
+    if size not in thumbnails.SIZES:
+        raise HTTPException(status_code=400, detail=f"Invalid size. Must be one of: {', '.join(thumbnails.SIZES)}")
+    if format not in thumbnails.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {', '.join(thumbnails.FORMATS)}")
+    
+    src_path = thumbnails.source_path(kind, name)
+    if src_path is None or not os.path.exists(src_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    path = thumbnails.derivative_path(kind, name, size, format)
+    if not os.path.exists(path):
+        try:
+            await asyncio.wrap_future(thumbnails.submit(kind, name, size, format))
+        except Exception as e:
+            print(f"[MEDIA ERROR] Failed to render {kind}/{size}/{name}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to render image")
+    
+    rel_path = os.path.relpath(path, config.DERIVATIVES_DIR).replace(os.sep, "/")
+    return media.image_response(
+        path,
+        rel_path,
+        os.stat(path),
+        request.headers,
+        request.method,
+        offload_uri=f"{media.offload_prefix('derived')}/{rel_path}",
+        media_type=thumbnails.FORMATS[format][1],
+    )
+
+if config.SERVES_INGEST:
+    app.include_router(ingest_routes)
+if config.SERVES_READS:
+    app.include_router(read_routes)
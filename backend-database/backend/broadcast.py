@@ -0,0 +1,110 @@
+"""
+Report change events shared between worker processes
+The read cache and the tile memory live in each process and are invalidated
+by backend.events, which only reaches the process that made the write. With
+several workers (serve.py, or separate ingest and read pools) this module
+appends every local change to the report_changes table, and each process
+polls that table for the changes made by the others and publishes them
+locally, so their caches drop the same entries within CHANGE_POLL_SECONDS.
+
+Rows are read by id. Ids are handed out before commit, so a change can
+become visible after a higher id: each poll lists the ids (not the
+payloads) of the last LOOKBACK_IDS and fetches the payloads of the ones
+it has not applied yet. The log rows are single-row transactions, so only
+a handful of them can be in flight at once.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+from . import events, models, db as database
+from .config import CHANGE_BROADCAST, CHANGE_LOG_RETENTION_MINUTES
+
+LOOKBACK_IDS = 64
+PURGE_INTERVAL_SECONDS = 600
+
+_cursor = None  # highest id seen, None until the first poll
+_applied = set()  # ids >= _cursor - LOOKBACK_IDS already published here
+_last_purge = 0.0
+_local = threading.local()  # .remote is set while a change from another process is published
+
+
+def origin():
+    """This process, as recorded on the changes it writes (the pid changes in forked workers)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _encode(change):
+    return json.dumps({
+        "kind": change.kind,
+        "report_ids": list(change.report_ids),
+        "points": [list(point) for point in change.points],
+        "statuses": sorted(s for s in change.statuses if s is not None),
+    })
+
+
+def _decode(payload):
+    data = json.loads(payload)
+    return events.ReportChange(data["kind"], data["report_ids"], [tuple(p) for p in data["points"]],
+                               set(data["statuses"]))
+
+
+@events.subscribe
+def _on_report_change(change):
+    if not CHANGE_BROADCAST or getattr(_local, "remote", False):
+        return
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.ReportChangeLog).values(
+            origin=origin(), payload=_encode(change), created_at=datetime.utcnow()))
+
+
+def _purge(conn):
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    cutoff = datetime.utcnow() - timedelta(minutes=CHANGE_LOG_RETENTION_MINUTES)
+    log = models.ReportChangeLog
+    deleted = conn.execute(delete(log).where(log.created_at < cutoff)).rowcount
+    if deleted:
+        print(f"[BROADCAST] Purged {deleted} old change(s)")
+
+
+def poll():
+    """Publish here the changes other processes logged since the last poll, returns how many"""
+    global _cursor
+    log = models.ReportChangeLog
+    with database.engine.begin() as conn:
+        if _cursor is None:
+            # Start from now: the caches of a new process hold nothing older
+            _cursor = conn.execute(select(func.coalesce(func.max(log.id), 0))).scalar()
+            _applied.update(conn.execute(select(log.id).where(log.id > _cursor - LOOKBACK_IDS)).scalars())
+            return 0
+        rows = conn.execute(
+            select(log.id, log.origin).where(log.id > _cursor - LOOKBACK_IDS).order_by(log.id)
+        ).all()
+        own = origin()
+        unseen = [row_id for row_id, _ in rows if row_id not in _applied]
+        wanted = [row_id for row_id, row_origin in rows if row_id not in _applied and row_origin != own]
+        payloads = dict(conn.execute(
+            select(log.id, log.payload).where(log.id.in_(wanted)).order_by(log.id)
+        ).all()) if wanted else {}
+        _purge(conn)
+
+    _applied.update(unseen)
+    for row_id in wanted:
+        _local.remote = True
+        try:
+            events.publish(_decode(payloads[row_id]))
+        finally:
+            _local.remote = False
+    applied = len(wanted)
+
+    if rows:
+        _cursor = max(_cursor, rows[-1][0])
+    floor = _cursor - LOOKBACK_IDS
+    _applied.difference_update([i for i in _applied if i <= floor])
+    return applied
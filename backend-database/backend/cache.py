@@ -0,0 +1,172 @@
+"""
+In-process read cache for report queries
+TTL + LRU with a memory cap, precise invalidation from report change events
+and single-flight loading so concurrent identical queries hit the DB once
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from . import events
+from .config import READ_CACHE_TTL_SECONDS, READ_CACHE_MAX_BYTES
+
+
+def _estimate_size(value):
+    """Rough deep size in bytes of the plain data we cache (dicts, lists, scalars)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += sys.getsizeof(k) + _estimate_size(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            size += _estimate_size(v)
+    return size
+
+
+def _in_bbox(point, bbox):
+    lon, lat = point
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lon <= lon <= max_lon and min_lat <= lat <= max_lat
+
+
+def depends_on(dependency, change):
+    """
+    Whether a cached result is affected by a ReportChange
+
+    Dependencies:
+        ("all",)            - any report may appear (paged lists)
+        ("report", id)      - a single report
+        ("status", status)  - reports with that status
+        ("area", bbox)      - reports inside (min_lon, min_lat, max_lon, max_lat)
+    """
+    kind = dependency[0]
+    if kind == "all":
+        return True
+    if kind == "report":
+        return dependency[1] in change.report_ids  # also drops a cached "not found"
+    if kind == "status":
+        return dependency[1] in change.statuses
+    if kind == "area":
+        return any(_in_bbox(point, dependency[1]) for point in change.points)
+    return True
+
+
+class ReadCache:
+    """Thread-safe TTL/LRU cache keyed by query, sized by estimated bytes"""
+
+    def __init__(self, ttl=READ_CACHE_TTL_SECONDS, max_bytes=READ_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size, dependency)
+        self._in_flight = {}           # key -> Future
+        self._bytes = 0
+        self._generation = 0           # bumped by every invalidation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _store(self, key, value, dependency):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl, size, dependency)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def get_or_load(self, key, loader, dependency=("all",)):
+        """
+        Return the cached value for key, or run loader() once for all concurrent callers
+
+        Args:
+            key: hashable query key, e.g. ("reports", skip, limit)
+            loader: zero-argument function returning plain (JSON-able) data
+            dependency: what the value depends on, see depends_on()
+        """
+        if self.ttl <= 0:
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._drop(key)
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+                leader = True
+                generation = self._generation
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._in_flight.pop(key, None)
+            # A write committed while we were loading: the value may already be stale
+            if generation == self._generation:
+                self._store(key, value, dependency)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, change):
+        """Drop every entry affected by a ReportChange"""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if depends_on(entry[3], change)]
+            for key in stale:
+                self._drop(key)
+        if stale:
+            print(f"[CACHE] Invalidated {len(stale)} entr{'y' if len(stale) == 1 else 'ies'} after '{change.kind}' change")
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
+
+
+# Shared cache for the report read endpoints
+reports = ReadCache()
+
+
+@events.subscribe
+def _on_report_change(change):
+    reports.invalidate(change)
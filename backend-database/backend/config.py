@@ -15,7 +15,8 @@ DB_NAME = os.getenv("DB_NAME", "garbage_detection_db")
 
 # Encode password for URL
 password = urllib.parse.quote_plus(DB_PASSWORD)
-DATABASE_URL = f"postgresql://{DB_USER}:{password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# A full DATABASE_URL wins, e.g. sqlite:////var/lib/garbage/reports.db for the embedded edge mode
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql://{DB_USER}:{password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Uploads directory
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "uploads"))
@@ -30,5 +31,119 @@ if not os.path.exists(UPLOAD_DIR):
 if not os.path.exists(ANNOTATED_DIR):
     os.makedirs(ANNOTATED_DIR)
 
+# Partial uploads are written here and renamed into place, outside the served UPLOAD_DIR.
+# Keep it on the same filesystem as UPLOAD_DIR so the rename is atomic
+STAGING_DIR = os.getenv("STAGING_DIR", os.path.join(os.path.dirname(os.path.abspath(UPLOAD_DIR)), "upload_staging"))
+
+if not os.path.exists(STAGING_DIR):
+    os.makedirs(STAGING_DIR)
+
 # ML Model path
 MODEL_PATH = os.getenv("MODEL_PATH", r"E:\SY\EDI\Smart Garbage Detection\best.pt")
+
+# Worker role: 'ingest' (every write: uploads + ML model, status updates), 'read'
+# (dashboard reads, never imports the ML stack) or 'all'. Run separate pools and
+# route at the proxy: /resumable-uploads and non-GET requests to ingest workers, the
+# remaining GETs to read workers.
+WORKER_ROLE = os.getenv("WORKER_ROLE", "all").lower()
+if WORKER_ROLE not in ("all", "ingest", "read"):
+    raise ValueError(f"WORKER_ROLE must be 'all', 'ingest' or 'read', got '{WORKER_ROLE}'")
+SERVES_INGEST = WORKER_ROLE in ("all", "ingest")
+SERVES_READS = WORKER_ROLE in ("all", "read")
+ML_PRELOAD = os.getenv("ML_PRELOAD", "true").lower() in ("1", "true", "yes")  # load the model at startup, not on the first upload
+
+# Vector tile cache (for /tiles/{z}/{x}/{y}.mvt)
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "tile_cache"))
+TILE_CACHE_MAX_ITEMS = int(os.getenv("TILE_CACHE_MAX_ITEMS", "2048"))  # tiles kept in memory
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "22"))
+
+if not os.path.exists(TILE_CACHE_DIR):
+    os.makedirs(TILE_CACHE_DIR)
+
+# Response compression for bulk report reads
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))  # smaller bodies are sent as-is
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))  # 0-11, low values favour speed
+
+# Bulk status update
+BULK_UPDATE_MAX_IDS = int(os.getenv("BULK_UPDATE_MAX_IDS", "10000"))
+
+# Batch uploads
+BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "50"))
+ML_BATCH_SIZE = int(os.getenv("ML_BATCH_SIZE", "8"))  # images per model call
+
+# Resumable (tus) uploads: chunks are staged here until the upload completes
+RESUMABLE_DIR = os.getenv("RESUMABLE_DIR", os.path.join(os.path.dirname(__file__), "resumable_uploads"))
+RESUMABLE_MAX_BYTES = int(os.getenv("RESUMABLE_MAX_BYTES", str(20 * 1024 * 1024)))
+RESUMABLE_EXPIRY_HOURS = float(os.getenv("RESUMABLE_EXPIRY_HOURS", "24"))  # unfinished uploads are dropped after this
+RESUMABLE_GC_MINUTES = float(os.getenv("RESUMABLE_GC_MINUTES", "30"))
+
+if not os.path.exists(RESUMABLE_DIR):
+    os.makedirs(RESUMABLE_DIR)
+
+# Idempotency-Key on upload endpoints: a retry with the same key replays the first response
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))  # how long a duplicate waits for the first request
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))  # an in-progress key this old was abandoned
+
+# Request profiling: X-Profile header, /admin/profiling toggle or 1 in PROFILE_SAMPLE_EVERY requests
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))  # 0 = only on demand
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))  # stack sampling period
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))  # oldest profiles are deleted beyond this
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # X-Profile and POST /admin/profiling need it, unset = disabled
+
+# Derivative images (thumbnails / medium renditions)
+DERIVATIVES_DIR = os.getenv("DERIVATIVES_DIR", os.path.join(UPLOAD_DIR, "derived"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+if not os.path.exists(DERIVATIVES_DIR):
+    os.makedirs(DERIVATIVES_DIR)
+
+# Image serving
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", "31536000"))  # image names never change
+IMAGE_OFFLOAD = os.getenv("IMAGE_OFFLOAD", "").lower()  # '', 'x-accel-redirect' or 'x-sendfile'
+IMAGE_OFFLOAD_PREFIX = os.getenv("IMAGE_OFFLOAD_PREFIX", "/_images")  # nginx internal location
+
+# Read cache for report queries (per process)
+READ_CACHE_TTL_SECONDS = float(os.getenv("READ_CACHE_TTL_SECONDS", "5"))  # 0 disables the cache
+READ_CACHE_MAX_BYTES = int(os.getenv("READ_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Report changes shared between worker processes through the report_changes table,
+# so every process invalidates its read cache and tile memory (off: per process only)
+CHANGE_BROADCAST = os.getenv("CHANGE_BROADCAST", "true").lower() in ("1", "true", "yes")
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "1"))  # how late other processes may see a change
+CHANGE_LOG_RETENTION_MINUTES = float(os.getenv("CHANGE_LOG_RETENTION_MINUTES", "60"))
+
+# Connection pooling
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # primary, 0 = no limit
+DB_READ_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_READ_STATEMENT_TIMEOUT_MS", "15000"))  # replicas
+
+# Read replicas (comma-separated URLs) for the GET endpoints, writes stay on DATABASE_URL
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+# A client that wrote within this many seconds reads from the primary (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Monthly partitions of garbage_reports (by created_at)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))  # future months kept ready
+PARTITION_MAINTENANCE_HOURS = float(os.getenv("PARTITION_MAINTENANCE_HOURS", "24"))  # 0 = startup only
+# Retention: months older than this whose reports are all cleaned leave the table (0 = keep forever)
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+PARTITION_RETENTION_ACTION = os.getenv("PARTITION_RETENTION_ACTION", "detach").lower()  # 'detach' or 'archive'
+PARTITION_ARCHIVE_SCHEMA = os.getenv("PARTITION_ARCHIVE_SCHEMA", "archive")
+
+# Duplicate report merging: a pending report of a compatible class this close
+# and seen this recently absorbs a new report as a sighting (radius 0 disables)
+DEDUP_RADIUS_M = float(os.getenv("DEDUP_RADIUS_M", "25"))
+DEDUP_WINDOW_HOURS = float(os.getenv("DEDUP_WINDOW_HOURS", "24"))
+
+# Group commit for report inserts: uploads arriving within INGEST_MAX_WAIT_MS
+# share one transaction of at most INGEST_MAX_BATCH reports
+INGEST_GROUP_COMMIT = os.getenv("INGEST_GROUP_COMMIT", "true").lower() in ("1", "true", "yes")
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "100"))
+INGEST_MAX_WAIT_MS = float(os.getenv("INGEST_MAX_WAIT_MS", "5"))
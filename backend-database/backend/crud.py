@@ -1,14 +1,174 @@
 from sqlalchemy.orm import Session
-from . import models
-from geoalchemy2.shape import from_shape
+from . import models, events, sqlite_store, db as database
+from .config import DEDUP_RADIUS_M, DEDUP_WINDOW_HOURS
+from .geo import haversine_m, bbox_around
+from datetime import datetime, timedelta
+from geoalchemy2.shape import from_shape, to_shape
 from shapely.geometry import Point
-from sqlalchemy import func
+from sqlalchemy import and_, func, insert, or_, select, update
+
+# Predictions that say nothing about the class: they merge with reports of any class
+UNSPECIFIC_PREDICTIONS = ["pending", "No Waste Detected"]
+
+def _geography(geom):
+    # Same expression as the ix_garbage_reports_geog index (geom::geography)
+    return func.geography(geom)
+
+def _compatible(prediction_a, prediction_b):
+    """Whether reports with these predictions may describe the same incident"""
+    return (prediction_a == prediction_b
+            or not prediction_a or prediction_a in UNSPECIFIC_PREDICTIONS
+            or not prediction_b or prediction_b in UNSPECIFIC_PREDICTIONS)
+
+def in_bbox(geom, report_id, bbox):
+    """
+    Condition: point inside (min_lon, min_lat, max_lon, max_lat)
+    
+    Served by the GiST index on PostGIS and by the R-tree in SQLite mode,
+    where report_id is matched against the R-tree ids.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if database.IS_SQLITE:
+        return and_(
+            report_id.in_(sqlite_store.bbox_ids(bbox)),
+            func.ST_X(geom).between(min_lon, max_lon),
+            func.ST_Y(geom).between(min_lat, max_lat),
+        )
+    return geom.intersects(func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326))
+
+# Largest search radius, about half the earth's circumference
+MAX_SEARCH_M = 20_040_000
+
+def _nearest_sqlite(db: Session, lat: float, lon: float, radius_m: float, limit: int, conditions):
+    """
+    Nearest reports in SQLite mode, as (report, distance_m) rows
+    
+    The R-tree has no KNN ordering: candidates come from the box around a
+    circle that is grown until it holds limit reports (or spans the globe).
+    """
+    report = models.GarbageReport
+    distance = func.ST_DistanceSphere(report.geom, sqlite_store.point_blob(lon, lat))
+    search_m = radius_m or 1000.0
+    while True:
+        query = (
+            select(report, distance.label("distance_m"))
+            .where(report.id.in_(sqlite_store.bbox_ids(bbox_around(lat, lon, search_m))), distance <= search_m, *conditions)
+            .order_by(distance)
+            .limit(limit)
+        )
+        rows = db.execute(query).all()
+        if radius_m is not None or len(rows) >= limit or search_m >= MAX_SEARCH_M:
+            return rows
+        search_m = min(search_m * 4, MAX_SEARCH_M)
+
+def _detection_rows(report_id, created_at, geom, detections):
+    """report_detections rows for the detections JSON of one report"""
+    if not detections:
+        return []
+    return [
+        {
+            "report_id": report_id,
+            "class_id": d.get("class_id"),
+            "class_name": d.get("class", "Unknown"),
+            "confidence": d.get("confidence", 0.0),
+            "bbox": d.get("bbox"),
+            "created_at": created_at,
+            "geom": geom,
+        }
+        for d in detections.get("all", [])
+    ]
+
+def _insert_detections(db: Session, rows):
+    if rows:
+        db.execute(insert(models.ReportDetection), rows)
+
+def find_incident(db: Session, lat: float, lon: float, prediction: str = None):
+    """
+    Nearest pending report within DEDUP_RADIUS_M metres, seen in the last
+    DEDUP_WINDOW_HOURS and of a compatible class, locked for update
+    
+    Returns:
+        (report, distance_m) or None
+    """
+    report = models.GarbageReport
+    cutoff = datetime.utcnow() - timedelta(hours=DEDUP_WINDOW_HOURS)
+    conditions = [
+        report.status == "pending",
+        func.coalesce(report.last_seen_at, report.created_at) >= cutoff,
+    ]
+    if prediction and prediction not in UNSPECIFIC_PREDICTIONS:
+        conditions.append(or_(report.prediction == prediction, report.prediction.in_(UNSPECIFIC_PREDICTIONS)))
+    
+    if database.IS_SQLITE:
+        # Writes are serialized by SQLite itself, no row lock needed
+        rows = _nearest_sqlite(db, lat, lon, DEDUP_RADIUS_M, 1, conditions)
+        return (rows[0][0], rows[0][1]) if rows else None
+    
+    here = _geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326))
+    there = _geography(report.geom)
+    query = (
+        select(report, func.ST_Distance(there, here).label("distance_m"))
+        .where(func.ST_DWithin(there, here, DEDUP_RADIUS_M), *conditions)
+        .order_by(there.op("<->")(here))  # KNN on the geography GiST index
+        .limit(1)
+        .with_for_update(of=report)
+    )
+    row = db.execute(query).first()
+    return (row[0], row[1]) if row else None
+
+def _record_sighting(db: Session, report_id: int, distance_m: float, item: dict, now: datetime):
+    """Add a sighting row and bump the incident (no commit), returns the new sighting_count"""
+    db.add(models.ReportSighting(
+        report_id=report_id,
+        image_path=item["image_path"],
+        boxed_image_path=item.get("boxed_image_path"),
+        prediction=item.get("prediction"),
+        confidence=item.get("confidence"),
+        detections=item.get("detections"),
+        distance_m=distance_m,
+        created_at=now,
+        geom=from_shape(Point(item["lon"], item["lat"]), srid=4326),
+    ))
+    report = models.GarbageReport
+    stmt = (
+        update(report)
+        .where(report.id == report_id)
+        .values(sighting_count=report.sighting_count + 1, last_seen_at=now)
+        .returning(report.sighting_count)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).scalar()
+
+def add_sighting(db: Session, incident, distance_m: float, image_path: str, lat: float, lon: float, prediction: str = None, confidence: float = None, detections: dict = None, boxed_image_path: str = None):
+    """Record a report as a sighting of an existing incident, returns the incident"""
+    item = {"image_path": image_path, "boxed_image_path": boxed_image_path, "lat": lat, "lon": lon,
+            "prediction": prediction, "confidence": confidence, "detections": detections}
+    _record_sighting(db, incident.id, distance_m, item, datetime.utcnow())
+    db.commit()
+    db.refresh(incident)
+    print(f"[CRUD] Merged into report {incident.id} as sighting #{incident.sighting_count} ({distance_m:.1f} m away)")
+    
+    point = to_shape(incident.geom)
+    events.publish(events.ReportChange("sighting", [incident.id], [(point.x, point.y)], {incident.status}))
+    
+    return incident
 
 def create_garbage_report(db: Session, image_path: str, lat: float, lon: float, prediction: str = "pending", confidence: float = None, detections: dict = None, boxed_image_path: str = None):
+    """
+    Create a report, or merge it into a nearby pending incident (see find_incident)
+    
+    A merged report comes back as the incident, with sighting_count > 1.
+    """
     print(f"[CRUD] Creating garbage report - image: {image_path}, lat: {lat}, lon: {lon}")
     print(f"[CRUD] Prediction: {prediction}, Confidence: {confidence}")
     print(f"[CRUD] Boxed image: {boxed_image_path}")
     
+    if DEDUP_RADIUS_M > 0:
+        match = find_incident(db, lat, lon, prediction)
+        if match is not None:
+            incident, distance_m = match
+            return add_sighting(db, incident, distance_m, image_path, lat, lon, prediction, confidence, detections, boxed_image_path)
+    
     # Create geometry point
     # Note: PostGIS uses (lon, lat)
     point = Point(lon, lat)
@@ -27,21 +187,267 @@ def create_garbage_report(db: Session, image_path: str, lat: float, lon: float,
     db.add(db_report)
     print(f"[CRUD] Added to session, ID before commit: {db_report.id}")
     
+    # Searchable detection rows go in the same transaction
+    db.flush()
+    _insert_detections(db, _detection_rows(db_report.id, db_report.created_at, db_report.geom, detections))
+    
     db.commit()
     print(f"[CRUD] Committed, ID after commit: {db_report.id}")
     
     db.refresh(db_report)
     print(f"[CRUD] Refreshed, ID after refresh: {db_report.id}")
     
+    events.publish(events.ReportChange("created", [db_report.id], [(lon, lat)], {db_report.status}))
+    
     return db_report
 
+def bulk_create_garbage_reports(db: Session, items: list):
+    """
+    Insert many garbage reports with a single multi-row INSERT ... RETURNING id
+    
+    Args:
+        items: dicts with image_path, lat, lon and optionally prediction,
+               confidence, detections and boxed_image_path
+    
+    Returns:
+        list: new report ids, in the same order as items
+    """
+    if not items:
+        return []
+    
+    ids = _insert_reports(db, items)
+    db.commit()
+    print(f"[CRUD] Bulk inserted {len(ids)} garbage report(s)")
+    
+    points = [(item["lon"], item["lat"]) for item in items]
+    events.publish(events.ReportChange("created", ids, points, {"pending"}))
+    
+    return ids
+
+def _insert_reports(db: Session, items: list):
+    """Multi-row INSERT ... RETURNING of reports plus their detection rows (no commit), returns ids"""
+    if not items:
+        return []
+    
+    rows = []
+    for item in items:
+        rows.append({
+            "image_path": item["image_path"],
+            "boxed_image_path": item.get("boxed_image_path"),
+            "prediction": item.get("prediction", "pending"),
+            "confidence": item.get("confidence"),
+            "detections": item.get("detections"),
+            "geom": from_shape(Point(item["lon"], item["lat"]), srid=4326),
+        })
+    
+    report = models.GarbageReport
+    stmt = insert(report).returning(report.id, report.created_at, sort_by_parameter_order=True)
+    inserted = db.execute(stmt, rows).all()
+    ids = [row.id for row in inserted]
+    
+    detection_rows = []
+    for row, values in zip(inserted, rows):
+        detection_rows.extend(_detection_rows(row.id, row.created_at, values["geom"], values["detections"]))
+    _insert_detections(db, detection_rows)
+    return ids
+
+def ingest_reports(db: Session, items: list):
+    """
+    Create or merge many reports in a single transaction (group commit)
+    
+    Every item is deduplicated like in create_garbage_report, against the
+    database and against the earlier items of the same call; the remaining
+    ones are inserted with one multi-row INSERT ... RETURNING.
+    
+    Args:
+        items: dicts as for bulk_create_garbage_reports
+    
+    Returns:
+        list: (report_id, sighting_count, merged) per item, in the same order
+    """
+    if not items:
+        return []
+    
+    new = []         # indexes of the items that become reports
+    sightings = []   # (index, incident id or -1 - index of an earlier new item, distance_m, incident lon/lat)
+    for i, item in enumerate(items):
+        if DEDUP_RADIUS_M > 0:
+            match = find_incident(db, item["lat"], item["lon"], item.get("prediction"))
+            if match is not None:
+                point = to_shape(match[0].geom)
+                sightings.append((i, match[0].id, match[1], (point.x, point.y)))
+                continue
+            earlier = next((j for j in new
+                            if _compatible(items[j].get("prediction"), item.get("prediction"))
+                            and haversine_m(items[j]["lat"], items[j]["lon"], item["lat"], item["lon"]) <= DEDUP_RADIUS_M), None)
+            if earlier is not None:
+                distance = haversine_m(items[earlier]["lat"], items[earlier]["lon"], item["lat"], item["lon"])
+                sightings.append((i, -1 - earlier, distance, (items[earlier]["lon"], items[earlier]["lat"])))
+                continue
+        new.append(i)
+    
+    results = [None] * len(items)
+    ids = _insert_reports(db, [items[i] for i in new])
+    for i, report_id in zip(new, ids):
+        results[i] = (report_id, 1, False)
+    now = datetime.utcnow()
+    for i, target, distance, _ in sightings:
+        report_id = target if target >= 0 else results[-1 - target][0]
+        results[i] = (report_id, _record_sighting(db, report_id, distance, items[i], now), True)
+    db.commit()
+    print(f"[CRUD] Ingested {len(items)} report(s): {len(ids)} new, {len(sightings)} merged")
+    
+    if ids:
+        events.publish(events.ReportChange("created", ids, [(items[i]["lon"], items[i]["lat"]) for i in new], {"pending"}))
+    if sightings:
+        events.publish(events.ReportChange("sighting", [results[i][0] for i, *_ in sightings],
+                                           [point for *_, point in sightings], {"pending"}))
+    return results
+
 def get_reports(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.GarbageReport).offset(skip).limit(limit).all()
 
 def get_report(db: Session, report_id: int):
     return db.query(models.GarbageReport).filter(models.GarbageReport.id == report_id).first()
 
+def get_reports_by_status(db: Session, status: str, skip: int = 0, limit: int = 100):
+    # Newest first, served by the (status, created_at) index
+    return (
+        db.query(models.GarbageReport)
+        .filter(models.GarbageReport.status == status)
+        .order_by(models.GarbageReport.created_at.desc(), models.GarbageReport.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
 def get_reports_in_area(db: Session, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
-    # Using GeoAlchemy2 filter
-    box = func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
-    return db.query(models.GarbageReport).filter(models.GarbageReport.geom.intersects(box)).all()
+    report = models.GarbageReport
+    return db.query(report).filter(in_bbox(report.geom, report.id, (min_lon, min_lat, max_lon, max_lat))).all()
+
+def get_reports_nearby(db: Session, lat: float, lon: float, radius_m: float = None, limit: int = 20, status: str = None):
+    """
+    Reports closest to a point, nearest first, as (report, distance_m) rows
+    
+    Ordered by KNN (<->) on the geography index, so at most limit rows are
+    read whether or not a radius is given.
+    """
+    report = models.GarbageReport
+    if database.IS_SQLITE:
+        conditions = [report.status == status] if status is not None else []
+        return _nearest_sqlite(db, lat, lon, radius_m, limit, conditions)
+    
+    here = _geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326))
+    there = _geography(report.geom)
+    
+    query = select(report, func.ST_Distance(there, here).label("distance_m"))
+    if radius_m is not None:
+        query = query.where(func.ST_DWithin(there, here, radius_m))
+    if status is not None:
+        query = query.where(report.status == status)
+    query = query.order_by(there.op("<->")(here)).limit(limit)
+    return db.execute(query).all()
+
+def update_report_status(db: Session, report_id: int, status: str):
+    """Set the status of a report, returns None if the report does not exist"""
+    report = get_report(db, report_id)
+    if report is None:
+        return None
+    
+    previous_status = report.status
+    report.status = status
+    db.commit()
+    db.refresh(report)
+    
+    point = to_shape(report.geom)
+    events.publish(events.ReportChange("status", [report.id], [(point.x, point.y)], {previous_status, status}))
+    
+    return report
+
+def bulk_update_status(db: Session, status: str, report_ids: list = None, bbox: tuple = None, current_status: str = None, prediction: str = None):
+    """
+    Set the status of many reports with one UPDATE ... RETURNING in a single transaction
+    
+    Reports are selected by id list and/or bbox (min_lon, min_lat, max_lon, max_lat),
+    optionally narrowed by their current status and prediction. At least one of
+    report_ids or bbox is required.
+    
+    Returns:
+        dict: report_id -> 'updated', 'unchanged' (already had the status) or
+              'not_found' (only for ids passed in report_ids)
+    """
+    if report_ids is None and bbox is None:
+        raise ValueError("bulk_update_status needs report_ids or bbox")
+    
+    report = models.GarbageReport
+    conditions = [report.status != status]
+    if report_ids is not None:
+        conditions.append(report.id.in_(report_ids))
+    if bbox is not None:
+        conditions.append(in_bbox(report.geom, report.id, bbox))
+    if current_status is not None:
+        conditions.append(report.status == current_status)
+    if prediction is not None:
+        conditions.append(report.prediction == prediction)
+    
+    stmt = (
+        update(report)
+        .where(*conditions)
+        .values(status=status)
+        .returning(report.id, func.ST_X(report.geom), func.ST_Y(report.geom))
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(stmt).all()
+    
+    outcomes = {row[0]: "updated" for row in rows}
+    if report_ids is not None:
+        missing = [rid for rid in report_ids if rid not in outcomes]
+        if missing:
+            # Tell "already had this status" apart from "no such report"
+            existing = set(db.execute(select(report.id).where(report.id.in_(missing))).scalars())
+            for rid in missing:
+                outcomes[rid] = "unchanged" if rid in existing else "not_found"
+    
+    db.commit()
+    print(f"[CRUD] Bulk status update to '{status}': {len(rows)} report(s) updated")
+    
+    if rows:
+        statuses = {status, current_status} if current_status else set(models.VALID_STATUSES)
+        events.publish(events.ReportChange("status", [row[0] for row in rows], [(row[1], row[2]) for row in rows], statuses))
+    
+    return outcomes
+
+def search_detections(db: Session, class_name: str = None, min_confidence: float = None, start=None, end=None,
+                      bbox: tuple = None, status: str = None, skip: int = 0, limit: int = 100):
+    """
+    Detections matching the filters, newest first, with their report's status and images
+    
+    Args:
+        class_name: detected class, e.g. 'Cigarette'
+        min_confidence: lowest confidence to include
+        start, end: report created_at range (start inclusive, end exclusive)
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+        status: report status
+    """
+    detection = models.ReportDetection
+    report = models.GarbageReport
+    query = (
+        select(detection, report.status, report.image_path, report.boxed_image_path)
+        # created_at is the partition key: matching on it prunes garbage_reports partitions
+        .join(report, (report.id == detection.report_id) & (report.created_at == detection.created_at))
+    )
+    if class_name is not None:
+        query = query.where(detection.class_name == class_name)
+    if min_confidence is not None:
+        query = query.where(detection.confidence >= min_confidence)
+    if start is not None:
+        query = query.where(detection.created_at >= start)
+    if end is not None:
+        query = query.where(detection.created_at < end)
+    if bbox is not None:
+        query = query.where(in_bbox(detection.geom, detection.report_id, bbox))
+    if status is not None:
+        query = query.where(report.status == status)
+    
+    query = query.order_by(detection.created_at.desc(), detection.confidence.desc()).offset(skip).limit(limit)
+    return db.execute(query).all()
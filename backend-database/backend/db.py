@@ -1,16 +1,85 @@
-from sqlalchemy import create_engine
+import itertools
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .config import DATABASE_URL
+from . import sqlite_store
+from .config import (
+    DATABASE_URL, READ_REPLICA_URLS,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS, DB_READ_STATEMENT_TIMEOUT_MS,
+)
 
-engine = create_engine(DATABASE_URL)
+# Embedded mode for edge boxes without PostgreSQL (see sqlite_store)
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+def _create_sqlite_engine(url):
+    if make_url(url).database in (None, "", ":memory:"):
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        sqlite_engine = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            connect_args={"check_same_thread": False},
+        )
+    event.listen(sqlite_engine, "connect", sqlite_store.configure_connection)
+    return sqlite_engine
+
+def _create_engine(url, statement_timeout_ms):
+    """Engine with the configured pool settings and server-side statement timeout"""
+    if IS_SQLITE:
+        return _create_sqlite_engine(url)
+    connect_args = {}
+    if statement_timeout_ms > 0 and make_url(url).get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+# Primary: all writes, plus reads that must see the caller's own writes
+engine = _create_engine(DATABASE_URL, DB_STATEMENT_TIMEOUT_MS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Replicas for read-only traffic (falls back to the primary when none are configured)
+# (SQLite in WAL mode reads concurrently with the writer, replicas do not apply)
+read_engines = [] if IS_SQLITE else [_create_engine(url, DB_READ_STATEMENT_TIMEOUT_MS) for url in READ_REPLICA_URLS]
+_read_sessionmakers = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in read_engines] or [SessionLocal]
+_next_replica = itertools.count()
+
+def ReadSessionLocal():
+    """Session on the next read replica (round robin)"""
+    return _read_sessionmakers[next(_next_replica) % len(_read_sessionmakers)]()
+
 Base = declarative_base()
 
+def dispose_after_fork():
+    """Drop pooled connections inherited from the parent process without closing them under it"""
+    for e in [engine] + read_engines:
+        e.dispose(close=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def pool_stats():
+    """Live pool statistics for the primary and every replica"""
+    def describe(role, e):
+        pool = e.pool
+        stats = {"role": role, "url": make_url(str(e.url)).render_as_string(hide_password=True), "status": pool.status()}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+    return [describe("primary", engine)] + [describe(f"replica-{i}", e) for i, e in enumerate(read_engines)]
@@ -0,0 +1,172 @@
+"""
+Response encoding for bulk report reads
+Content negotiation (JSON / columnar JSON / MessagePack / Arrow IPC) and
+gzip / brotli compression above a size threshold
+"""
+import gzip
+import json
+from datetime import datetime
+from fastapi import Request, Response
+from .config import COMPRESSION_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+# Optional dependencies - the matching formats are simply not offered without them
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.garbage.columns+json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Prefixes stripped from every row in the columnar formats and sent once instead
+COLUMN_PREFIXES = {
+    "image_path": "/uploads/",
+    "boxed_image_path": "/annotated/",
+    "thumbnail_url": "/media/uploads/thumb/",
+    "boxed_thumbnail_url": "/media/annotated/thumb/",
+}
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def to_columns(rows):
+    """
+    Turn a list of report dicts into a column-oriented dict
+
+    Keys are sent once instead of once per row and the URL prefixes in
+    COLUMN_PREFIXES are stripped (clients add them back from "prefixes").
+    """
+    columns = list(rows[0].keys()) if rows else []
+    data = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        prefix = COLUMN_PREFIXES.get(column)
+        if prefix:
+            values = [v[len(prefix):] if isinstance(v, str) and v.startswith(prefix) else v for v in values]
+        if any(isinstance(v, datetime) for v in values):
+            values = [v.isoformat() if v is not None else None for v in values]
+        data[column] = values
+    return {
+        "count": len(rows),
+        "columns": columns,
+        "prefixes": {c: p for c, p in COLUMN_PREFIXES.items() if c in data},
+        "data": data,
+    }
+
+
+def encode(rows, media_type):
+    """Serialize report rows for the given media type, returns bytes"""
+    if media_type == JSON:
+        return json.dumps(rows, default=_default, separators=(",", ":")).encode("utf-8")
+
+    columns = to_columns(rows)
+    if media_type == COLUMNAR_JSON:
+        return json.dumps(columns, separators=(",", ":")).encode("utf-8")
+    if media_type == MSGPACK:
+        return msgpack.packb(columns, use_bin_type=True)
+    if media_type == ARROW:
+        table = pa.table(columns["data"])
+        table = table.replace_schema_metadata({"prefixes": json.dumps(columns["prefixes"])})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def available_media_types():
+    """Media types this process can produce, in server preference order"""
+    types = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        types.append(MSGPACK)
+    if pa is not None:
+        types.append(ARROW)
+    return types
+
+
+def _parse_accept(header):
+    """Parse an Accept-style header into {token: q}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_media_type(request: Request):
+    """Pick the response format from the Accept header (JSON by default)"""
+    accepted = _parse_accept(request.headers.get("accept"))
+    best, best_q = JSON, 0.0
+    for media_type in available_media_types():
+        q = accepted.get(media_type, 0.0)
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def negotiate_encoding(request: Request):
+    """Pick the content coding from Accept-Encoding: 'br', 'gzip' or None"""
+    accepted = _parse_accept(request.headers.get("accept-encoding"))
+    if brotli is not None and accepted.get("br", 0.0) > 0:
+        return "br"
+    if accepted.get("gzip", 0.0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, coding):
+    """Compress a body with 'br' or 'gzip'"""
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def _respond(request: Request, body, media_type):
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    coding = negotiate_encoding(request)
+    if coding and len(body) >= COMPRESSION_MIN_BYTES:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def reports_response(request: Request, rows):
+    """Response for a list of report dicts, negotiated and compressed"""
+    media_type = negotiate_media_type(request)
+    return _respond(request, encode(rows, media_type), media_type)
+
+
+def json_response(request: Request, payload):
+    """Plain JSON response, compressed when the client allows it"""
+    body = json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+    return _respond(request, body, JSON)
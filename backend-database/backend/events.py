@@ -0,0 +1,28 @@
+"""
+In-process change notifications for garbage reports
+Writers publish one ReportChange per committed transaction, caches subscribe
+"""
+from collections import namedtuple
+
+# kind: 'created', 'status' or 'sighting'
+# report_ids: ids touched by the change
+# points: (lon, lat) of every touched report
+# statuses: statuses involved (new status, plus the previous ones when known)
+ReportChange = namedtuple("ReportChange", ["kind", "report_ids", "points", "statuses"])
+
+_subscribers = []
+
+
+def subscribe(callback):
+    """Register callback(change) to run after every published change"""
+    _subscribers.append(callback)
+    return callback
+
+
+def publish(change):
+    """Notify every subscriber; a failing subscriber does not stop the others"""
+    for callback in list(_subscribers):
+        try:
+            callback(change)
+        except Exception as e:
+            print(f"[EVENTS ERROR] Subscriber {getattr(callback, '__name__', callback)} failed: {e}")
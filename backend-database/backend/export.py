@@ -0,0 +1,176 @@
+"""
+Streaming export of all garbage reports (NDJSON / CSV / GeoJSON)
+Rows are read through a server-side cursor so memory use stays constant
+regardless of the dataset size
+
+CLI (run from backend-database/):
+    python -m backend.export --format geojson --status pending -o reports.geojson
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from sqlalchemy import select, func
+from . import models, crud, db as database
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "geojson": "application/geo+json",
+}
+
+COLUMNS = ["id", "image_path", "boxed_image_path", "prediction", "confidence",
+           "status", "latitude", "longitude", "created_at", "sighting_count", "last_seen_at"]
+
+ROWS_PER_FETCH = 5000     # rows pulled from the server-side cursor at a time
+CHUNK_SIZE = 64 * 1024    # bytes of output buffered before yielding
+
+
+def build_query(status=None, prediction=None, start=None, end=None, bbox=None):
+    """
+    Select the export columns with optional filters
+
+    Args:
+        status: 'pending' or 'cleaned'
+        prediction: predicted class name
+        start, end: created_at range (start inclusive, end exclusive)
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+    """
+    report = models.GarbageReport
+    query = select(
+        report.id,
+        report.image_path,
+        report.boxed_image_path,
+        report.prediction,
+        report.confidence,
+        report.status,
+        func.ST_Y(report.geom).label("latitude"),
+        func.ST_X(report.geom).label("longitude"),
+        report.created_at,
+        report.sighting_count,
+        report.last_seen_at,
+    )
+    if status:
+        query = query.where(report.status == status)
+    if prediction:
+        query = query.where(report.prediction == prediction)
+    if start:
+        query = query.where(report.created_at >= start)
+    if end:
+        query = query.where(report.created_at < end)
+    if bbox:
+        query = query.where(crud.in_bbox(report.geom, report.id, bbox))
+    return query.order_by(report.id)
+
+
+def iter_rows(session, query):
+    """Yield export rows as dicts, fetching ROWS_PER_FETCH at a time"""
+    result = session.execute(query.execution_options(yield_per=ROWS_PER_FETCH))
+    for row in result:
+        yield row._asdict()
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _ndjson(rows):
+    for row in rows:
+        yield json.dumps({k: _value(v) for k, v in row.items()}, separators=(",", ":")) + "\n"
+
+
+def _csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_value(row[c]) for c in COLUMNS])
+        yield buffer.getvalue()
+
+
+def _geojson(rows):
+    yield '{"type":"FeatureCollection","features":['
+    separator = ""
+    for row in rows:
+        properties = {k: _value(v) for k, v in row.items() if k not in ("latitude", "longitude")}
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [row["longitude"], row["latitude"]]},
+            "properties": properties,
+        }
+        yield separator + json.dumps(feature, separators=(",", ":"))
+        separator = ","
+    yield "]}\n"
+
+
+_WRITERS = {"ndjson": _ndjson, "csv": _csv, "geojson": _geojson}
+
+
+def stream_export(fmt, **filters):
+    """
+    Yield the export as UTF-8 byte chunks of about CHUNK_SIZE
+
+    Opens its own read-replica session so it can outlive the request handler
+    that returned the streaming response.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    session = database.ReadSessionLocal()
+    try:
+        rows = iter_rows(session, build_query(**filters))
+        parts = []
+        size = 0
+        for part in _WRITERS[fmt](rows):
+            parts.append(part)
+            size += len(part)
+            if size >= CHUNK_SIZE:
+                yield "".join(parts).encode("utf-8")
+                parts = []
+                size = 0
+        if parts:
+            yield "".join(parts).encode("utf-8")
+    finally:
+        session.close()
+
+
+def _parse_bbox(value):
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    return tuple(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export garbage reports")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--status", choices=["pending", "cleaned"])
+    parser.add_argument("--prediction", help="Predicted class name")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="created_at >= (ISO date)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="created_at < (ISO date)")
+    parser.add_argument("--bbox", type=_parse_bbox, help="min_lon,min_lat,max_lon,max_lat")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in stream_export(args.format, status=args.status, prediction=args.prediction,
+                                   start=args.start, end=args.end, bbox=args.bbox):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    print(f"[EXPORT] Wrote {written} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Plain-Python geodesy helpers (WGS84 lon/lat in degrees, distances in metres)"""
+import math
+
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = 111320.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat, lon, radius_m):
+    """Bounding box (min_lon, min_lat, max_lon, max_lat) containing the circle of radius_m around a point"""
+    dlat = radius_m / METRES_PER_DEGREE
+    dlon = radius_m / (METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return (max(lon - dlon, -180.0), max(lat - dlat, -90.0), min(lon + dlon, 180.0), min(lat + dlat, 90.0))
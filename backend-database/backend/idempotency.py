@@ -0,0 +1,267 @@
+"""
+Idempotency-Key support for the upload endpoints
+A client sends the same Idempotency-Key header on every retry of one upload.
+The first request runs and its response is kept in idempotency_keys until it
+expires; retries get that response back (marked Idempotent-Replayed) instead
+of saving the image, running the model and inserting a report again.
+Duplicates that arrive while the first request is still running wait for
+it: on a shared future within the process, by polling the key's row across
+worker processes.
+A key is bound to the path and the body of its first request: reusing it on
+another endpoint or with a different body is rejected with 422 rather than
+answered with a response that belongs to another upload. Bodies are compared
+by a SHA-256 fingerprint that ignores the multipart boundary, which clients
+pick anew on every retry.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.responses import Response
+from . import models, db as database
+from .config import IDEMPOTENCY_TTL_HOURS, IDEMPOTENCY_WAIT_SECONDS, IDEMPOTENCY_LOCK_SECONDS
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+ENDPOINTS = ("/predict", "/upload-report")
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+PURGE_INTERVAL_SECONDS = 600
+
+_in_flight = {}  # (event loop, key) -> (path, asyncio.Future resolved with the response tuple or None on failure)
+_last_purge = 0.0
+
+
+class Fingerprint:
+    """SHA-256 of a request body fed in chunks, with its multipart boundary left out"""
+
+    def __init__(self, content_type):
+        self._hash = hashlib.sha256()
+        self._delimiter = None
+        self._tail = b""
+        for param in (content_type or "").split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "boundary" and value.strip('"'):
+                self._delimiter = b"--" + value.strip('"').encode("latin-1")
+
+    def update(self, chunk):
+        if self._delimiter is None:
+            self._hash.update(chunk)
+            return
+        # Hold back the last len(delimiter) - 1 bytes: a delimiter may continue in the next chunk
+        parts = (self._tail + chunk).split(self._delimiter)
+        last = parts.pop()
+        split = max(len(last) - (len(self._delimiter) - 1), 0)
+        self._hash.update(b"".join(part + b"--" for part in parts) + last[:split])
+        self._tail = last[split:]
+
+    def hexdigest(self):
+        digest = self._hash.copy()
+        digest.update(self._tail)
+        return digest.hexdigest()
+
+
+async def _fingerprint(request):
+    """Fingerprint of a request that will not be handled, read whole"""
+    fingerprint = Fingerprint(request.headers.get("content-type"))
+    fingerprint.update(await request.body())
+    return fingerprint.hexdigest()
+
+
+def _purge_expired(session, now):
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    deleted = session.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < now)).rowcount
+    if deleted:
+        print(f"[IDEMPOTENCY] Purged {deleted} expired key(s)")
+
+
+def claim(key, endpoint):
+    """
+    Try to become the request that handles key
+
+    Returns:
+        tuple: (claimed, row) - row is a dict of the existing key when not claimed
+    """
+    key_model = models.IdempotencyKey
+    dialect = sqlite if database.IS_SQLITE else postgresql
+    now = datetime.utcnow()
+    session = database.SessionLocal()
+    try:
+        _purge_expired(session, now)
+        stmt = dialect.insert(key_model).values(
+            key=key, endpoint=endpoint, state=IN_PROGRESS, created_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        ).on_conflict_do_nothing(index_elements=["key"])
+        if session.execute(stmt).rowcount == 1:
+            session.commit()
+            return True, None
+
+        row = session.get(key_model, key)
+        if row is None:
+            session.commit()
+            return claim(key, endpoint)  # released between the insert and the read
+        abandoned = row.state == IN_PROGRESS and (now - row.created_at).total_seconds() > IDEMPOTENCY_LOCK_SECONDS
+        if row.expires_at < now or abandoned:
+            # Take the key over from an expired response or a worker that died mid-request
+            taken = session.execute(
+                update(key_model)
+                .where(key_model.key == key, key_model.created_at == row.created_at)
+                .values(endpoint=endpoint, state=IN_PROGRESS, status_code=None, content_type=None, body=None,
+                        request_hash=None, created_at=now, expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+            if taken:
+                return True, None
+            return claim(key, endpoint)
+        result = {
+            "endpoint": row.endpoint,
+            "state": row.state,
+            "status_code": row.status_code,
+            "content_type": row.content_type,
+            "body": row.body,
+            "request_hash": row.request_hash,
+        }
+        session.commit()
+        return False, result
+    finally:
+        session.close()
+
+
+def complete(key, status_code, content_type, body, request_hash):
+    """Store the response of a claimed key, with the fingerprint of the request body (None if not fully read)"""
+    key_model = models.IdempotencyKey
+    session = database.SessionLocal()
+    try:
+        session.execute(
+            update(key_model)
+            .where(key_model.key == key)
+            .values(state=DONE, status_code=status_code, content_type=content_type, body=body,
+                    request_hash=request_hash)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def release(key):
+    """Give up a claimed key after a failure, so a retry runs the request again"""
+    session = database.SessionLocal()
+    try:
+        session.execute(delete(models.IdempotencyKey).where(
+            models.IdempotencyKey.key == key, models.IdempotencyKey.state == IN_PROGRESS))
+        session.commit()
+    finally:
+        session.close()
+
+
+def _replay(stored):
+    status_code, content_type, body, _ = stored
+    return Response(content=body, status_code=status_code, media_type=content_type, headers={REPLAY_HEADER: "true"})
+
+
+def _used_on(path):
+    return JSONResponse({"detail": f"{HEADER} was already used on {path}"}, status_code=422)
+
+
+async def _answer(stored, request):
+    """Replay stored to a retry, unless the retry's body differs from the first request's"""
+    if stored[3] is not None and await _fingerprint(request) != stored[3]:
+        return JSONResponse({"detail": f"{HEADER} was already used with a different request body"}, status_code=422)
+    return _replay(stored)
+
+
+async def _run(key, request, call_next):
+    """Handle the request once per key across workers, returns (response, stored tuple or None)"""
+    path = request.url.path
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.1
+    while True:
+        claimed, row = await run_in_threadpool(claim, key, path)
+        if claimed:
+            break
+        if row["endpoint"] != path:
+            return _used_on(row["endpoint"]), None
+        if row["state"] == DONE:
+            stored = (row["status_code"], row["content_type"], row["body"].encode("utf-8"), row["request_hash"])
+            return await _answer(stored, request), stored
+        if time.monotonic() >= deadline:
+            return JSONResponse({"detail": f"A request with this {HEADER} is still in progress"}, status_code=409), None
+        # Another worker process is handling it
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+    # Fingerprint the body as the endpoint reads it
+    fingerprint = Fingerprint(request.headers.get("content-type"))
+    receive = request._receive
+    body_read = False
+
+    async def fingerprinting_receive():
+        nonlocal body_read
+        message = await receive()
+        if message["type"] == "http.request":
+            fingerprint.update(message.get("body", b""))
+            body_read = not message.get("more_body", False)
+        return message
+
+    request._receive = fingerprinting_receive
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        await run_in_threadpool(release, key)
+        raise
+
+    if response.status_code >= 500:
+        # Server-side failures are not final: let a retry run again
+        await run_in_threadpool(release, key)
+        stored = None
+    else:
+        request_hash = fingerprint.hexdigest() if body_read else None
+        stored = (response.status_code, response.media_type or response.headers.get("content-type"), body, request_hash)
+        await run_in_threadpool(complete, key, response.status_code, stored[1], body.decode("utf-8"), request_hash)
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return Response(content=body, status_code=response.status_code, headers=headers), stored
+
+
+async def handle(request, call_next):
+    """HTTP middleware: run keyed POSTs to ENDPOINTS at most once, pass everything else through"""
+    key = request.headers.get(HEADER)
+    if request.method != "POST" or request.url.path not in ENDPOINTS or not key:
+        return await call_next(request)
+    if len(key) > MAX_KEY_LENGTH:
+        return JSONResponse({"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}, status_code=400)
+
+    loop = asyncio.get_running_loop()
+    path = request.url.path
+    in_flight = _in_flight.get((loop, key))
+    if in_flight is not None:
+        first_path, future = in_flight
+        if first_path != path:
+            return _used_on(first_path)
+        # Same process: wait for the first request instead of polling the table
+        stored = await asyncio.shield(future)
+        if stored is None:
+            return JSONResponse({"detail": f"The first request with this {HEADER} failed, retry"}, status_code=503)
+        return await _answer(stored, request)
+
+    future = loop.create_future()
+    _in_flight[(loop, key)] = (path, future)
+    stored = None
+    try:
+        response, stored = await _run(key, request, call_next)
+        return response
+    finally:
+        del _in_flight[(loop, key)]
+        future.set_result(stored)
@@ -0,0 +1,135 @@
+"""
+Group-commit writer for new reports
+Uploads hand their report to a background thread that collects everything
+arriving within INGEST_MAX_WAIT_MS (up to INGEST_MAX_BATCH reports) and
+writes it in one transaction with crud.ingest_reports. Each caller blocks
+until that transaction has committed, so a response is only sent for a
+durable report.
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from . import crud, db as database
+from .config import INGEST_GROUP_COMMIT, INGEST_MAX_BATCH, INGEST_MAX_WAIT_MS
+
+# merged: the report was attached to an existing nearby report as a sighting
+IngestResult = namedtuple("IngestResult", ["id", "sighting_count", "merged"])
+
+
+class IngestWriter:
+    """Background thread batching report inserts into shared transactions"""
+
+    def __init__(self, max_batch=INGEST_MAX_BATCH, max_wait_ms=INGEST_MAX_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.reports = 0
+        self.fallbacks = 0
+
+    def _ensure_started(self):
+        # Started lazily so forked worker processes get their own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue one report (dict as for crud.bulk_create_garbage_reports)
+
+        Returns:
+            Future resolving to an IngestResult once committed
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def create(self, item, timeout=None):
+        """Queue one report and wait for its commit, returns IngestResult"""
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        """Block for the first report, then gather more until the batch is full or the wait is over"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        session = database.SessionLocal()
+        try:
+            return crud.ingest_reports(session, [item for item, _ in batch])
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _flush(self, batch):
+        try:
+            results = self._write(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One bad report must not fail the others: retry them one by one
+            print(f"[INGEST WARNING] Batch of {len(batch)} failed ({e}), writing reports individually")
+            self.fallbacks += 1
+            for entry in batch:
+                self._flush([entry])
+            return
+
+        self.batches += 1
+        self.reports += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(IngestResult(*result))
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._flush(batch)
+            except BaseException as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "reports": self.reports,
+            "fallbacks": self.fallbacks,
+            "avg_batch": round(self.reports / self.batches, 2) if self.batches else 0,
+        }
+
+
+writer = IngestWriter()
+
+
+def create_report(item):
+    """
+    Create (or merge) one report and return its IngestResult once committed
+
+    Goes through the group-commit writer unless INGEST_GROUP_COMMIT is off.
+    """
+    if INGEST_GROUP_COMMIT:
+        return writer.create(item)
+    session = database.SessionLocal()
+    try:
+        return IngestResult(*crud.ingest_reports(session, [item])[0])
+    finally:
+        session.close()
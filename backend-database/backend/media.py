@@ -0,0 +1,161 @@
+"""
+Image serving for /uploads, /annotated and /media
+Image names never change once written, so responses carry immutable cache
+headers and strong ETags, support single byte ranges, and can hand the byte
+transfer to a front proxy (X-Accel-Redirect / X-Sendfile)
+"""
+import mimetypes
+import os
+import re
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from . import storage
+from .config import IMAGE_CACHE_MAX_AGE, IMAGE_OFFLOAD, IMAGE_OFFLOAD_PREFIX
+
+CACHE_CONTROL = f"public, max-age={IMAGE_CACHE_MAX_AGE}, immutable"
+OFFLOAD_HEADERS = {
+    "x-accel-redirect": "X-Accel-Redirect",  # nginx: internal location under IMAGE_OFFLOAD_PREFIX
+    "x-sendfile": "X-Sendfile",              # Apache mod_xsendfile / lighttpd: absolute path
+}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def strong_etag(name, stat_result):
+    """Content digest for content-addressed names, otherwise derived from inode, mtime and size"""
+    if storage.is_content_addressed(name):
+        return '"' + os.path.splitext(os.path.basename(name))[0] + '"'
+    return f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def parse_range(header, size):
+    """
+    Parse a single 'bytes=' range
+
+    Returns:
+        (start, end) inclusive, None for no usable range (serve everything),
+        or False when the range cannot be satisfied
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match or (not match.group(1) and not match.group(2)):
+        return None  # absent, malformed or multi-range: ignore and send the whole file
+    first, last = match.group(1), match.group(2)
+    if not first:
+        length = int(last)  # suffix range: the last N bytes
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """206 response streaming bytes start..end (inclusive) of a file"""
+
+    def __init__(self, path, start, end, size, headers, media_type, method):
+        super().__init__(status_code=206, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_header_only = method.upper() == "HEAD"
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def image_response(full_path, name, stat_result, request_headers, method="GET", offload_uri=None, media_type=None):
+    """
+    Build the response for an image file
+
+    Args:
+        full_path: Absolute path of the file
+        name: Name relative to its root (used for the ETag)
+        request_headers: starlette Headers of the request
+        offload_uri: URI the front proxy serves the file under (X-Accel-Redirect mode)
+    """
+    etag = strong_etag(name, stat_result)
+    media_type = media_type or mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    headers = {
+        "etag": etag,
+        "cache-control": CACHE_CONTROL,
+        "accept-ranges": "bytes",
+    }
+
+    if _etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Let the front proxy copy the bytes (it also handles ranges itself)
+    offload_header = OFFLOAD_HEADERS.get(IMAGE_OFFLOAD)
+    if offload_header:
+        target = offload_uri if IMAGE_OFFLOAD == "x-accel-redirect" else full_path
+        if target:
+            headers[offload_header] = target
+            return Response(status_code=200, headers=headers, media_type=media_type)
+
+    size = stat_result.st_size
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            return FileRangeResponse(full_path, start, end, size, headers, media_type, method)
+
+    return FileResponse(full_path, headers=headers, media_type=media_type, stat_result=stat_result, method=method)
+
+
+class ImageFiles(StaticFiles):
+    """StaticFiles with immutable caching, strong ETags, Range support and proxy offload"""
+
+    def __init__(self, *args, offload_prefix=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.offload_prefix = offload_prefix
+
+    def lookup_path(self, path):
+        # Dot-files and dot-directories are never images, e.g. storage's fallback staging directory
+        if any(part.startswith(".") for part in path.split(os.sep) if part not in ("", ".")):
+            return "", None
+        return super().lookup_path(path)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        name = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        offload_uri = f"{self.offload_prefix.rstrip('/')}/{name}" if self.offload_prefix else None
+        return image_response(full_path, name, stat_result, Headers(scope=scope), scope["method"], offload_uri)
+
+
+def offload_prefix(mount_name):
+    """X-Accel-Redirect prefix for a mount, e.g. /_images/uploads"""
+    return f"{IMAGE_OFFLOAD_PREFIX.rstrip('/')}/{mount_name}"
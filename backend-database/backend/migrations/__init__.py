@@ -0,0 +1,212 @@
+"""
+Versioned schema migrations
+Revisions live in this package as rNNNN_<name>.py modules and are applied in
+order. Each one is idempotent and recorded in the schema_migrations table.
+
+A revision module defines:
+    revision      - "NNNN"
+    description   - one line
+    transactional - False for statements that cannot run in a transaction
+                    (CREATE INDEX CONCURRENTLY); defaults to True
+    upgrade(conn) - applies the change on a SQLAlchemy connection
+
+CLI (run from backend-database/):
+    python -m backend.migrations status
+    python -m backend.migrations upgrade [--to NNNN] [--plans]
+    python -m backend.migrations plans
+"""
+import importlib
+import pkgutil
+from sqlalchemy import text
+from .. import sqlite_store
+from ..db import engine, IS_SQLITE
+
+VERSION_TABLE = "schema_migrations"
+
+# Queries behind the hot endpoints, used to show plans before/after a migration
+HOT_QUERIES = {
+    "reports-in-area": """
+        SELECT * FROM garbage_reports
+        WHERE geom && ST_MakeEnvelope(73.80, 18.48, 73.90, 18.56, 4326)
+    """,
+    "reports-by-status": """
+        SELECT * FROM garbage_reports
+        WHERE status = 'pending'
+        ORDER BY created_at DESC
+        OFFSET 0 LIMIT 100
+    """,
+    "reports-recent": """
+        SELECT * FROM garbage_reports
+        WHERE created_at >= now() - interval '7 days'
+    """,
+    "reports-nearby": """
+        SELECT id, ST_Distance(geom::geography, ST_SetSRID(ST_MakePoint(73.85, 18.52), 4326)::geography)
+        FROM garbage_reports
+        WHERE status = 'pending'
+        ORDER BY geom::geography <-> ST_SetSRID(ST_MakePoint(73.85, 18.52), 4326)::geography
+        LIMIT 20
+    """,
+    "detections-search": """
+        SELECT d.*, r.status FROM report_detections d
+        JOIN garbage_reports r ON r.id = d.report_id AND r.created_at = d.created_at
+        WHERE d.class_name = 'Cigarette' AND d.confidence >= 0.6
+          AND d.created_at >= now() - interval '7 days'
+          AND r.status = 'pending'
+        ORDER BY d.created_at DESC, d.confidence DESC
+        LIMIT 100
+    """,
+}
+
+
+def load_revisions():
+    """All revision modules, sorted by revision number"""
+    revisions = []
+    for module_info in pkgutil.iter_modules(__path__):
+        if module_info.name.startswith("r") and module_info.name[1:5].isdigit():
+            revisions.append(importlib.import_module(f"{__name__}.{module_info.name}"))
+    revisions.sort(key=lambda module: module.revision)
+    return revisions
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            revision VARCHAR(16) PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def applied_revisions():
+    """Set of revision numbers already applied"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return set(conn.execute(text(f"SELECT revision FROM {VERSION_TABLE}")).scalars())
+
+
+def _record(conn, module):
+    conn.execute(
+        text(f"INSERT INTO {VERSION_TABLE} (revision, description) VALUES (:revision, :description) ON CONFLICT DO NOTHING"),
+        {"revision": module.revision, "description": module.description},
+    )
+
+
+def create_index_concurrently(conn, name, ddl):
+    """
+    Run a CREATE INDEX CONCURRENTLY IF NOT EXISTS statement safely
+
+    A failed concurrent build leaves an INVALID index behind that IF NOT EXISTS
+    would silently keep, so such leftovers are dropped and rebuilt.
+    """
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": name}).first()
+    if invalid:
+        print(f"[MIGRATION] Dropping invalid index {name} left by an earlier failed build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(ddl))
+
+
+def create_partitioned_index_concurrently(conn, table, name, definition):
+    """
+    Build an index on a partitioned table without blocking writes
+
+    PostgreSQL cannot build a partitioned index CONCURRENTLY, so the parent
+    index is created ON ONLY the parent, each partition's index is built
+    concurrently and attached; the parent index is valid once all are attached.
+
+    Args:
+        definition: what follows the table name, e.g. "USING gist ((geom::geography))"
+    """
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}"))
+    children = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": table}).scalars().all()
+    for child in children:
+        child_index = f"{name}_{child.removeprefix(table + '_')}"
+        create_index_concurrently(conn, child_index,
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child_index} ON {child} {definition}")
+        attached = conn.execute(text("SELECT 1 FROM pg_inherits WHERE inhrelid = CAST(:index AS regclass)"),
+                                {"index": child_index}).first()
+        if not attached:
+            conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {child_index}"))
+
+
+def explain(conn, sql, analyze=False):
+    """EXPLAIN output of a query as one string"""
+    options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+    rows = conn.execute(text(f"EXPLAIN ({options}) {sql}")).scalars()
+    return "\n".join(rows)
+
+
+def query_plans(analyze=False):
+    """EXPLAIN every HOT_QUERIES entry, returns {name: plan}"""
+    plans = {}
+    with engine.connect() as conn:
+        for name, sql in HOT_QUERIES.items():
+            try:
+                plans[name] = explain(conn, sql, analyze)
+            except Exception as e:
+                conn.rollback()
+                plans[name] = f"(not available: {e})"
+    return plans
+
+
+def _print_plans(title, plans):
+    print(f"\n===== {title} =====")
+    for name, plan in plans.items():
+        print(f"--- {name}")
+        print(plan)
+
+
+def upgrade(target=None, show_plans=False):
+    """Apply every pending revision up to and including target (default: all)"""
+    if IS_SQLITE:
+        # The embedded schema is created whole, revisions are PostgreSQL-only
+        sqlite_store.create_schema(engine)
+        print("[MIGRATION] SQLite schema is up to date")
+        return []
+
+    applied = applied_revisions()
+    pending = [m for m in load_revisions() if m.revision not in applied and (target is None or m.revision <= target)]
+
+    if not pending:
+        print("[MIGRATION] Database is up to date")
+        return []
+
+    before = query_plans() if show_plans else None
+
+    for module in pending:
+        print(f"[MIGRATION] Applying {module.revision}: {module.description}")
+        if getattr(module, "transactional", True):
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                _record(conn, module)
+        else:
+            with engine.connect() as conn:
+                conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+                module.upgrade(conn)
+                _record(conn, module)
+        print(f"[MIGRATION] ✓ {module.revision} applied")
+
+    if show_plans:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE garbage_reports"))
+        _print_plans("Plans before", before)
+        _print_plans("Plans after", query_plans())
+
+    return [m.revision for m in pending]
+
+
+def status():
+    """Print applied and pending revisions"""
+    if IS_SQLITE:
+        print("  SQLite mode: schema is managed by backend.sqlite_store")
+        return
+    applied = applied_revisions()
+    for module in load_revisions():
+        mark = "applied" if module.revision in applied else "pending"
+        print(f"  {module.revision}  [{mark:>7}]  {module.description}")
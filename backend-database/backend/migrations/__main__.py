@@ -0,0 +1,22 @@
+import argparse
+from . import upgrade, status, query_plans, _print_plans
+
+parser = argparse.ArgumentParser(prog="python -m backend.migrations", description="Schema migrations")
+commands = parser.add_subparsers(dest="command", required=True)
+
+upgrade_parser = commands.add_parser("upgrade", help="Apply pending revisions")
+upgrade_parser.add_argument("--to", dest="target", help="Stop after this revision")
+upgrade_parser.add_argument("--plans", action="store_true", help="Print hot query plans before and after")
+
+commands.add_parser("status", help="List revisions and whether they are applied")
+
+plans_parser = commands.add_parser("plans", help="Print the plans of the hot queries")
+plans_parser.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE (runs the queries)")
+
+args = parser.parse_args()
+if args.command == "upgrade":
+    upgrade(args.target, args.plans)
+elif args.command == "status":
+    status()
+elif args.command == "plans":
+    _print_plans("Plans", query_plans(args.analyze))
@@ -0,0 +1,21 @@
+"""Baseline: PostGIS and the original garbage_reports table"""
+from sqlalchemy import text
+
+revision = "0001"
+description = "PostGIS extension and garbage_reports table"
+
+
+def upgrade(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS garbage_reports (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            image_path VARCHAR NOT NULL,
+            prediction VARCHAR,
+            confidence DOUBLE PRECISION,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            geom geometry(POINT, 4326)
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_garbage_reports_id ON garbage_reports (id)"))
@@ -0,0 +1,9 @@
+"""Annotated image column (was add_boxed_column_migration.py)"""
+from sqlalchemy import text
+
+revision = "0002"
+description = "garbage_reports.boxed_image_path"
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE garbage_reports ADD COLUMN IF NOT EXISTS boxed_image_path TEXT"))
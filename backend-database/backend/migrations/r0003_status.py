@@ -0,0 +1,9 @@
+"""Report status column (was add_status_column_migration.py)"""
+from sqlalchemy import text
+
+revision = "0003"
+description = "garbage_reports.status"
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE garbage_reports ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'pending' NOT NULL"))
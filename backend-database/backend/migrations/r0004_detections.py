@@ -0,0 +1,9 @@
+"""Per-object detections column (was migrate_db.py)"""
+from sqlalchemy import text
+
+revision = "0004"
+description = "garbage_reports.detections (JSONB)"
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE garbage_reports ADD COLUMN IF NOT EXISTS detections JSONB"))
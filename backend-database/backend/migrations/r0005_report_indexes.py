@@ -0,0 +1,21 @@
+"""Indexes for the hot read paths, built without blocking writes"""
+from . import create_index_concurrently
+
+revision = "0005"
+description = "GiST index on geom, btree indexes on (status, created_at) and created_at"
+transactional = False  # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+
+
+def upgrade(conn):
+    # /reports-in-area: geom && ST_MakeEnvelope(...)
+    # (same name GeoAlchemy2 uses, so tables made by create_all are not indexed twice)
+    create_index_concurrently(conn, "idx_garbage_reports_geom",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_garbage_reports_geom ON garbage_reports USING gist (geom)")
+
+    # /reports/by-status/{status}: WHERE status = ? ORDER BY created_at DESC
+    create_index_concurrently(conn, "ix_garbage_reports_status_created_at",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_garbage_reports_status_created_at ON garbage_reports (status, created_at DESC)")
+
+    # time-filtered queries and exports
+    create_index_concurrently(conn, "ix_garbage_reports_created_at",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_garbage_reports_created_at ON garbage_reports (created_at)")
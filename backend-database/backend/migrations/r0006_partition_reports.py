@@ -0,0 +1,73 @@
+"""
+Monthly range partitioning of garbage_reports on created_at
+
+The existing table is renamed, a partitioned table with the same columns is
+created in its place (primary key (id, created_at), a default partition, a
+BRIN index on created_at), rows are copied over month by month and the old
+table is dropped. Report ids keep coming from the same sequence.
+"""
+from datetime import datetime
+from sqlalchemy import text
+from .. import partitions
+
+revision = "0006"
+description = "Partition garbage_reports by month on created_at, BRIN index on created_at"
+
+OLD_TABLE = "garbage_reports_unpartitioned"
+COLUMNS = "id, user_id, image_path, boxed_image_path, prediction, confidence, detections, status, created_at, geom"
+
+
+def upgrade(conn):
+    if partitions.is_partitioned(conn):
+        return
+
+    conn.execute(text("LOCK TABLE garbage_reports IN ACCESS EXCLUSIVE MODE"))
+    conn.execute(text(f"ALTER TABLE garbage_reports RENAME TO {OLD_TABLE}"))
+    # Free the index names for the new table
+    for name in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": OLD_TABLE}).scalars():
+        conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_unpartitioned"'))
+    # Keep the id sequence alive when the old table is dropped
+    conn.execute(text("ALTER SEQUENCE garbage_reports_id_seq OWNED BY NONE"))
+
+    conn.execute(text("""
+        CREATE TABLE garbage_reports (
+            id INTEGER NOT NULL DEFAULT nextval('garbage_reports_id_seq'),
+            user_id INTEGER,
+            image_path VARCHAR NOT NULL,
+            boxed_image_path VARCHAR,
+            prediction VARCHAR,
+            confidence DOUBLE PRECISION,
+            detections JSONB,
+            status VARCHAR(20) DEFAULT 'pending' NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            geom geometry(POINT, 4326),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """))
+    conn.execute(text(f"CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF garbage_reports DEFAULT"))
+    conn.execute(text("ALTER SEQUENCE garbage_reports_id_seq OWNED BY garbage_reports.id"))
+
+    # Indexes are declared on the parent and cascade to every partition
+    conn.execute(text("CREATE INDEX ix_garbage_reports_id ON garbage_reports (id)"))
+    conn.execute(text("CREATE INDEX idx_garbage_reports_geom ON garbage_reports USING gist (geom)"))
+    conn.execute(text("CREATE INDEX ix_garbage_reports_status_created_at ON garbage_reports (status, created_at DESC)"))
+    conn.execute(text("CREATE INDEX brin_garbage_reports_created_at ON garbage_reports USING brin (created_at)"))
+
+    # One partition per month that has data, plus the upcoming months
+    first, last = conn.execute(text(f"SELECT min(created_at), max(created_at) FROM {OLD_TABLE}")).first()
+    this_month = partitions.month_start(datetime.utcnow())
+    first = partitions.month_start(first) if first else this_month
+    last = max(partitions.month_start(last) if last else this_month, this_month)
+    partitions.create_partitions(conn, first, partitions.add_months(last, partitions.PARTITION_MONTHS_AHEAD))
+
+    # Rows without a timestamp predate the column default; file them under now
+    conn.execute(text(f"""
+        INSERT INTO garbage_reports ({COLUMNS})
+        SELECT id, user_id, image_path, boxed_image_path, prediction, confidence, detections, status,
+               COALESCE(created_at, now() AT TIME ZONE 'utc'), geom
+        FROM {OLD_TABLE}
+        ORDER BY created_at
+    """))
+    conn.execute(text(f"DROP TABLE {OLD_TABLE}"))
+    conn.execute(text("SELECT setval('garbage_reports_id_seq', COALESCE((SELECT max(id) FROM garbage_reports), 0) + 1, false)"))
+    conn.execute(text("ANALYZE garbage_reports"))
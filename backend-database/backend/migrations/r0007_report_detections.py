@@ -0,0 +1,58 @@
+"""
+Searchable per-object detections
+
+Makes sure garbage_reports.detections is JSONB (the model used to declare
+JSON) and gives every entry of detections->'all' a row in report_detections,
+indexed by class, time, confidence and location.
+"""
+from sqlalchemy import text
+
+revision = "0007"
+description = "report_detections table, backfilled from garbage_reports.detections (now JSONB)"
+
+
+def upgrade(conn):
+    data_type = conn.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'garbage_reports' AND column_name = 'detections'
+    """)).scalar()
+    if data_type == "json":
+        conn.execute(text("ALTER TABLE garbage_reports ALTER COLUMN detections TYPE JSONB USING detections::jsonb"))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS report_detections (
+            id SERIAL PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            class_id INTEGER,
+            class_name VARCHAR NOT NULL,
+            confidence DOUBLE PRECISION NOT NULL,
+            bbox JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            geom geometry(POINT, 4326)
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_report_detections_report_id ON report_detections (report_id)"))
+    # class + time range, confidence filtered from the index entries
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_report_detections_class_created_at
+        ON report_detections (class_name, created_at DESC, confidence)
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_report_detections_confidence ON report_detections (confidence)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_report_detections_geom ON report_detections USING gist (geom)"))
+
+    result = conn.execute(text("""
+        INSERT INTO report_detections (report_id, class_id, class_name, confidence, bbox, created_at, geom)
+        SELECT r.id,
+               (d->>'class_id')::int,
+               COALESCE(d->>'class', 'Unknown'),
+               COALESCE((d->>'confidence')::double precision, 0),
+               d->'bbox',
+               r.created_at,
+               r.geom
+        FROM garbage_reports r
+        CROSS JOIN LATERAL jsonb_array_elements(r.detections->'all') AS d
+        WHERE jsonb_typeof(r.detections->'all') = 'array'
+          AND NOT EXISTS (SELECT 1 FROM report_detections x WHERE x.report_id = r.id)
+    """))
+    print(f"[MIGRATION] Backfilled {result.rowcount} detection(s)")
+    conn.execute(text("ANALYZE report_detections"))
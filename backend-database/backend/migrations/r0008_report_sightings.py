@@ -0,0 +1,36 @@
+"""
+Duplicate report merging: incident fields, sightings table and a geography index
+
+The GiST index on geom::geography serves the metre-radius nearest-neighbour
+lookup done for every new report.
+"""
+from sqlalchemy import text
+from . import create_partitioned_index_concurrently
+
+revision = "0008"
+description = "garbage_reports.sighting_count/last_seen_at, report_sightings, GiST index on geom::geography"
+transactional = False  # the geography index is built concurrently, partition by partition
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE garbage_reports ADD COLUMN IF NOT EXISTS sighting_count INTEGER DEFAULT 1 NOT NULL"))
+    conn.execute(text("ALTER TABLE garbage_reports ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITHOUT TIME ZONE"))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS report_sightings (
+            id SERIAL PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            image_path VARCHAR NOT NULL,
+            boxed_image_path VARCHAR,
+            prediction VARCHAR,
+            confidence DOUBLE PRECISION,
+            detections JSONB,
+            distance_m DOUBLE PRECISION,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            geom geometry(POINT, 4326)
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_report_sightings_report_id ON report_sightings (report_id)"))
+
+    create_partitioned_index_concurrently(conn, "garbage_reports", "ix_garbage_reports_geog",
+                                          "USING gist ((geom::geography))")
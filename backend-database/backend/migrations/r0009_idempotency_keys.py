@@ -0,0 +1,21 @@
+"""Idempotency keys of upload requests, so retried uploads replay the first response"""
+from sqlalchemy import text
+
+revision = "0009"
+description = "idempotency_keys table"
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key VARCHAR(255) PRIMARY KEY,
+            endpoint VARCHAR NOT NULL,
+            state VARCHAR(20) NOT NULL,
+            status_code INTEGER,
+            content_type VARCHAR,
+            body TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at)"))
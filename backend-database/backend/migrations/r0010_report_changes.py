@@ -0,0 +1,17 @@
+"""Log of report changes, polled by every worker process to invalidate its caches"""
+from sqlalchemy import text
+
+revision = "0010"
+description = "report_changes table"
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS report_changes (
+            id BIGSERIAL PRIMARY KEY,
+            origin VARCHAR(255) NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_report_changes_created_at ON report_changes (created_at)"))
@@ -0,0 +1,9 @@
+"""Fingerprint of the request body an idempotency key was first used with"""
+from sqlalchemy import text
+
+revision = "0011"
+description = "idempotency_keys.request_hash column"
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS request_hash VARCHAR(64)"))
@@ -178,41 +178,18 @@ def run_inference(image_path):
         # Debug logging
         print(f"[ML MODEL] Raw detections found: {len(result.boxes)}")
         
-        # Generate annotated image with bounding boxes
-        import cv2
-        from ..config import ANNOTATED_DIR
-        
-        boxed_name = "boxed_" + os.path.basename(image_path)
-        boxed_path = os.path.join(ANNOTATED_DIR, boxed_name)
-        
         # Save image with bounding boxes using YOLO's plot method
-        annotated = result.plot()
-        cv2.imwrite(boxed_path, annotated)
+        boxed_name, boxed_path = _save_annotated(result, image_path)
         print(f"[ML MODEL] Saved annotated image to: {boxed_path}")
         
-        # Extract all detections
-        all_detections = []
-        for box in result.boxes:
-            class_id = int(box.cls[0])
-            confidence = float(box.conf[0])
-            bbox = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-            
-            detection = {
-                "class": CLASS_NAMES.get(class_id, f"Unknown-{class_id}"),
-                "class_id": class_id,
-                "confidence": round(confidence, 4),
-                "bbox": [round(coord, 2) for coord in bbox]
-            }
-            all_detections.append(detection)
-        
-        # Sort by confidence (highest first)
-        all_detections.sort(key=lambda x: x["confidence"], reverse=True)
+        # Extract all detections, sorted by confidence (highest first)
+        all_detections = _extract_detections(result)
         
         print(f"[ML MODEL] Total detections: {len(all_detections)}")
         if all_detections:
             print(f"[ML MODEL] Primary detection: {all_detections[0]['class']} ({all_detections[0]['confidence']:.2%})")
         
-        # Return just the filename (not full path) for consistency
+        # Return just the blob name (not full path) for consistency
         return all_detections, boxed_name
         
     except Exception as e:
@@ -221,6 +198,94 @@ def run_inference(image_path):
         traceback.print_exc()
         raise e
 
+def _extract_detections(result):
+    """Turn one YOLO result into detection dicts sorted by confidence (highest first)"""
+    all_detections = []
+    for box in result.boxes:
+        class_id = int(box.cls[0])
+        confidence = float(box.conf[0])
+        bbox = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
+        
+        all_detections.append({
+            "class": CLASS_NAMES.get(class_id, f"Unknown-{class_id}"),
+            "class_id": class_id,
+            "confidence": round(confidence, 4),
+            "bbox": [round(coord, 2) for coord in bbox]
+        })
+    
+    all_detections.sort(key=lambda x: x["confidence"], reverse=True)
+    return all_detections
+
+def _save_annotated(result, image_path):
+    """Encode the boxed image and store it in ANNOTATED_DIR, returns (name, path)"""
+    import cv2
+    from ..config import ANNOTATED_DIR
+    from .. import storage
+    
+    ext = storage.normalize_extension(os.path.splitext(image_path)[1])
+    if ext == "gif":
+        ext = "png"  # OpenCV cannot encode GIF
+    ok, buffer = cv2.imencode(f".{ext}", result.plot())
+    if not ok:
+        raise ValueError(f"Could not encode annotated image for {image_path}")
+    return storage.save_bytes(buffer.tobytes(), ANNOTATED_DIR, ext)
+
+def run_inference_batch(image_paths):
+    """
+    Run inference on several images as real batches and save annotated versions
+    
+    Images are decoded up front and handed to the model as a list of arrays,
+    which ultralytics runs as one batch (ML_BATCH_SIZE images at a time).
+    
+    Args:
+        image_paths (list): Paths to the image files
+        
+    Returns:
+        list: One entry per image, in order - either (all_detections, boxed_filename)
+              or an Exception if that image could not be processed
+    """
+    global model
+    
+    # Load model if not already loaded
+    if model is None:
+        load_model()
+    
+    import cv2
+    from ..config import ML_BATCH_SIZE
+    
+    outcomes = [None] * len(image_paths)
+    
+    # Decode everything first so unreadable files fail individually
+    images = []
+    for index, image_path in enumerate(image_paths):
+        image = cv2.imread(image_path)
+        if image is None:
+            outcomes[index] = ValueError(f"Could not decode image: {os.path.basename(image_path)}")
+        else:
+            images.append((index, image_path, image))
+    
+    for start in range(0, len(images), ML_BATCH_SIZE):
+        chunk = images[start:start + ML_BATCH_SIZE]
+        print(f"[ML MODEL] Running batch inference on {len(chunk)} image(s)")
+        
+        try:
+            results = model([image for _, _, image in chunk], conf=0.25, verbose=False)
+        except Exception as e:
+            print(f"[ML MODEL ERROR] Batch inference failed: {str(e)}")
+            for index, _, _ in chunk:
+                outcomes[index] = e
+            continue
+        
+        for (index, image_path, _), result in zip(chunk, results):
+            try:
+                boxed_name, _ = _save_annotated(result, image_path)
+                outcomes[index] = (_extract_detections(result), boxed_name)
+            except Exception as e:
+                print(f"[ML MODEL ERROR] Post-processing failed for {image_path}: {str(e)}")
+                outcomes[index] = e
+    
+    return outcomes
+
 def get_model_info():
     """Get information about the loaded model"""
     global model
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, JSON, Index, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
 from geoalchemy2 import Geometry
 from .db import Base
+from .sqlite_store import PointBlob
 import datetime
 
+# Allowed values of GarbageReport.status
+VALID_STATUSES = ['pending', 'cleaned']
+
 class GarbageReport(Base):
     __tablename__ = "garbage_reports"
 
@@ -12,7 +17,82 @@ class GarbageReport(Base):
     boxed_image_path = Column(String, nullable=True)  # Path to annotated image with bounding boxes
     prediction = Column(String, nullable=True)
     confidence = Column(Float, nullable=True)
-    detections = Column(JSON, nullable=True)  # Store all detections with bounding boxes
+    detections = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)  # Store all detections with bounding boxes
     status = Column(String, default='pending', nullable=False)  # 'pending' or 'cleaned'
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    geom = Column(Geometry('POINT', srid=4326))
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)  # partition key
+    # PostGIS point, plain WKB blob in the embedded SQLite mode (R-tree garbage_reports_rtree)
+    geom = Column(Geometry('POINT', srid=4326).with_variant(PointBlob(), "sqlite"))  # GiST index idx_garbage_reports_geom
+    # Incident fields: repeated reports of the same spot are merged as sightings
+    sighting_count = Column(Integer, default=1, server_default="1", nullable=False)
+    last_seen_at = Column(DateTime, nullable=True)  # latest sighting (None: only the original report)
+
+    # Kept in sync with backend/migrations (revisions 0005, 0006, 0008). In the database the
+    # table is partitioned by month on created_at with primary key (id, created_at);
+    # ids still come from one sequence, so the ORM keeps using id alone as identity.
+    __table_args__ = (
+        Index("ix_garbage_reports_status_created_at", status, created_at.desc()),
+        Index("brin_garbage_reports_created_at", created_at, postgresql_using="brin"),
+        Index("ix_garbage_reports_geog", text("(geom::geography)"), postgresql_using="gist"),  # metre-based lookups
+    )
+
+
+class ReportDetection(Base):
+    """One detected object of a report (searchable copy of GarbageReport.detections["all"])"""
+    __tablename__ = "report_detections"
+
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, nullable=False, index=True)  # garbage_reports.id (no FK: that table is partitioned)
+    class_id = Column(Integer, nullable=True)
+    class_name = Column(String, nullable=False)
+    confidence = Column(Float, nullable=False)
+    bbox = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)  # [x1, y1, x2, y2] in image pixels
+    # Copied from the report (never change) so searches filter without a join
+    created_at = Column(DateTime, nullable=False)
+    geom = Column(Geometry('POINT', srid=4326).with_variant(PointBlob(), "sqlite"))  # GiST index idx_report_detections_geom
+
+    # Kept in sync with backend/migrations (revision 0007)
+    __table_args__ = (
+        Index("ix_report_detections_class_created_at", class_name, created_at.desc(), confidence),
+        Index("ix_report_detections_confidence", confidence),
+    )
+
+
+class ReportSighting(Base):
+    """A report merged into an existing nearby pending report (the incident)"""
+    __tablename__ = "report_sightings"
+
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, nullable=False, index=True)  # the incident, garbage_reports.id
+    image_path = Column(String, nullable=False)
+    boxed_image_path = Column(String, nullable=True)
+    prediction = Column(String, nullable=True)
+    confidence = Column(Float, nullable=True)
+    detections = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)
+    distance_m = Column(Float, nullable=True)  # from the incident location
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    geom = Column(Geometry('POINT', srid=4326, spatial_index=False).with_variant(PointBlob(), "sqlite"))
+
+
+class IdempotencyKey(Base):
+    """Response of an upload made with an Idempotency-Key header, replayed to retries until expires_at"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String, nullable=False)  # path the key was first used on
+    state = Column(String(20), nullable=False)  # 'in_progress' or 'done'
+    status_code = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+    body = Column(Text, nullable=True)
+    request_hash = Column(String(64), nullable=True)  # idempotency.Fingerprint of the first request (revision 0011)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # ix_idempotency_keys_expires_at (revision 0009)
+
+
+class ReportChangeLog(Base):
+    """A committed report change (backend.events.ReportChange as JSON), read by the other worker processes"""
+    __tablename__ = "report_changes"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    origin = Column(String(255), nullable=False)  # host:pid of the process that made the change
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)  # ix_report_changes_created_at (revision 0010)
@@ -0,0 +1,225 @@
+"""
+Monthly range partitions of garbage_reports on created_at
+Keeps the current and the next PARTITION_MONTHS_AHEAD months created ahead of
+time and applies the retention policy: old months whose reports are all
+cleaned are detached from the table (or moved to the archive schema).
+
+CLI (run from backend-database/):
+    python -m backend.partitions list
+    python -m backend.partitions ensure [--months-ahead N]
+    python -m backend.partitions retention [--keep-months N] [--action detach|archive] [--dry-run]
+"""
+import argparse
+import re
+from datetime import datetime
+from sqlalchemy import text
+from .db import engine, IS_SQLITE
+from .config import (
+    PARTITION_MONTHS_AHEAD, PARTITION_RETENTION_MONTHS,
+    PARTITION_RETENTION_ACTION, PARTITION_ARCHIVE_SCHEMA,
+)
+
+PARENT = "garbage_reports"
+DEFAULT_PARTITION = "garbage_reports_default"
+RETENTION_ACTIONS = ("detach", "archive")
+
+_NAME_RE = re.compile(r"^garbage_reports_y(\d{4})m(\d{2})$")
+_LOCK_KEY = 0x67617262  # pg_advisory_xact_lock key serializing partition DDL between workers
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """e.g. garbage_reports_y2024m03"""
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn):
+    """Whether garbage_reports is already a partitioned table"""
+    return conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :parent AND c.relnamespace = 'public'::regnamespace
+    """), {"parent": PARENT}).first() is not None
+
+
+def list_partitions(conn):
+    """Monthly partitions attached to garbage_reports as [(month, name)], oldest first"""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent AND p.relnamespace = 'public'::regnamespace
+    """), {"parent": PARENT}).scalars()
+    partitions = []
+    for name in names:
+        match = _NAME_RE.match(name)
+        if match:
+            partitions.append((datetime(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def create_partition(conn, month):
+    """
+    Create the partition for one month if it is missing
+
+    Rows that already landed in the default partition for that month are
+    moved into the new partition first (ATTACH would fail otherwise).
+
+    Returns:
+        True if the partition was created
+    """
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": f"public.{name}"}).scalar() is not None:
+        return False
+
+    bounds = {"start": month, "end": add_months(month, 1)}
+    stray = conn.execute(text(f"""
+        SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end LIMIT 1
+    """), bounds).first()
+
+    if stray is None:
+        conn.execute(text(f"""
+            CREATE TABLE {name} PARTITION OF {PARENT}
+            FOR VALUES FROM ('{bounds["start"]:%Y-%m-%d}') TO ('{bounds["end"]:%Y-%m-%d}')
+        """))
+    else:
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), bounds)
+        conn.execute(text(f"""
+            ALTER TABLE {PARENT} ATTACH PARTITION {name}
+            FOR VALUES FROM ('{bounds["start"]:%Y-%m-%d}') TO ('{bounds["end"]:%Y-%m-%d}')
+        """))
+    print(f"[PARTITIONS] Created {name}")
+    return True
+
+
+def create_partitions(conn, first_month, last_month):
+    """Create every missing monthly partition from first_month to last_month (inclusive)"""
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        if create_partition(conn, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_future_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Make sure the current month and the next months_ahead months have partitions
+
+    Does nothing until the partitioning migration (revision 0006) has run,
+    nor in SQLite mode.
+
+    Returns:
+        Names of the partitions created
+    """
+    if IS_SQLITE:
+        return []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return []
+        this_month = month_start(datetime.utcnow())
+        return create_partitions(conn, this_month, add_months(this_month, months_ahead))
+
+
+def apply_retention(keep_months=PARTITION_RETENTION_MONTHS, action=PARTITION_RETENTION_ACTION, dry_run=False):
+    """
+    Remove old fully-cleaned months from garbage_reports
+
+    A monthly partition is eligible when it ended more than keep_months months
+    ago and holds no report that is still pending. 'detach' leaves it as a
+    standalone table next to garbage_reports, 'archive' also moves it into
+    PARTITION_ARCHIVE_SCHEMA. Images on disk are left alone.
+
+    Returns:
+        Names of the partitions removed (or that would be, with dry_run)
+    """
+    if keep_months <= 0 or IS_SQLITE:
+        return []
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Unknown retention action: {action}")
+
+    cutoff = add_months(month_start(datetime.utcnow()), -keep_months)
+    removed = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return []
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        for month, name in list_partitions(conn):
+            if add_months(month, 1) > cutoff:
+                break
+            pending = conn.execute(text(f"SELECT count(*) FROM {name} WHERE status <> 'cleaned'")).scalar()
+            if pending:
+                print(f"[PARTITIONS] Keeping {name}: {pending} report(s) not cleaned")
+                continue
+            removed.append(name)
+            if dry_run:
+                print(f"[PARTITIONS] Would {action} {name}")
+                continue
+            conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+            # The detached reports keep their detections JSON, the search rows go
+            conn.execute(text("""
+                DELETE FROM report_detections WHERE created_at >= :start AND created_at < :end
+            """), {"start": month, "end": add_months(month, 1)})
+            if action == "archive":
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {PARTITION_ARCHIVE_SCHEMA}"))
+                conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {PARTITION_ARCHIVE_SCHEMA}"))
+            print(f"[PARTITIONS] {'Archived' if action == 'archive' else 'Detached'} {name}")
+    return removed
+
+
+def maintain():
+    """
+    Periodic job: create upcoming partitions, then apply retention
+
+    Returns:
+        Names of the partitions removed by retention
+    """
+    ensure_future_partitions()
+    return apply_retention()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.partitions", description="garbage_reports partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List monthly partitions")
+
+    ensure_parser = commands.add_parser("ensure", help="Create upcoming monthly partitions")
+    ensure_parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+
+    retention_parser = commands.add_parser("retention", help="Detach or archive old cleaned months")
+    retention_parser.add_argument("--keep-months", type=int, default=PARTITION_RETENTION_MONTHS)
+    retention_parser.add_argument("--action", choices=RETENTION_ACTIONS, default=PARTITION_RETENTION_ACTION)
+    retention_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        with engine.connect() as conn:
+            for month, name in list_partitions(conn):
+                count = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                print(f"  {month:%Y-%m}  {name}  {count} rows")
+    elif args.command == "ensure":
+        created = ensure_future_partitions(args.months_ahead)
+        print(f"[PARTITIONS] {len(created)} partition(s) created")
+    elif args.command == "retention":
+        removed = apply_retention(args.keep_months, args.action, args.dry_run)
+        print(f"[PARTITIONS] {len(removed)} partition(s) {'eligible' if args.dry_run else 'removed'}")
+
+
+if __name__ == "__main__":
+    main()
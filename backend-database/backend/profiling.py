@@ -0,0 +1,237 @@
+"""
+On-demand statistical profiling of requests
+A request is profiled when it carries PROFILE_TOKEN in the X-Profile header,
+while profiling is switched on through /admin/profiling (which also needs
+the token, in X-Profile-Token), or as one in every N requests
+(PROFILE_SAMPLE_EVERY). Without a PROFILE_TOKEN only the 1-in-N sampling
+configured on the server is available. While at least one profiled request is running, a
+sampler thread snapshots the stacks of every busy thread each interval, so
+the event loop (multipart parsing) and the threadpool (disk, torch, cv2,
+the DB commit) all show up. The samples are written in folded-stack format
+(one 'frame;frame;frame count' line per stack) to PROFILE_DIR/<request id>.folded,
+ready for flamegraph.pl or speedscope.
+
+When nothing is being profiled the sampler thread sleeps and the middleware
+only reads a header and bumps a counter.
+
+Samples are per process, not per request: requests running at the same
+time as a profiled one show up in its profile too.
+"""
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from fastapi.concurrency import run_in_threadpool
+from .config import PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_SAMPLE_EVERY, PROFILE_MAX_FILES, PROFILE_TOKEN
+
+HEADER = "X-Profile"
+TOKEN_HEADER = "X-Profile-Token"
+ID_HEADER = "X-Request-ID"
+
+# Leaf frames of threads parked waiting for work, left out of the profiles
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+_IDLE_FUNCTIONS = ("wait", "get", "select", "poll", "_worker", "_bootstrap_inner")
+
+
+class _Session:
+    """Samples collected for one profiled request"""
+
+    def __init__(self, request_id, method, path):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+
+
+class Profiler:
+    """Sampler thread shared by all profiled requests of the process"""
+
+    def __init__(self, directory=PROFILE_DIR, interval_ms=PROFILE_INTERVAL_MS,
+                 sample_every=PROFILE_SAMPLE_EVERY, max_files=PROFILE_MAX_FILES):
+        self.directory = directory
+        self.interval = interval_ms / 1000.0
+        self.sample_every = sample_every  # 0 disables 1-in-N sampling
+        self.max_files = max_files
+        self.enabled = False  # admin toggle: profile every request
+        self.path_prefix = None  # limit the toggle and 1-in-N sampling to these paths
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+        self._counter = itertools.count(1)
+
+        self.profiled = 0
+        self.last_profile = None
+
+    def configure(self, enabled=None, sample_every=None, path_prefix=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_every is not None:
+            self.sample_every = max(0, sample_every)
+        if path_prefix is not None:
+            self.path_prefix = path_prefix or None
+        return self.stats()
+
+    def wants(self, request):
+        """Whether to profile this request"""
+        value = request.headers.get(HEADER)
+        if value:
+            return token_matches(value)
+        if self.path_prefix and not request.url.path.startswith(self.path_prefix):
+            return False
+        if self.enabled:
+            return True
+        return self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+
+    def start(self, request_id, method, path):
+        session = _Session(request_id, method, path)
+        with self._lock:
+            self._sessions[id(session)] = session
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session, status_code=None):
+        """Stop sampling for session and write its profile, returns the file path"""
+        with self._lock:
+            self._sessions.pop(id(session), None)
+            if not self._sessions:
+                self._active.clear()
+        elapsed_ms = (time.perf_counter() - session.started) * 1000
+        path = self._write(session)
+        self.profiled += 1
+        self.last_profile = {
+            "request_id": session.request_id,
+            "method": session.method,
+            "path": session.path,
+            "status_code": status_code,
+            "duration_ms": round(elapsed_ms, 1),
+            "samples": session.samples,
+            "file": path,
+        }
+        return path
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            self._active.wait()
+            stacks = _busy_stacks(own)
+            with self._lock:
+                for session in self._sessions.values():
+                    session.stacks.update(stacks)
+                    session.samples += 1
+            time.sleep(self.interval)
+
+    def _write(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{session.request_id}.folded")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for stack, count in session.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, path)
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Keep the newest max_files profiles"""
+        if self.max_files <= 0:
+            return
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".folded")]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def recent(self, limit=20):
+        """Newest profile files, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".folded")]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        return [{"request_id": e.name[:-len(".folded")], "bytes": e.stat().st_size} for e in entries[:limit]]
+
+    def stats(self):
+        with self._lock:
+            running = len(self._sessions)
+        return {
+            "enabled": self.enabled,
+            "sample_every": self.sample_every,
+            "path_prefix": self.path_prefix,
+            "interval_ms": round(self.interval * 1000, 1),
+            "directory": self.directory,
+            "running": running,
+            "profiled": self.profiled,
+            "last_profile": self.last_profile,
+        }
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _busy_stacks(skip_ident):
+    """Folded stack of every thread that is doing work, rooted at the thread name"""
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        if ident == skip_ident:
+            continue
+        code = frame.f_code
+        if os.path.basename(code.co_filename) in _IDLE_FILES and code.co_name in _IDLE_FUNCTIONS:
+            continue
+        frames = []
+        while frame is not None:
+            frames.append(_frame_label(frame))
+            frame = frame.f_back
+        frames.append(names.get(ident, f"thread-{ident}").replace(" ", "_"))
+        stacks.append(";".join(reversed(frames)))
+    return stacks
+
+
+def token_matches(value):
+    """Whether value is the PROFILE_TOKEN; always False when no token is configured"""
+    return bool(PROFILE_TOKEN) and bool(value) and hmac.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+
+def request_id(request):
+    """The client's X-Request-ID if it is a safe file name, otherwise a new one"""
+    value = request.headers.get(ID_HEADER, "")
+    if value and len(value) <= 64 and all(c.isalnum() or c in "-_" for c in value):
+        return value
+    return uuid.uuid4().hex
+
+
+profiler = Profiler()
+
+
+async def handle(request, call_next):
+    """HTTP middleware: profile the request if asked to, pass it through otherwise"""
+    if not profiler.wants(request):
+        return await call_next(request)
+    rid = request_id(request)
+    session = profiler.start(rid, request.method, request.url.path)
+    status_code = None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        # Writing and pruning the profile files is disk work: keep it off the event loop
+        path = await run_in_threadpool(profiler.stop, session, status_code)
+        print(f"[PROFILE] {request.method} {request.url.path} -> {path} ({session.samples} samples)")
+    response.headers[ID_HEADER] = rid
+    return response
@@ -0,0 +1,273 @@
+"""
+Resumable uploads (tus 1.0 core protocol + creation/termination/expiration)
+A client creates an upload with its total length, then PATCHes chunks at
+the current offset; a dropped connection only costs the chunk in flight,
+the client asks HEAD for the offset and continues from there. Chunks are
+appended to a staging file next to a small JSON state file, so any worker
+process can serve any request of an upload.
+"""
+import base64
+import json
+import os
+import re
+import time
+import uuid
+from .config import RESUMABLE_DIR, RESUMABLE_MAX_BYTES, RESUMABLE_EXPIRY_HOURS
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination,expiration"
+
+STATE_UPLOADING = "uploading"
+STATE_PROCESSING = "processing"
+STATE_COMPLETE = "complete"
+STATE_FAILED = "failed"
+
+LOCK_STALE_SECONDS = 600  # a lock file this old was left by a crashed worker
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """Protocol error, carries the HTTP status to answer with"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def parse_metadata(header):
+    """Upload-Metadata header ('key base64value,key2 ...') to a dict of strings"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value).decode("utf-8") if value else ""
+        except ValueError:
+            raise UploadError(400, f"Invalid Upload-Metadata value for '{key}'")
+    return metadata
+
+
+def _paths(upload_id):
+    if not _ID_RE.match(upload_id or ""):
+        raise UploadError(404, "Upload not found")
+    base = os.path.join(RESUMABLE_DIR, upload_id)
+    return base + ".json", base + ".part", base + ".lock"
+
+
+def _write_state(upload_id, state):
+    state_path = _paths(upload_id)[0]
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def get(upload_id):
+    """State dict of an upload (with its current offset), UploadError 404 if unknown or expired"""
+    state_path, data_path, _ = _paths(upload_id)
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        raise UploadError(404, "Upload not found")
+    if state["expires_at"] < time.time():
+        raise UploadError(410, "Upload expired")
+    if state["state"] == STATE_UPLOADING:
+        state["offset"] = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+    else:
+        state["offset"] = state["length"]
+    return state
+
+
+def create(length, metadata):
+    """
+    Start an upload of length bytes
+
+    Returns:
+        dict: upload state, 'id' names it in later requests
+    """
+    if length < 1:
+        raise UploadError(400, "Upload-Length must be positive")
+    if length > RESUMABLE_MAX_BYTES:
+        raise UploadError(413, f"Upload-Length exceeds the {RESUMABLE_MAX_BYTES} byte limit")
+
+    upload_id = uuid.uuid4().hex
+    now = time.time()
+    state = {
+        "id": upload_id,
+        "length": length,
+        "metadata": metadata,
+        "state": STATE_UPLOADING,
+        "created_at": now,
+        "expires_at": now + RESUMABLE_EXPIRY_HOURS * 3600,
+        "result": None,
+    }
+    open(_paths(upload_id)[1], "wb").close()
+    _write_state(upload_id, state)
+    return {**state, "offset": 0}
+
+
+class _Locked:
+    """Exclusive lock file on one upload, shared by every worker process"""
+
+    def __init__(self, upload_id):
+        self.path = _paths(upload_id)[2]
+
+    def __enter__(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS
+            except FileNotFoundError:
+                stale = True
+            if not stale:
+                raise UploadError(423, "Upload is being written by another request")
+            os.remove(self.path)
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Appender:
+    """
+    One PATCH of an upload: holds the upload's lock and appends the body as it arrives
+
+    write() each block of the request body, then close() (also after an
+    error or a dropped connection): the bytes received so far are kept and
+    the next PATCH resumes after them.
+    """
+
+    def __init__(self, upload_id, offset):
+        self.upload_id = upload_id
+        self._lock = _Locked(upload_id)
+        self._lock.__enter__()
+        try:
+            state = get(upload_id)
+            if state["state"] != STATE_UPLOADING:
+                raise UploadError(409, f"Upload is already {state['state']}")
+            if offset != state["offset"]:
+                raise UploadError(409, f"Upload-Offset {offset} does not match the current offset {state['offset']}")
+            self.state = state
+            self._file = open(_paths(upload_id)[1], "ab")
+        except BaseException:
+            self._lock.__exit__(None, None, None)
+            raise
+
+    def write(self, block):
+        if self.state["offset"] + len(block) > self.state["length"]:
+            raise UploadError(413, "Chunk runs past Upload-Length")
+        self._file.write(block)
+        self.state["offset"] += len(block)
+
+    def close(self):
+        """
+        Make the received bytes durable and release the lock
+
+        Returns:
+            tuple: (state, completed) - completed is True when this PATCH
+                   finished the upload; the caller then processes data_path(upload_id)
+                   and calls finish() or fail()
+        """
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            completed = self.state["offset"] == self.state["length"]
+            if completed:
+                # Exactly one request moves the upload on to processing
+                self.state["state"] = STATE_PROCESSING
+                self.state["processing_at"] = time.time()
+                _write_state(self.upload_id, {k: v for k, v in self.state.items() if k != "offset"})
+            return self.state, completed
+        finally:
+            self._lock.__exit__(None, None, None)
+
+
+def data_path(upload_id):
+    return _paths(upload_id)[1]
+
+
+def finish(upload_id, result):
+    """Record the processing result and drop the staged bytes"""
+    state = get(upload_id)
+    state.pop("offset", None)
+    state.update(state=STATE_COMPLETE, result=result)
+    _write_state(upload_id, state)
+    _remove(data_path(upload_id))
+
+
+def fail(upload_id, detail):
+    state = get(upload_id)
+    state.pop("offset", None)
+    state.update(state=STATE_FAILED, result={"detail": detail})
+    _write_state(upload_id, state)
+    _remove(data_path(upload_id))
+
+
+def delete(upload_id):
+    """Terminate an upload, removing everything staged for it"""
+    with _Locked(upload_id):
+        get(upload_id)
+        for path in _paths(upload_id)[:2]:
+            _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def collect_garbage(now=None):
+    """
+    Remove expired uploads and orphaned staging files, fail uploads stuck in processing
+
+    An upload still processing after LOCK_STALE_SECONDS lost its worker
+    (crash or restart) and is marked failed so the client uploads it again.
+
+    Returns:
+        int: number of uploads removed
+    """
+    now = time.time() if now is None else now
+    removed = 0
+    interrupted = 0
+    for entry in os.scandir(RESUMABLE_DIR):
+        upload_id, _, ext = entry.name.partition(".")
+        if not _ID_RE.match(upload_id):
+            continue
+        state_path = os.path.join(RESUMABLE_DIR, upload_id + ".json")
+        if ext == "json":
+            try:
+                with open(state_path, encoding="utf-8") as f:
+                    state = json.load(f)
+                expired = state["expires_at"] < now
+            except (OSError, ValueError, KeyError):
+                expired = True
+            if expired:
+                for path in _paths(upload_id):
+                    _remove(path)
+                removed += 1
+            elif (state["state"] == STATE_PROCESSING
+                  and now - state.get("processing_at", state["created_at"]) > LOCK_STALE_SECONDS):
+                fail(upload_id, "Processing was interrupted, upload the image again")
+                interrupted += 1
+        elif not os.path.exists(state_path) and now - entry.stat().st_mtime > LOCK_STALE_SECONDS:
+            # Staged bytes without a state file, left by a crash during create()
+            _remove(entry.path)
+    if removed:
+        print(f"[RESUMABLE] Removed {removed} expired upload(s)")
+    if interrupted:
+        print(f"[RESUMABLE] Marked {interrupted} interrupted upload(s) failed")
+    return removed
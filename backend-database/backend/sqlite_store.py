@@ -0,0 +1,231 @@
+"""
+Embedded SQLite storage for edge deployments (DATABASE_URL=sqlite:///...)
+Runs without PostGIS or SpatiaLite: points are stored as WKB blobs, an R-tree
+virtual table indexes their bounding boxes (kept in sync by triggers), and
+the few spatial SQL functions crud needs are registered on every connection.
+Connections use WAL so dashboard reads never wait for the upload writer.
+"""
+import struct
+from geoalchemy2 import WKBElement
+from shapely import wkb
+from shapely.geometry import Point
+from sqlalchemy import Column, Float, Integer, LargeBinary, MetaData, Table, and_, select
+from sqlalchemy.types import TypeDecorator
+from .geo import haversine_m
+
+# PRAGMAs applied to every new connection
+PRAGMAS = {
+    "journal_mode": "WAL",       # readers and the writer do not block each other
+    "synchronous": "NORMAL",     # fsync at checkpoints only; safe with WAL
+    "busy_timeout": 5000,        # ms to wait for the write lock instead of failing
+    "cache_size": -64000,        # 64 MB page cache
+    "mmap_size": 268435456,      # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+_rtree_metadata = MetaData()
+
+# Bounding boxes of garbage_reports.geom (points: min == max)
+reports_rtree = Table(
+    "garbage_reports_rtree", _rtree_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("min_lon", Float), Column("max_lon", Float),
+    Column("min_lat", Float), Column("max_lat", Float),
+)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS garbage_reports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        image_path VARCHAR NOT NULL,
+        boxed_image_path VARCHAR,
+        prediction VARCHAR,
+        confidence FLOAT,
+        detections JSON,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        created_at DATETIME NOT NULL,
+        geom BLOB,
+        sighting_count INTEGER NOT NULL DEFAULT 1,
+        last_seen_at DATETIME
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_garbage_reports_status_created_at ON garbage_reports (status, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_garbage_reports_created_at ON garbage_reports (created_at)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS garbage_reports_rtree
+    USING rtree(id, min_lon, max_lon, min_lat, max_lat)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS garbage_reports_rtree_insert AFTER INSERT ON garbage_reports
+    WHEN new.geom IS NOT NULL
+    BEGIN
+        INSERT INTO garbage_reports_rtree VALUES
+            (new.id, ST_X(new.geom), ST_X(new.geom), ST_Y(new.geom), ST_Y(new.geom));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS garbage_reports_rtree_update AFTER UPDATE OF geom ON garbage_reports
+    BEGIN
+        DELETE FROM garbage_reports_rtree WHERE id = old.id;
+        INSERT INTO garbage_reports_rtree SELECT
+            new.id, ST_X(new.geom), ST_X(new.geom), ST_Y(new.geom), ST_Y(new.geom)
+        WHERE new.geom IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS garbage_reports_rtree_delete AFTER DELETE ON garbage_reports
+    BEGIN
+        DELETE FROM garbage_reports_rtree WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS report_detections (
+        id INTEGER PRIMARY KEY,
+        report_id INTEGER NOT NULL,
+        class_id INTEGER,
+        class_name VARCHAR NOT NULL,
+        confidence FLOAT NOT NULL,
+        bbox JSON,
+        created_at DATETIME NOT NULL,
+        geom BLOB
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_report_detections_report_id ON report_detections (report_id)",
+    "CREATE INDEX IF NOT EXISTS ix_report_detections_class_created_at ON report_detections (class_name, created_at DESC, confidence)",
+    "CREATE INDEX IF NOT EXISTS ix_report_detections_confidence ON report_detections (confidence)",
+    """
+    CREATE TABLE IF NOT EXISTS report_sightings (
+        id INTEGER PRIMARY KEY,
+        report_id INTEGER NOT NULL,
+        image_path VARCHAR NOT NULL,
+        boxed_image_path VARCHAR,
+        prediction VARCHAR,
+        confidence FLOAT,
+        detections JSON,
+        distance_m FLOAT,
+        created_at DATETIME NOT NULL,
+        geom BLOB
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_report_sightings_report_id ON report_sightings (report_id)",
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key VARCHAR(255) PRIMARY KEY,
+        endpoint VARCHAR NOT NULL,
+        state VARCHAR(20) NOT NULL,
+        status_code INTEGER,
+        content_type VARCHAR,
+        body TEXT,
+        request_hash VARCHAR(64),
+        created_at DATETIME NOT NULL,
+        expires_at DATETIME NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at)",
+    """
+    CREATE TABLE IF NOT EXISTS report_changes (
+        id INTEGER PRIMARY KEY,
+        origin VARCHAR(255) NOT NULL,
+        payload TEXT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_report_changes_created_at ON report_changes (created_at)",
+]
+
+# Columns added after their table first shipped: (table, column, type), added to older databases
+ADDED_COLUMNS = [
+    ("idempotency_keys", "request_hash", "VARCHAR(64)"),
+]
+
+
+class PointBlob(TypeDecorator):
+    """Geometry column as a plain WKB blob, read back as WKBElement like GeoAlchemy2 does"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, WKBElement):
+            return bytes(value.data)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return WKBElement(value, srid=4326) if value is not None else None
+
+
+_WKB_POINT = 1
+_EWKB_SRID_FLAG = 0x20000000
+
+
+def _coords(blob):
+    """(x, y) of a WKB/EWKB point, decoded directly (these run once per candidate row)"""
+    if blob is None:
+        return None
+    endian = "<" if blob[0] == 1 else ">"
+    geometry_type, = struct.unpack_from(endian + "I", blob, 1)
+    offset = 9 if geometry_type & _EWKB_SRID_FLAG else 5
+    if geometry_type & 0xFFFF != _WKB_POINT:
+        point = wkb.loads(bytes(blob))
+        return point.x, point.y
+    return struct.unpack_from(endian + "dd", blob, offset)
+
+
+def _x(blob):
+    coords = _coords(blob)
+    return coords[0] if coords is not None else None
+
+
+def _y(blob):
+    coords = _coords(blob)
+    return coords[1] if coords is not None else None
+
+
+def _distance_sphere(blob_a, blob_b):
+    a, b = _coords(blob_a), _coords(blob_b)
+    if a is None or b is None:
+        return None
+    return haversine_m(a[1], a[0], b[1], b[0])
+
+
+def configure_connection(dbapi_connection, connection_record=None):
+    """Engine "connect" listener: PRAGMAs and the spatial functions"""
+    for name, value in PRAGMAS.items():
+        dbapi_connection.execute(f"PRAGMA {name}={value}")
+    dbapi_connection.create_function("ST_X", 1, _x, deterministic=True)
+    dbapi_connection.create_function("ST_Y", 1, _y, deterministic=True)
+    dbapi_connection.create_function("ST_DistanceSphere", 2, _distance_sphere, deterministic=True)
+
+
+def create_schema(engine):
+    """Create the tables, indexes, R-tree and triggers, and add newer columns to older tables (idempotent)"""
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+        for table, column, column_type in ADDED_COLUMNS:
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def bbox_ids(bbox):
+    """
+    SELECT of the report ids whose point lies in (min_lon, min_lat, max_lon, max_lat), served by the R-tree
+
+    R-tree coordinates are 32-bit floats rounded outwards, so points within
+    about a metre outside the box can match; callers needing exact edges
+    also compare ST_X/ST_Y.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return select(reports_rtree.c.id).where(and_(
+        reports_rtree.c.min_lon <= max_lon,
+        reports_rtree.c.max_lon >= min_lon,
+        reports_rtree.c.min_lat <= max_lat,
+        reports_rtree.c.max_lat >= min_lat,
+    ))
+
+
+def point_blob(lon, lat):
+    """WKB of a point, to compare against stored geometries"""
+    return wkb.dumps(Point(lon, lat))
@@ -0,0 +1,146 @@
+"""
+Content-addressed image store
+Blobs are named by the SHA-256 of their content and sharded into nested
+directories (ab/cd/abcd....jpg), so identical uploads are stored once and no
+directory grows beyond a few thousand entries
+Blobs are written to STAGING_DIR first and renamed into place when complete,
+so the served roots never hold partial files.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from .config import STAGING_DIR
+
+HASH_ALGORITHM = "sha256"
+CHUNK_SIZE = 1024 * 1024
+TMP_DIRNAME = ".tmp"
+
+KNOWN_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "bmp", "webp"}
+DEFAULT_EXTENSION = "jpg"
+
+
+def normalize_extension(ext):
+    """Lower-case extension without the dot, falling back to DEFAULT_EXTENSION"""
+    ext = (ext or "").lower().lstrip(".")
+    return ext if ext in KNOWN_EXTENSIONS else DEFAULT_EXTENSION
+
+
+def blob_name(digest, ext):
+    """Relative blob path for a content digest, e.g. 'ab/cd/abcd....jpg'"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{normalize_extension(ext)}"
+
+
+def path_for(root, name):
+    """Absolute path of a stored blob (also works for legacy flat filenames)"""
+    return os.path.join(root, *name.split("/"))
+
+
+def is_content_addressed(name):
+    """True if name already follows the sharded blob layout"""
+    parts = name.split("/")
+    return len(parts) == 3 and parts[2].startswith(parts[0] + parts[1])
+
+
+def _commit(tmp_path, root, name):
+    """Atomically move a finished temp file into place, dropping it if the blob exists"""
+    final_path = path_for(root, name)
+    if os.path.exists(final_path):
+        os.remove(tmp_path)  # identical content already stored
+        return False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return True
+
+
+def _staging_dir(root):
+    """STAGING_DIR, or a hidden directory in root when they are on different filesystems (rename must not copy)"""
+    os.makedirs(root, exist_ok=True)
+    if os.stat(STAGING_DIR).st_dev == os.stat(root).st_dev:
+        return STAGING_DIR
+    tmp_dir = os.path.join(root, TMP_DIRNAME)  # dot-paths are never served (media.ImageFiles)
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tmp_dir
+
+
+def _temp_file(root):
+    tmp_dir = _staging_dir(root)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+def save_stream(fileobj, root, ext):
+    """
+    Store the contents of a file object, hashing while copying
+
+    Returns:
+        tuple: (name, path) - relative blob name and absolute path
+    """
+    digest = hashlib.new(HASH_ALGORITHM)
+    out, tmp_path = _temp_file(root)
+    try:
+        with out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    name = blob_name(digest.hexdigest(), ext)
+    if not _commit(tmp_path, root, name):
+        print(f"[STORAGE] Deduplicated upload: {name}")
+    return name, path_for(root, name)
+
+
+def save_bytes(data, root, ext):
+    """Store an in-memory blob, returns (name, path)"""
+    name = blob_name(hashlib.new(HASH_ALGORITHM, data).hexdigest(), ext)
+    final_path = path_for(root, name)
+    if os.path.exists(final_path):
+        return name, final_path
+
+    out, tmp_path = _temp_file(root)
+    try:
+        with out:
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    _commit(tmp_path, root, name)
+    return name, final_path
+
+
+def import_file(src_path, root, remove_source=True):
+    """
+    Move (or copy) an existing file into the store (used by the migration tool)
+
+    With remove_source the source is removed once the blob is in place, or
+    right away when the store already holds identical content.
+
+    Returns:
+        str: relative blob name
+    """
+    digest = hashlib.new(HASH_ALGORITHM)
+    with open(src_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    ext = os.path.splitext(src_path)[1]
+    name = blob_name(digest.hexdigest(), ext)
+    final_path = path_for(root, name)
+    if not os.path.exists(final_path):
+        out, tmp_path = _temp_file(root)
+        with out, open(src_path, "rb") as f:
+            shutil.copyfileobj(f, out)
+        _commit(tmp_path, root, name)
+    if remove_source:
+        os.remove(src_path)
+    return name
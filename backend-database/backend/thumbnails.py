@@ -0,0 +1,131 @@
+"""
+Derivative image pipeline
+Renders thumbnail and medium renditions (WebP or JPEG) of originals and
+annotated images in a background worker pool. Missing renditions of older
+images are generated lazily on first request.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from .config import UPLOAD_DIR, ANNOTATED_DIR, DERIVATIVES_DIR, THUMBNAIL_WORKERS
+
+# Rendition name -> longest edge in pixels
+SIZES = {
+    "thumb": 160,
+    "medium": 640,
+}
+
+# Format name -> (Pillow format, media type, save options)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+DEFAULT_FORMAT = "webp"
+
+# Image kind (first URL segment) -> directory holding the source images
+SOURCES = {
+    "uploads": UPLOAD_DIR,
+    "annotated": ANNOTATED_DIR,
+}
+
+_pool = None
+_pool_lock = threading.RLock()  # re-entered when a done callback runs inline
+_in_flight = {}  # destination path -> Future
+
+
+def _get_pool():
+    # Created lazily so forked worker processes get their own threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+        return _pool
+
+
+def url_for(kind, name, size="thumb"):
+    """Public URL of a rendition, e.g. /media/uploads/thumb/ab/cd/abcd....jpg"""
+    if not name:
+        return None
+    return f"/media/{kind}/{size}/{name}"
+
+
+def source_path(kind, name):
+    """Absolute path of a source image, None if kind is unknown or the name escapes its directory"""
+    root = SOURCES.get(kind)
+    if root is None:
+        return None
+    path = os.path.realpath(os.path.join(root, *name.split("/")))
+    if not path.startswith(os.path.realpath(root) + os.sep):
+        return None
+    return path
+
+
+def derivative_path(kind, name, size, fmt):
+    """Absolute path where a rendition is (or will be) stored"""
+    base = os.path.splitext(name)[0]
+    return os.path.join(DERIVATIVES_DIR, kind, size, *f"{base}.{fmt}".split("/"))
+
+
+def render(src_path, dest_path, size, fmt):
+    """Resize src_path to fit SIZES[size] and write it atomically to dest_path"""
+    pil_format, _, options = FORMATS[fmt]
+    max_edge = SIZES[size]
+
+    with Image.open(src_path) as image:
+        image.draft("RGB", (max_edge, max_edge))  # fast JPEG downscale on decode
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if image.mode not in ("RGB", "RGBA") or (pil_format == "JPEG" and image.mode != "RGB"):
+            image = image.convert("RGB")
+
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                image.save(out, pil_format, **options)
+            os.replace(tmp_path, dest_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    return dest_path
+
+
+def _finished(dest_path, future):
+    with _pool_lock:
+        _in_flight.pop(dest_path, None)
+    error = future.exception()
+    if error is not None:
+        print(f"[THUMBNAILS ERROR] Failed to render {dest_path}: {error}")
+
+
+def submit(kind, name, size, fmt=DEFAULT_FORMAT):
+    """
+    Queue a rendition on the worker pool
+
+    Returns:
+        Future resolving to the rendition path (shared with any identical request in flight)
+    """
+    src_path = source_path(kind, name)
+    if src_path is None:
+        raise ValueError(f"Unknown image: {kind}/{name}")
+    dest_path = derivative_path(kind, name, size, fmt)
+
+    pool = _get_pool()
+    with _pool_lock:
+        future = _in_flight.get(dest_path)
+        if future is None:
+            future = pool.submit(render, src_path, dest_path, size, fmt)
+            _in_flight[dest_path] = future
+            future.add_done_callback(lambda f: _finished(dest_path, f))
+    return future
+
+
+def schedule(kind, name):
+    """Render every size in the default format in the background (fire and forget)"""
+    if not name:
+        return
+    for size in SIZES:
+        if not os.path.exists(derivative_path(kind, name, size, DEFAULT_FORMAT)):
+            submit(kind, name, size)
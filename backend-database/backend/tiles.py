@@ -0,0 +1,190 @@
+"""
+Mapbox Vector Tiles for the report layers
+Tiles are rendered by PostGIS (ST_AsMVT) and cached in memory and on disk
+"""
+import math
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from . import events
+from .config import TILE_CACHE_DIR, TILE_CACHE_MAX_ITEMS, TILE_MAX_ZOOM
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+LAYER_NAME = "reports"
+
+# One feature per report, geometry clipped to the tile in web mercator
+TILE_SQL = text("""
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ),
+    features AS (
+        SELECT ST_AsMVTGeom(ST_Transform(r.geom, 3857), bounds.geom) AS geom,
+               r.id,
+               r.status,
+               r.prediction,
+               r.confidence,
+               r.sighting_count
+        FROM garbage_reports r, bounds
+        WHERE r.geom && ST_Transform(bounds.geom, 4326)
+    )
+    SELECT ST_AsMVT(features.*, :layer) FROM features
+""")
+
+# (z, x, y) -> (bytes, stamp of the disk file they came from), most recently used last.
+# Hits are checked against the disk file, which every worker process shares: a tile
+# invalidated (file removed) or re-rendered (file replaced) by another worker is a miss.
+_memory = OrderedDict()
+# Invalidation counters, compared before caching a render that raced with a write
+_generations = {}  # (z, x, y) -> invalidations of that tile
+_epoch = 0  # bumped when _generations is reset to bound its size
+_lock = threading.Lock()
+
+
+def is_valid_tile(z, x, y):
+    """Check that z/x/y addresses an existing tile"""
+    if z < 0 or z > TILE_MAX_ZOOM:
+        return False
+    n = 1 << z
+    return 0 <= x < n and 0 <= y < n
+
+
+def tile_for_point(lon, lat, z):
+    """Return the (x, y) of the zoom-z tile containing a lon/lat point"""
+    n = 1 << z
+    lat = max(min(lat, 85.0511), -85.0511)  # web mercator limits
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _bump_epoch():
+    """Reset the per-tile counters; renders started before are not cached (call with _lock held)"""
+    global _epoch
+    _epoch += 1
+    _generations.clear()
+
+
+def _disk_path(z, x, y):
+    return os.path.join(TILE_CACHE_DIR, str(z), str(x), f"{y}.mvt")
+
+
+def _generation(key):
+    return _epoch, _generations.get(key, 0)
+
+
+def _stamp(st):
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _remember(key, data, stamp, generation):
+    with _lock:
+        if _generation(key) != generation:
+            return
+        _memory[key] = (data, stamp)
+        _memory.move_to_end(key)
+        while len(_memory) > TILE_CACHE_MAX_ITEMS:
+            _memory.popitem(last=False)
+
+
+def get_tile(db: Session, z: int, x: int, y: int):
+    """Return the MVT bytes for a tile, rendering it on a cache miss"""
+    key = (z, x, y)
+
+    path = _disk_path(z, x, y)
+    with _lock:
+        entry = _memory.get(key)
+        generation = _generation(key)
+    if entry is not None:
+        try:
+            if _stamp(os.stat(path)) == entry[1]:
+                with _lock:
+                    if key in _memory:
+                        _memory.move_to_end(key)
+                return entry[0]
+        except FileNotFoundError:
+            pass
+        with _lock:
+            if _memory.get(key) is entry:
+                del _memory[key]
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+            stamp = _stamp(os.fstat(f.fileno()))
+        _remember(key, data, stamp, generation)
+        return data
+    except FileNotFoundError:
+        pass
+
+    row = db.execute(TILE_SQL, {"z": z, "x": x, "y": y, "layer": LAYER_NAME}).first()
+    data = bytes(row[0]) if row and row[0] is not None else b""
+
+    # Write to a temp file first so readers never see a partial tile
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    with _lock:
+        # Invalidated while rendering: the tile may predate the change, serve it but don't cache it
+        if _generation(key) != generation:
+            os.remove(tmp_path)
+            return data
+        os.replace(tmp_path, path)
+        stamp = _stamp(os.stat(path))
+
+    _remember(key, data, stamp, generation)
+    return data
+
+
+def _forget(keys):
+    """Drop keys from memory and make renders/reads already under way skip caching them"""
+    with _lock:
+        for key in keys:
+            _memory.pop(key, None)
+            _generations[key] = _generations.get(key, 0) + 1
+        if len(_generations) > 4 * TILE_CACHE_MAX_ITEMS:
+            _bump_epoch()
+
+
+def invalidate_points(points):
+    """Drop every cached tile (all zoom levels) that contains one of the (lon, lat) points"""
+    keys = set()
+    for lon, lat in points:
+        for z in range(TILE_MAX_ZOOM + 1):
+            keys.add((z,) + tile_for_point(lon, lat, z))
+
+    _forget(keys)
+    dropped = 0
+    for z, x, y in keys:
+        try:
+            os.remove(_disk_path(z, x, y))
+            dropped += 1
+        except FileNotFoundError:
+            pass
+    # Again after the files are gone: a stale file read in between must not stay in memory
+    _forget(keys)
+    print(f"[TILES] Invalidated {len(keys)} tiles for {len(points)} point(s), {dropped} on disk")
+
+
+def invalidate_point(lon, lat):
+    """Drop every cached tile (all zoom levels) that contains the given point"""
+    invalidate_points([(lon, lat)])
+
+
+@events.subscribe
+def _on_report_change(change):
+    # New markers and status changes both alter the tiles under the reports
+    invalidate_points(change.points)
+
+
+def clear():
+    """Drop the whole tile cache"""
+    with _lock:
+        _memory.clear()
+        _bump_epoch()
+    shutil.rmtree(TILE_CACHE_DIR, ignore_errors=True)
+    os.makedirs(TILE_CACHE_DIR, exist_ok=True)
@@ -0,0 +1,74 @@
+"""
+Benchmark response formats for bulk report reads
+Compares bytes on the wire and serialization time of the current JSON
+against compressed and columnar encodings
+
+Run from backend-database/:
+    python -m benchmarks.bench_encoding --rows 10000
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from backend import encoding
+
+CLASSES = ["Cardboard Waste", "Cigarette", "Food Waste", "Glass Waste",
+           "Metal Waste", "Paper Waste", "Plastic Waste", "Styrofoam"]
+
+
+def make_rows(n):
+    """Synthetic rows shaped like app.report_to_dict output"""
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(n):
+        name = f"{(start + timedelta(minutes=i)).strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}.jpg"
+        rows.append({
+            "id": i + 1,
+            "image_path": f"/uploads/{name}",
+            "boxed_image_path": f"/annotated/boxed_{name}",
+            "prediction": random.choice(CLASSES),
+            "confidence": round(random.random(), 4),
+            "status": random.choice(["pending", "cleaned"]),
+            "latitude": 18.52 + random.uniform(-0.1, 0.1),
+            "longitude": 73.85 + random.uniform(-0.1, 0.1),
+            "created_at": start + timedelta(minutes=i),
+        })
+    return rows
+
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    codings = [None, "gzip"] + (["br"] if encoding.brotli is not None else [])
+
+    print(f"{'format':<42}{'bytes':>12}{'ratio':>8}{'encode ms':>12}")
+    baseline = None
+    for media_type in encoding.available_media_types():
+        body, encode_time = timed(lambda: encoding.encode(rows, media_type), args.repeat)
+        for coding in codings:
+            payload, compress_time = timed(lambda: encoding.compress(body, coding), args.repeat)
+            if baseline is None:
+                baseline = len(payload)
+            label = media_type + (f" + {coding}" if coding else "")
+            total_ms = (encode_time + (compress_time if coding else 0.0)) * 1000
+            print(f"{label:<42}{len(payload):>12}{len(payload) / baseline:>8.2f}{total_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
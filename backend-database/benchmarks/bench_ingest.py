@@ -0,0 +1,115 @@
+"""
+Benchmark report inserts: one transaction per upload vs the group-commit writer
+Drives an open-loop load of --rate uploads/s from many threads (like
+concurrent requests) against the database in DATABASE_URL, then prints the
+throughput achieved and the commit latency seen by callers. The rows it
+creates are deleted afterwards.
+
+Run from backend-database/:
+    python -m benchmarks.bench_ingest --rate 200 --seconds 10
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from backend import crud, db, ingest
+
+IMAGE_PREFIX = "bench-ingest/"
+
+
+def make_item():
+    return {
+        "image_path": f"{IMAGE_PREFIX}{uuid.uuid4().hex}.jpg",
+        "boxed_image_path": None,
+        # spread over ~50 km so the duplicate merge does not kick in
+        "lat": 18.52 + random.uniform(-0.25, 0.25),
+        "lon": 73.85 + random.uniform(-0.25, 0.25),
+        "prediction": "Plastic Waste",
+        "confidence": round(random.random(), 4),
+        "detections": None,
+    }
+
+
+def create_direct(item):
+    session = db.SessionLocal()
+    try:
+        crud.create_garbage_report(session, item["image_path"], item["lat"], item["lon"], item["prediction"],
+                                   item["confidence"], item["detections"], item["boxed_image_path"])
+    finally:
+        session.close()
+
+
+def run(name, create, rate, seconds, threads):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one():
+        t0 = time.perf_counter()
+        try:
+            create(make_item())
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            return
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+
+    total = int(rate * seconds)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for i in range(total):
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    if latencies:
+        p = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+        print(f"{name:<14}{len(latencies) / elapsed:>10.1f}{statistics.mean(latencies) * 1000:>10.1f}"
+              f"{p(0.5):>10.1f}{p(0.95):>10.1f}{p(0.99):>10.1f}{len(errors):>8}")
+    else:
+        print(f"{name:<14}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{len(errors):>8}")
+    if errors:
+        print(f"    first error: {errors[0]}")
+
+
+def cleanup():
+    with db.engine.begin() as conn:
+        ids = f"SELECT id FROM garbage_reports WHERE image_path LIKE '{IMAGE_PREFIX}%'"
+        conn.execute(text(f"DELETE FROM report_detections WHERE report_id IN ({ids})"))
+        conn.execute(text(f"DELETE FROM report_sightings WHERE image_path LIKE '{IMAGE_PREFIX}%' OR report_id IN ({ids})"))
+        deleted = conn.execute(text(f"DELETE FROM garbage_reports WHERE image_path LIKE '{IMAGE_PREFIX}%'")).rowcount
+    print(f"\nRemoved {deleted} benchmark report(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200, help="uploads per second offered")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=64, help="concurrent callers")
+    parser.add_argument("--mode", choices=["both", "direct", "group"], default="both")
+    args = parser.parse_args()
+
+    print(f"{args.rate:.0f} uploads/s for {args.seconds:.0f}s, {args.threads} threads, "
+          f"pool {db.engine.pool.size()}+{db.engine.pool._max_overflow}\n")
+    print(f"{'mode':<14}{'commits/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    try:
+        if args.mode in ("both", "direct"):
+            run("per-request", create_direct, args.rate, args.seconds, args.threads)
+        if args.mode in ("both", "group"):
+            run("group-commit", ingest.writer.create, args.rate, args.seconds, args.threads)
+            stats = ingest.writer.stats()
+            print(f"    {stats['batches']} transactions, {stats['avg_batch']} reports per transaction")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmark the report read/write queries under a configurable mix
+Replays a weighted mix of the queries behind the API endpoints (through the
+same crud functions) from several threads against the database in
+DATABASE_URL, then prints per-endpoint latency percentiles and rows/s.
+With --explain, each endpoint's SQL is captured once and its plan printed
+(EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL, EXPLAIN QUERY PLAN on SQLite);
+writes are explained inside a rolled-back transaction.
+
+The update endpoint only touches the synthetic reports and never commits:
+crud's commit releases a SAVEPOINT inside a transaction that is rolled back.
+
+Load data first with benchmarks.generate_data. Run from backend-database/:
+    python -m benchmarks.bench_queries --mix reports=1,area=4,by-status=2,nearby=2,detections=1,update=1 \
+        --threads 8 --seconds 30 --explain
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from backend import crud, db, models
+from benchmarks.generate_data import IMAGE_PREFIX
+
+DEFAULT_MIX = "reports=1,report=2,by-status=2,area=4,nearby=2,detections=1,update=1"
+AREA_SIZE_DEG = 0.01       # about 1 km boxes, a zoomed-in map view
+NEARBY_RADIUS_M = 500
+SAMPLE_POINTS = 2000
+
+
+class Workload:
+    """Random query arguments drawn from the data actually in the table"""
+
+    def __init__(self, session, seed):
+        self.rng = random.Random(seed)
+        report = models.GarbageReport
+        self.min_id, self.max_id = session.execute(select(func.min(report.id), func.max(report.id))).one()
+        if self.max_id is None:
+            raise SystemExit("garbage_reports is empty, load data with benchmarks.generate_data first")
+        # Query around places that have reports, like real map views do
+        ids = [self.rng.randint(self.min_id, self.max_id) for _ in range(SAMPLE_POINTS)]
+        self.points = session.execute(
+            select(func.ST_X(report.geom), func.ST_Y(report.geom)).where(report.id.in_(ids), report.geom.isnot(None))
+        ).all()
+        self.classes = [c for c in session.execute(select(report.prediction).distinct()).scalars() if c]
+        self.newest = session.execute(select(func.max(report.created_at))).scalar()
+        # Writes only go to rows made by generate_data, never to real reports
+        pivot = self.rng.randint(self.min_id, self.max_id)
+        synthetic = report.image_path.like(f"{IMAGE_PREFIX}%")
+        self.synthetic_ids = session.execute(
+            select(report.id).where(synthetic, report.id >= pivot).order_by(report.id).limit(SAMPLE_POINTS)
+        ).scalars().all() or session.execute(
+            select(report.id).where(synthetic).order_by(report.id).limit(SAMPLE_POINTS)
+        ).scalars().all()
+
+    def report_id(self):
+        return self.rng.randint(self.min_id, self.max_id)
+
+    def synthetic_id(self):
+        if not self.synthetic_ids:
+            raise RuntimeError("no synthetic reports to update, load data with benchmarks.generate_data")
+        return self.rng.choice(self.synthetic_ids)
+
+    def point(self):
+        lon, lat = self.rng.choice(self.points)
+        return lon, lat
+
+    def bbox(self):
+        lon, lat = self.point()
+        half = AREA_SIZE_DEG / 2
+        return lon - half, lat - half, lon + half, lat + half
+
+
+def _count(result):
+    if result is None:
+        return 0
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 1
+
+
+def update_rolled_back(session, workload):
+    """crud.update_report_status on a synthetic report, with nothing left committed"""
+    with db.engine.connect() as conn:
+        outer = conn.begin()
+        if db.IS_SQLITE:
+            # pysqlite defers BEGIN to the first write, so the SAVEPOINT would
+            # open (and its release commit) a transaction of its own; IMMEDIATE
+            # takes the write lock up front so concurrent updates wait instead of failing
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        # crud commits: in this mode that only releases a SAVEPOINT of the outer transaction
+        write_session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            return crud.update_report_status(write_session, workload.synthetic_id(),
+                                             workload.rng.choice(models.VALID_STATUSES))
+        finally:
+            write_session.close()
+            outer.rollback()
+
+
+ENDPOINTS = {
+    # name: (description, call(session, workload) -> result)
+    "reports": ("GET /reports", lambda s, w: crud.get_reports(s, skip=w.rng.randint(0, 10) * 100, limit=100)),
+    "report": ("GET /reports/{id}", lambda s, w: crud.get_report(s, w.report_id())),
+    "by-status": ("GET /reports/by-status/{status}",
+                  lambda s, w: crud.get_reports_by_status(s, w.rng.choice(models.VALID_STATUSES), limit=100)),
+    "area": ("GET /reports-in-area", lambda s, w: crud.get_reports_in_area(s, *w.bbox())),
+    "nearby": ("GET /reports/nearby",
+               lambda s, w: crud.get_reports_nearby(s, *reversed(w.point()), radius_m=NEARBY_RADIUS_M, limit=20)),
+    "detections": ("GET /detections/search",
+                   lambda s, w: crud.search_detections(s, class_name=w.rng.choice(w.classes), min_confidence=0.5,
+                                                       start=w.newest - timedelta(days=30), limit=100)),
+    "update": ("PATCH /reports/{id}/status", update_rolled_back),
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}', choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(mix, threads, seconds, seed):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies = {n: [] for n in names}
+    rows = {n: 0 for n in names}
+    errors = {n: 0 for n in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        session = db.SessionLocal()
+        workload = Workload(session, seed + index)
+        session.rollback()
+        try:
+            while time.perf_counter() < deadline:
+                name = workload.rng.choices(names, weights)[0]
+                t0 = time.perf_counter()
+                try:
+                    count = _count(ENDPOINTS[name][1](session, workload))
+                    session.rollback()  # end the read transaction like a request would
+                except Exception:
+                    session.rollback()
+                    with lock:
+                        errors[name] += 1
+                    continue
+                elapsed = time.perf_counter() - t0
+                with lock:
+                    latencies[name].append(elapsed)
+                    rows[name] += count
+        finally:
+            session.close()
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, rows, errors, time.perf_counter() - start
+
+
+def report(latencies, rows, errors, elapsed):
+    print(f"{'endpoint':<30}{'calls':>8}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'rows/s':>10}{'errors':>8}")
+    for name, values in latencies.items():
+        label = ENDPOINTS[name][0]
+        if not values:
+            print(f"{label:<30}{0:>8}{'-':>9}{'-':>9}{'-':>9}{'-':>9}{'-':>9}{'-':>10}{errors[name]:>8}")
+            continue
+        values.sort()
+        p = lambda q: values[min(int(q * len(values)), len(values) - 1)] * 1000
+        print(f"{label:<30}{len(values):>8}{len(values) / elapsed:>9.1f}{p(0.5):>9.1f}{p(0.95):>9.1f}"
+              f"{p(0.99):>9.1f}{values[-1] * 1000:>9.1f}{rows[name] / elapsed:>10.0f}{errors[name]:>8}")
+
+
+def capture_sql(name, seed):
+    """Statements (with parameters) one call of an endpoint sends to the database"""
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "INSERT", "DELETE", "WITH"):
+            statements.append((statement, parameters))
+
+    session = db.SessionLocal()
+    try:
+        workload = Workload(session, seed)
+        session.rollback()
+        event.listen(db.engine, "before_cursor_execute", before)
+        try:
+            ENDPOINTS[name][1](session, workload)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before)
+        session.rollback()
+    finally:
+        session.close()
+    return statements
+
+
+def explain(names, seed):
+    prefix = "EXPLAIN QUERY PLAN " if db.IS_SQLITE else "EXPLAIN (ANALYZE, BUFFERS) "
+    for name in names:
+        print(f"\n=== {ENDPOINTS[name][0]} ===")
+        for statement, parameters in capture_sql(name, seed):
+            print(statement.strip())
+            print("--")
+            with db.engine.connect() as conn:
+                try:
+                    for row in conn.exec_driver_sql(prefix + statement, parameters):
+                        print(row[-1])
+                finally:
+                    conn.rollback()  # EXPLAIN ANALYZE of a write really runs it
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"endpoint=weight,... (default: {DEFAULT_MIX})")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--explain", action="store_true", help="print each endpoint's query plans")
+    args = parser.parse_args()
+
+    print(f"{', '.join(f'{n}={w:g}' for n, w in args.mix.items())} for {args.seconds:.0f}s, "
+          f"{args.threads} threads, {datetime.utcnow():%Y-%m-%d %H:%M} UTC\n")
+    report(*run(args.mix, args.threads, args.seconds, args.seed))
+    if args.explain:
+        explain(args.mix, args.seed)
+
+
+if __name__ == "__main__":
+    main()
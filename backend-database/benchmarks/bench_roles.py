@@ -0,0 +1,92 @@
+"""
+Benchmark worker start-up per WORKER_ROLE: import time and memory
+Each run imports backend.app in a fresh interpreter with WORKER_ROLE set,
+like a new worker process would, and reports the import time, the resident
+memory afterwards, whether the ML stack (ultralytics, torch, cv2) got
+imported and how many routes are mounted. Roles that take uploads are also
+measured once the model is loaded, since ML_PRELOAD makes that happen right
+after start-up.
+
+Run from backend-database/:
+    python -m benchmarks.bench_roles --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROLES = ("read", "ingest", "all")
+
+# Runs in the child interpreter, prints one JSON line
+PROBE = r"""
+import json, os, sys, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+t0 = time.perf_counter()
+from backend import app as app_module
+import_s = time.perf_counter() - t0
+result = {
+    "import_s": import_s,
+    "rss_mb": rss_mb(),
+    "modules": len(sys.modules),
+    "routes": len(app_module.app.routes),
+    "ml_imported": any(name in sys.modules for name in ("ultralytics", "torch", "cv2")),
+}
+if os.environ.get("PROBE_LOAD_MODEL") == "1":
+    t0 = time.perf_counter()
+    loaded = app_module._ml_model().load_model() is not None
+    result.update(model_s=time.perf_counter() - t0, model_rss_mb=rss_mb(), model_loaded=loaded)
+print(json.dumps(result))
+"""
+
+
+def probe(role, load_model):
+    env = {**os.environ, "WORKER_ROLE": role, "PROBE_LOAD_MODEL": "1" if load_model else "0"}
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if out.returncode != 0:
+        raise RuntimeError(f"{role} worker failed to start:\n{out.stderr.strip()}")
+    # The app prints start-up logs, the probe result is the last line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per role (medians are printed)")
+    parser.add_argument("--roles", nargs="+", choices=ROLES, default=list(ROLES))
+    parser.add_argument("--no-model", action="store_true", help="skip loading the model in upload roles")
+    args = parser.parse_args()
+
+    print(f"{args.runs} run(s) per role, Python {sys.version.split()[0]}\n")
+    print(f"{'role':<8}{'import s':>10}{'RSS MB':>10}{'modules':>9}{'routes':>8}{'ML':>5}"
+          f"{'model s':>10}{'ready MB':>10}")
+    for role in args.roles:
+        load_model = role != "read" and not args.no_model
+        runs = [probe(role, load_model) for _ in range(args.runs)]
+        med = lambda key: statistics.median(r[key] for r in runs)
+        line = (f"{role:<8}{med('import_s'):>10.2f}{med('rss_mb'):>10.0f}{med('modules'):>9.0f}"
+                f"{runs[0]['routes']:>8}{'yes' if runs[0]['ml_imported'] else 'no':>5}")
+        if load_model:
+            line += f"{med('model_s'):>10.2f}{med('model_rss_mb'):>10.0f}"
+            if not runs[0]["model_loaded"]:
+                line += "  (model file missing, check MODEL_PATH)"
+        else:
+            line += f"{'-':>10}{med('rss_mb'):>10.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
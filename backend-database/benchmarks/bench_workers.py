@@ -0,0 +1,202 @@
+"""
+Benchmark throughput scaling of serve.py from 1 to N pre-forked workers
+For each worker count, starts serve.py on a free local port, waits for every
+worker to be ready, drives it with --clients closed-loop HTTP clients for
+--seconds and prints requests/s, latency and the speed-up over one worker.
+
+By default the clients GET --path (a dashboard read). With --image they
+POST that image to /predict instead, so the model runs on every request;
+each upload gets random coordinates and the reports created are deleted
+afterwards (the image is stored content-addressed, so they all share one
+image_path).
+
+The load generator is a thread pool in this process: check it is not the
+bottleneck (CPU of this process well below 100%) before trusting the top end.
+
+Run from backend-database/:
+    python -m benchmarks.bench_workers --workers 1 2 4 --seconds 15
+    python -m benchmarks.bench_workers --image sample.jpg --clients 16
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """serve.py in a subprocess"""
+
+    def __init__(self, workers, port, torch_threads):
+        cmd = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+        if torch_threads:
+            cmd += ["--torch-threads", str(torch_threads)]
+        self.proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self):
+        for line in self.proc.stdout:
+            self.lines.put(line.rstrip())
+        self.lines.put(None)
+
+    def wait_ready(self, timeout):
+        """Block until serve.py reports its workers ready, returns that log line"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise RuntimeError(f"serve.py not ready after {timeout:.0f}s")
+            if line is None:
+                raise RuntimeError("serve.py exited during start-up")
+            if "worker(s) ready" in line:
+                return line
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def multipart(image, image_name):
+    boundary = uuid.uuid4().hex
+    fields = {"latitude": f"{18.52 + random.uniform(-0.25, 0.25):.6f}",
+              "longitude": f"{73.85 + random.uniform(-0.25, 0.25):.6f}"}
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+             for k, v in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{image_name}"\r\n'
+                 f'Content-Type: image/jpeg\r\n\r\n'.encode() + image + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def drive(port, args, image):
+    """Closed-loop load for args.seconds, returns (latencies, errors, elapsed, report image paths)"""
+    latencies, errors, image_paths = [], [], set()
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.seconds
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                if image is None:
+                    conn.request("GET", args.path)
+                else:
+                    body, content_type = multipart(image, os.path.basename(args.image))
+                    conn.request("POST", "/predict", body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                data = response.read()
+                if response.status >= 400:
+                    raise RuntimeError(f"HTTP {response.status}: {data[:200]!r}")
+            except Exception as e:
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                with lock:
+                    errors.append(e)
+                continue
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if image is not None:
+                    image_paths.add(json.loads(data)["image_path"].rsplit("/uploads/", 1)[-1])
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - start, image_paths
+
+
+def cleanup(image_paths):
+    from sqlalchemy import text
+    from backend import db
+
+    deleted = 0
+    with db.engine.begin() as conn:
+        for path in image_paths:
+            ids = "SELECT id FROM garbage_reports WHERE image_path = :path"
+            conn.execute(text(f"DELETE FROM report_detections WHERE report_id IN ({ids})"), {"path": path})
+            conn.execute(text(f"DELETE FROM report_sightings WHERE image_path = :path OR report_id IN ({ids})"),
+                         {"path": path})
+            deleted += conn.execute(text("DELETE FROM garbage_reports WHERE image_path = :path"), {"path": path}).rowcount
+    print(f"\nRemoved {deleted} benchmark report(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to compare")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent HTTP clients")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of load discarded before measuring")
+    parser.add_argument("--path", default="/reports?limit=50", help="GET path when no --image is given")
+    parser.add_argument("--image", help="POST this image to /predict (runs the model)")
+    parser.add_argument("--torch-threads", type=int, default=0, help="passed to serve.py (default: CPUs / workers)")
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    image = None
+    if args.image:
+        with open(args.image, "rb") as f:
+            image = f.read()
+
+    target = f"POST /predict ({os.path.basename(args.image)})" if image else f"GET {args.path}"
+    print(f"{target}, {args.clients} clients, {args.seconds:.0f}s per run, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8}{'req/s':>10}{'speed-up':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+    image_paths = set()
+    baseline = None
+    try:
+        for workers in args.workers:
+            port = free_port()
+            server = Server(workers, port, args.torch_threads)
+            try:
+                server.wait_ready(args.ready_timeout)
+                if args.warmup > 0:
+                    image_paths |= drive(port, argparse.Namespace(**{**vars(args), "seconds": args.warmup}), image)[3]
+                latencies, errors, elapsed, paths = drive(port, args, image)
+                image_paths |= paths
+            finally:
+                server.stop()
+
+            latencies.sort()
+            rate = len(latencies) / elapsed
+            baseline = baseline or rate
+            if latencies:
+                p = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+                print(f"{workers:>8}{rate:>10.1f}{rate / baseline:>9.2f}x{p(0.5):>10.1f}{p(0.95):>10.1f}"
+                      f"{p(0.99):>10.1f}{len(errors):>8}")
+            else:
+                print(f"{workers:>8}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{len(errors):>8}")
+            if errors:
+                print(f"    first error: {errors[0]}")
+    finally:
+        if image_paths:
+            cleanup(image_paths)
+
+
+if __name__ == "__main__":
+    main()
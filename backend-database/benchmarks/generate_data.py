@@ -0,0 +1,249 @@
+"""
+Bulk-load realistic synthetic garbage reports for load testing
+Reports cluster around hotspots of a city (markets, bus stands, ...) with a
+thin uniform background, follow a skewed class mix, age over --days and get
+cleaned with age, and carry 1-4 detections each (also written to
+report_detections). Rows go in with COPY on PostgreSQL and executemany on
+SQLite, using the database in DATABASE_URL. Synthetic rows are tagged by
+their image_path prefix and can be removed with --clean.
+
+Run from backend-database/:
+    python -m benchmarks.generate_data --rows 1000000
+    python -m benchmarks.generate_data --clean
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from backend import db, partitions, sqlite_store
+
+IMAGE_PREFIX = "synthetic/"
+
+# Model classes (ids as in backend/ml/model.py) and how often each shows up
+CLASSES = {
+    0: ("Cardboard Waste", 0.10),
+    1: ("Cigarette", 0.12),
+    2: ("Food Waste", 0.16),
+    3: ("Glass Waste", 0.07),
+    4: ("Metal Waste", 0.06),
+    5: ("Paper Waste", 0.13),
+    6: ("Plastic Waste", 0.31),
+    7: ("Styrofoam", 0.05),
+}
+NO_WASTE_SHARE = 0.03
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 6, 8, 9, 9, 8, 8, 8, 8, 8, 8, 8, 7, 6, 4, 3, 2, 1]
+
+REPORT_COLUMNS = ["id", "image_path", "boxed_image_path", "prediction", "confidence", "detections",
+                  "status", "created_at", "geom", "sighting_count", "last_seen_at"]
+DETECTION_COLUMNS = ["report_id", "class_id", "class_name", "confidence", "bbox", "created_at", "geom"]
+
+
+class CityModel:
+    """Clustered report locations around a city centre"""
+
+    def __init__(self, rng, center_lat, center_lon, radius_km, hotspots):
+        self.rng = rng
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+        self.radius_km = radius_km
+        # Hotspot popularity is heavy-tailed: a few places get most reports
+        self.hotspots = []
+        for rank in range(1, hotspots + 1):
+            lat, lon = self._offset(center_lat, center_lon, rng.uniform(0, radius_km) * 1000)
+            self.hotspots.append((lat, lon, rng.uniform(80, 900), 1.0 / rank ** 0.8))
+        self.weights = [h[3] for h in self.hotspots]
+
+    def _offset(self, lat, lon, distance_m, bearing=None):
+        bearing = self.rng.uniform(0, 2 * math.pi) if bearing is None else bearing
+        dlat = distance_m * math.cos(bearing) / 111320.0
+        dlon = distance_m * math.sin(bearing) / (111320.0 * math.cos(math.radians(lat)))
+        return lat + dlat, lon + dlon
+
+    def point(self):
+        """(lat, lon) of one report: 90% around a hotspot, 10% anywhere in the city"""
+        if self.rng.random() < 0.1:
+            return self._offset(self.center_lat, self.center_lon, self.radius_km * 1000 * math.sqrt(self.rng.random()))
+        lat, lon, sigma_m, _ = self.rng.choices(self.hotspots, self.weights)[0]
+        return self._offset(lat, lon, abs(self.rng.gauss(0, sigma_m)))
+
+
+def make_detections(rng):
+    """Detections JSON as stored by the upload endpoints, primary first"""
+    if rng.random() < NO_WASTE_SHARE:
+        return None
+    ids = list(CLASSES)
+    weights = [CLASSES[i][1] for i in ids]
+    detections = []
+    for _ in range(rng.choices([1, 2, 3, 4], [0.55, 0.25, 0.13, 0.07])[0]):
+        class_id = rng.choices(ids, weights)[0]
+        x1, y1 = rng.uniform(0, 560), rng.uniform(0, 560)
+        detections.append({
+            "class": CLASSES[class_id][0],
+            "class_id": class_id,
+            "confidence": round(rng.betavariate(5, 2), 4),
+            "bbox": [round(x1, 2), round(y1, 2), round(x1 + rng.uniform(20, 640 - x1), 2), round(y1 + rng.uniform(20, 640 - y1), 2)],
+        })
+    detections.sort(key=lambda d: d["confidence"], reverse=True)
+    primary = detections[0]
+    return {
+        "count": len(detections),
+        "primary": {"class": primary["class"], "confidence": primary["confidence"], "bbox": primary["bbox"]},
+        "all": detections,
+    }
+
+
+def generate(rng, city, first_id, count, days, now):
+    """Yield (report row, detection rows) for count reports"""
+    for report_id in range(first_id, first_id + count):
+        lat, lon = city.point()
+        # Reported mostly in the daytime
+        created_at = (now - timedelta(days=rng.uniform(0, days))).replace(hour=rng.choices(range(24), HOURLY_WEIGHTS)[0])
+        created_at = min(created_at, now)
+        age_days = (now - created_at).total_seconds() / 86400
+        status = "cleaned" if rng.random() < min(0.95, age_days / 30) else "pending"
+        detections = make_detections(rng)
+        sightings = 1 if rng.random() < 0.8 else 1 + int(rng.expovariate(0.5))
+        last_seen = created_at + timedelta(hours=rng.uniform(0, 24)) if sightings > 1 else None
+        ewkt = f"SRID=4326;POINT({lon:.7f} {lat:.7f})"
+        name = f"{IMAGE_PREFIX}{report_id:010d}.jpg"
+        report = {
+            "id": report_id,
+            "image_path": name,
+            "boxed_image_path": name if detections else None,
+            "prediction": detections["primary"]["class"] if detections else "No Waste Detected",
+            "confidence": detections["primary"]["confidence"] if detections else 0.0,
+            "detections": detections,
+            "status": status,
+            "created_at": created_at,
+            "geom": (lon, lat, ewkt),
+            "sighting_count": sightings,
+            "last_seen_at": min(last_seen, now) if last_seen else None,
+        }
+        detection_rows = [{
+            "report_id": report_id,
+            "class_id": d["class_id"],
+            "class_name": d["class"],
+            "confidence": d["confidence"],
+            "bbox": d["bbox"],
+            "created_at": created_at,
+            "geom": (lon, lat, ewkt),
+        } for d in (detections["all"] if detections else [])]
+        yield report, detection_rows
+
+
+def _csv_value(column, value):
+    if value is None:
+        return None
+    if column == "geom":
+        return value[2]
+    if column in ("detections", "bbox"):
+        return json.dumps(value, separators=(",", ":"))
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def _copy(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if (v := _csv_value(c, row[c])) is None else v for c in columns])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+def _sqlite_value(column, value):
+    if column == "geom":
+        return sqlite_store.point_blob(value[0], value[1])
+    return _csv_value(column, value)
+
+
+def _insert_sqlite(cursor, table, columns, rows):
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [[_sqlite_value(c, row[c]) for c in columns] for row in rows],
+    )
+
+
+def reserve_ids(conn, count):
+    """First of count consecutive report ids nobody else will get"""
+    if db.IS_SQLITE:
+        return (conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM garbage_reports")).scalar() or 0) + 1
+    first = conn.execute(text("SELECT nextval('garbage_reports_id_seq')")).scalar()
+    conn.execute(text("SELECT setval('garbage_reports_id_seq', :last)"), {"last": first + count - 1})
+    return first
+
+
+def load(rows, days, batch, seed, center_lat, center_lon, radius_km, hotspots):
+    rng = random.Random(seed)
+    city = CityModel(rng, center_lat, center_lon, radius_km, hotspots)
+    now = datetime.utcnow()
+
+    with db.engine.begin() as conn:
+        first_id = reserve_ids(conn, rows)
+        if not db.IS_SQLITE and partitions.is_partitioned(conn):
+            partitions.create_partitions(conn, partitions.month_start(now - timedelta(days=days)), partitions.month_start(now))
+
+    t0 = time.perf_counter()
+    generated = generate(rng, city, first_id, rows, days, now)
+    loaded = detections = 0
+    while loaded < rows:
+        reports, detection_rows = [], []
+        for report, dets in (next(generated) for _ in range(min(batch, rows - loaded))):
+            reports.append(report)
+            detection_rows.extend(dets)
+        with db.engine.begin() as conn:
+            cursor = conn.connection.cursor()
+            write = _insert_sqlite if db.IS_SQLITE else _copy
+            write(cursor, "garbage_reports", REPORT_COLUMNS, reports)
+            write(cursor, "report_detections", DETECTION_COLUMNS, detection_rows)
+        loaded += len(reports)
+        detections += len(detection_rows)
+        elapsed = time.perf_counter() - t0
+        print(f"[GENERATE] {loaded}/{rows} reports, {detections} detections ({loaded / elapsed:.0f} reports/s)")
+
+    with db.engine.begin() as conn:
+        if not db.IS_SQLITE:
+            conn.execute(text("ANALYZE garbage_reports"))
+            conn.execute(text("ANALYZE report_detections"))
+    print(f"[GENERATE] Done: ids {first_id}..{first_id + rows - 1} in {time.perf_counter() - t0:.1f}s")
+
+
+def clean():
+    like = {"prefix": IMAGE_PREFIX + "%"}
+    with db.engine.begin() as conn:
+        for table in ("report_detections", "report_sightings"):
+            conn.execute(text(f"""
+                DELETE FROM {table} WHERE report_id IN
+                    (SELECT id FROM garbage_reports WHERE image_path LIKE :prefix)
+            """), like)
+        deleted = conn.execute(text("DELETE FROM garbage_reports WHERE image_path LIKE :prefix"), like).rowcount
+    print(f"[GENERATE] Removed {deleted} synthetic report(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365, help="spread created_at over this many days")
+    parser.add_argument("--batch", type=int, default=50_000, help="reports per COPY / transaction")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--center", default="18.5204,73.8567", help="city centre lat,lon (default: Pune)")
+    parser.add_argument("--radius-km", type=float, default=15)
+    parser.add_argument("--hotspots", type=int, default=400)
+    parser.add_argument("--clean", action="store_true", help="delete previously generated rows and exit")
+    args = parser.parse_args()
+
+    if args.clean:
+        clean()
+        return
+    center_lat, center_lon = (float(v) for v in args.center.split(","))
+    load(args.rows, args.days, args.batch, args.seed, center_lat, center_lon, args.radius_km, args.hotspots)
+
+
+if __name__ == "__main__":
+    main()
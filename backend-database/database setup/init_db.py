@@ -1,14 +1,16 @@
 """
 Database initialization script
 Run this to create all tables in the database
+
+Applies every schema migration (see backend/migrations), so it is safe to
+run against an existing database too.
 """
-from backend.db import engine, Base
-from backend.models import GarbageReport
+from backend.migrations import upgrade
 
 def init_db():
     """Create all tables"""
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    upgrade()
     print("✓ Database tables created successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Migrate flat upload directories to the content-addressed image store
+Moves every file referenced by garbage_reports into UPLOAD_DIR / ANNOTATED_DIR
+sharded by content hash and rewrites image_path / boxed_image_path
+
+Usage (from backend-database/):
+    python "database setup/migrate_image_store.py" [--dry-run]
+"""
+import argparse
+import os
+from sqlalchemy import text
+from backend.db import engine
+from backend.config import UPLOAD_DIR, ANNOTATED_DIR
+from backend import storage
+
+BATCH_SIZE = 1000
+
+
+def _migrate_name(name, root, moved, sources, dry_run):
+    """Return the new blob name for a legacy flat name, or None to leave it as is"""
+    if not name or storage.is_content_addressed(name):
+        return None
+    if name in moved:
+        return moved[name]
+
+    src_path = storage.path_for(root, name)
+    if not os.path.exists(src_path):
+        print(f"[MIGRATION WARNING] Missing file, leaving row as is: {src_path}")
+        return None
+
+    # Copy now, delete the flat file only after its rows are committed
+    new_name = name if dry_run else storage.import_file(src_path, root, remove_source=False)
+    moved[name] = new_name
+    sources.append(src_path)
+    return new_name
+
+
+def migrate_image_store(dry_run=False):
+    """Move referenced files into the image store and update the rows"""
+    moved_uploads = {}
+    moved_annotated = {}
+    updated = 0
+
+    with engine.connect() as read_conn:
+        rows = read_conn.execution_options(stream_results=True, max_row_buffer=BATCH_SIZE).execute(
+            text("SELECT id, image_path, boxed_image_path FROM garbage_reports ORDER BY id")
+        )
+
+        pending = []
+        sources = []
+        for report_id, image_path, boxed_image_path in rows:
+            new_image = _migrate_name(image_path, UPLOAD_DIR, moved_uploads, sources, dry_run)
+            new_boxed = _migrate_name(boxed_image_path, ANNOTATED_DIR, moved_annotated, sources, dry_run)
+            if new_image is None and new_boxed is None:
+                continue
+
+            pending.append({
+                "id": report_id,
+                "image_path": new_image or image_path,
+                "boxed_image_path": new_boxed or boxed_image_path,
+            })
+            if len(pending) >= BATCH_SIZE:
+                updated += _write(pending, sources, dry_run)
+                pending = []
+                sources = []
+
+        if pending:
+            updated += _write(pending, sources, dry_run)
+
+    print(f"[MIGRATION] {len(moved_uploads)} upload(s) and {len(moved_annotated)} annotated image(s) moved")
+    print(f"[MIGRATION] {updated} report row(s) {'would be ' if dry_run else ''}updated")
+
+
+def _write(pending, sources, dry_run):
+    if dry_run:
+        return len(pending)
+    # Each batch commits on its own, so an interrupted run can simply be re-run
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE garbage_reports SET image_path = :image_path, boxed_image_path = :boxed_image_path WHERE id = :id"),
+            pending,
+        )
+    for src_path in sources:
+        try:
+            os.remove(src_path)
+        except FileNotFoundError:
+            pass
+    return len(pending)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate uploads to the content-addressed image store")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+    migrate_image_store(dry_run=args.dry_run)
@@ -1,5 +1,5 @@
 """
-Start the FastAPI development server
+Start the FastAPI development server (serve.py runs it in production)
 """
 import uvicorn
 
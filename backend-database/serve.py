@@ -0,0 +1,265 @@
+"""
+Start the API in production: one master process, N pre-forked uvicorn workers
+The master imports the app and loads the ML model once, freezes the heap and
+forks the workers, which share the model weights copy-on-write instead of
+each loading its own copy. All workers accept on one listening socket.
+
+Signals to the master:
+    SIGTERM / SIGINT  graceful shutdown of every worker, then exit
+    SIGHUP            rolling restart: workers are replaced one at a time,
+                      each only after its replacement is accepting requests
+                      (replacements are forked from the master, so new code
+                      needs a full restart)
+
+Each worker has its own read cache and tile memory. A write made by one
+worker reaches the others' caches through the report_changes table within
+CHANGE_POLL_SECONDS (backend/broadcast.py); tiles in memory are also checked
+against the shared tile cache directory on every hit. With CHANGE_BROADCAST
+off and more than one worker, the read cache is disabled instead.
+
+Workers that die are started again. POSIX only (needs os.fork); use run.py
+for development.
+
+Usage, from backend-database/:
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import random
+import select
+import signal
+import sys
+import time
+
+
+def parse_args():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(cpus))))
+    parser.add_argument("--torch-threads", type=int, default=int(os.getenv("TORCH_THREADS", "0")),
+                        help="intra-op threads per worker (default: CPUs / workers)")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds a stopping worker gets to finish its requests")
+    parser.add_argument("--ready-timeout", type=float, default=float(os.getenv("READY_TIMEOUT", "120")),
+                        help="seconds a new worker gets to start accepting requests")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+    args.workers = max(1, args.workers)
+    args.torch_threads = args.torch_threads or max(1, cpus // args.workers)
+    return args
+
+
+def log(message):
+    print(f"[SERVE {os.getpid()}] {message}", flush=True)
+
+
+class Master:
+    """Forks, watches and replaces the worker processes"""
+
+    def __init__(self, args, app, sock):
+        self.args = args
+        self.app = app
+        self.sock = sock
+        self.workers = {}  # pid -> slot
+        self.started_at = {}  # slot -> monotonic start time of its current worker
+        self.stopping = False
+        self.reload_requested = False
+
+    def _worker_main(self, ready_fd):
+        """Runs in the forked child, never returns"""
+        import uvicorn
+        from backend import db
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        random.seed()
+        # Pooled connections were opened by the master: never reuse them here
+        db.dispose_after_fork()
+        _limit_threads(self.args.torch_threads)
+
+        class WorkerServer(uvicorn.Server):
+            async def startup(self, sockets=None):
+                await super().startup(sockets=sockets)
+                try:
+                    if not self.should_exit:
+                        os.write(ready_fd, b"1")
+                except BrokenPipeError:
+                    pass  # respawned worker, the master is not waiting for it
+                os.close(ready_fd)
+
+        config = uvicorn.Config(
+            self.app,
+            log_level=self.args.log_level,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+        )
+        code = 0
+        try:
+            WorkerServer(config).run(sockets=[self.sock])
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def spawn(self, slot):
+        """Fork a worker for slot, returns (pid, fd that becomes readable once it accepts requests)"""
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            self._worker_main(ready_w)
+        os.close(ready_w)
+        self.workers[pid] = slot
+        self.started_at[slot] = time.monotonic()
+        return pid, ready_r
+
+    def wait_ready(self, ready_r):
+        """Whether the worker signalled it is serving before the ready timeout"""
+        try:
+            # A worker that dies first closes its end of the pipe: read() returns b""
+            readable, _, _ = select.select([ready_r], [], [], self.args.ready_timeout)
+            return bool(readable) and os.read(ready_r, 1) == b"1"
+        finally:
+            os.close(ready_r)
+
+    def stop_worker(self, pid, timeout):
+        """SIGTERM a worker and wait for it, SIGKILL after timeout"""
+        self.workers.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if done:
+                return
+            time.sleep(0.05)
+        log(f"Worker {pid} did not stop in {timeout:.0f}s, killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def rolling_restart(self):
+        log("Rolling restart")
+        for old_pid, slot in sorted(self.workers.items(), key=lambda item: item[1]):
+            if self.stopping:
+                return
+            pid, ready_r = self.spawn(slot)
+            if not self.wait_ready(ready_r):
+                log(f"Replacement worker {pid} for slot {slot} did not start, keeping {old_pid}")
+                self.stop_worker(pid, 0)
+                return
+            self.stop_worker(old_pid, self.args.graceful_timeout)
+            log(f"Slot {slot}: worker {old_pid} replaced by {pid}")
+        log("Rolling restart done")
+
+    def reap_and_respawn(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            log(f"Worker {pid} (slot {slot}) exited with status {status}, starting a new one")
+            # Don't spin if workers die right after starting
+            if time.monotonic() - self.started_at.get(slot, 0) < 1.0:
+                time.sleep(1.0)
+            pid, ready_r = self.spawn(slot)
+            os.close(ready_r)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+
+        started = time.monotonic()
+        pending = [self.spawn(slot) for slot in range(self.args.workers)]
+        ready = sum(self.wait_ready(ready_r) for _, ready_r in pending)
+        log(f"{ready}/{self.args.workers} worker(s) ready in {time.monotonic() - started:.1f}s "
+            f"on {self.args.host}:{self.args.port}, {self.args.torch_threads} torch thread(s) each")
+
+        while not self.stopping:
+            self.reap_and_respawn()
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            time.sleep(0.2)
+
+        log(f"Stopping {len(self.workers)} worker(s)")
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout
+        for pid in list(self.workers):
+            self.stop_worker(pid, max(0.0, deadline - time.monotonic()))
+        self.sock.close()
+
+    def _request_stop(self, *_):
+        self.stopping = True
+
+    def _request_reload(self, *_):
+        self.reload_requested = True
+
+
+def _limit_threads(threads):
+    """Cap the math libraries' thread pools so N workers don't oversubscribe the CPUs"""
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+    if "cv2" in sys.modules:
+        import cv2
+        cv2.setNumThreads(threads)
+
+
+def main():
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork (Linux/macOS); use run.py on this platform")
+    args = parse_args()
+
+    # OpenMP/MKL read these when torch is first imported, which happens in this process
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(name, str(args.torch_threads))
+
+    import uvicorn
+    from backend import app as app_module, cache, config
+
+    if args.workers > 1 and not config.CHANGE_BROADCAST:
+        # No worker would hear of the others' writes: keep no per-process copies of query results
+        cache.reports.ttl = 0
+        log("CHANGE_BROADCAST is off, read cache disabled in the workers")
+
+    if config.SERVES_INGEST:
+        t0 = time.perf_counter()
+        model = app_module._ml_model().load_model()
+        if model is not None:
+            log(f"Model loaded in {time.perf_counter() - t0:.1f}s, shared with the workers")
+
+    # Objects loaded so far are never freed: keep the collector from touching
+    # (and so copying) their pages in every worker
+    gc.collect()
+    gc.freeze()
+
+    sock = uvicorn.Config(app_module.app, host=args.host, port=args.port).bind_socket()
+    sock.set_inheritable(True)
+    log(f"Role '{config.WORKER_ROLE}', forking {args.workers} worker(s)")
+    Master(args, app_module.app, sock).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,12 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import uuid
+import time
+import shutil
+import atexit
 import logging
 from datetime import datetime, timezone
+from email.utils import formatdate
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
@@ -11,8 +15,12 @@ load_dotenv()
 
 try:
     from .firebase_client import get_db, is_configured
+    from . import report_mirror, firebase_writer, resumable
 except Exception:
     from firebase_client import get_db, is_configured
+    import report_mirror
+    import firebase_writer
+    import resumable
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -20,15 +28,109 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
 MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "10"))
 
+REPORTS_PAGE_SIZE = int(os.environ.get("REPORTS_PAGE_SIZE", "50"))
+REPORTS_MAX_PAGE_SIZE = int(os.environ.get("REPORTS_MAX_PAGE_SIZE", "500"))
+# Serve /reports from a listener-fed local copy: off, memory or sqlite
+REPORT_MIRROR = os.environ.get("REPORT_MIRROR", "off").lower()
+REPORT_MIRROR_PATH = os.environ.get("REPORT_MIRROR_PATH", os.path.join(os.path.dirname(__file__), "report_mirror.db"))
+
+# Hand report writes to a journaled background writer instead of writing to Firebase in the request
+# (each process journals to FIREBASE_JOURNAL_PATH.<pid>, see firebase_writer)
+FIREBASE_WRITE_BEHIND = os.environ.get("FIREBASE_WRITE_BEHIND", "1").lower() in ("1", "true", "yes")
+FIREBASE_JOURNAL_PATH = os.environ.get("FIREBASE_JOURNAL_PATH", os.path.join(os.path.dirname(__file__), "firebase_journal.jsonl"))
+FIREBASE_JOURNAL_FSYNC = os.environ.get("FIREBASE_JOURNAL_FSYNC", "1").lower() in ("1", "true", "yes")
+FIREBASE_WRITE_MAX_BATCH = int(os.environ.get("FIREBASE_WRITE_MAX_BATCH", "500"))
+FIREBASE_WRITE_MAX_WAIT_MS = int(os.environ.get("FIREBASE_WRITE_MAX_WAIT_MS", "50"))
+
+# Resumable (tus) uploads: each PATCH is still bounded by MAX_UPLOAD_MB, the whole photo by RESUMABLE_MAX_MB
+RESUMABLE_DIR = os.environ.get("RESUMABLE_DIR", os.path.join(os.path.dirname(__file__), "resumable_uploads"))
+RESUMABLE_MAX_MB = int(os.environ.get("RESUMABLE_MAX_MB", "20"))
+RESUMABLE_EXPIRY_HOURS = float(os.environ.get("RESUMABLE_EXPIRY_HOURS", "24"))
+RESUMABLE_GC_MINUTES = float(os.environ.get("RESUMABLE_GC_MINUTES", "30"))
+
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
 
+def _start_mirror():
+    db = get_db()
+    if REPORT_MIRROR == "off" or db is None or not is_configured():
+        return None
+    store = report_mirror.SQLiteStore(REPORT_MIRROR_PATH) if REPORT_MIRROR == "sqlite" else report_mirror.MemoryStore()
+    try:
+        return report_mirror.ReportMirror(db.reference("reports"), store).start()
+    except Exception as err:
+        logger.warning(f"Report mirror disabled, failed to listen: {err}")
+        return None
+
+
+def _start_writer():
+    db = get_db()
+    if not FIREBASE_WRITE_BEHIND or db is None or not is_configured():
+        return None
+    writer = firebase_writer.WriteBehindWriter(
+        db.reference("reports"),
+        FIREBASE_JOURNAL_PATH,
+        max_batch=FIREBASE_WRITE_MAX_BATCH,
+        max_wait=FIREBASE_WRITE_MAX_WAIT_MS / 1000,
+        fsync=FIREBASE_JOURNAL_FSYNC,
+    )
+    atexit.register(writer.close)
+    # Start now so writes journaled before a restart are sent without waiting for a new upload
+    return writer.start()
+
+
 def create_app():
     app = Flask(__name__)
     app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
     CORS(app)
+    mirror = _start_mirror()
+    app.extensions["report_mirror"] = mirror
+    writer = _start_writer()
+    app.extensions["firebase_writer"] = writer
+    uploads = resumable.UploadStore(RESUMABLE_DIR, RESUMABLE_MAX_MB * 1024 * 1024, RESUMABLE_EXPIRY_HOURS * 3600)
+    last_gc = [0.0]
+
+    def _save_report(report_id, saved_filename, save_path, latitude, longitude):
+        """Label a saved image, hand its record to Firebase and build the /predict response"""
+        detections = []
+        predicted_labels = ["unsorted_waste"] if os.path.getsize(save_path) > 0 else []
+
+        record = {
+            "id": report_id,
+            "image_filename": saved_filename,
+            "latitude": latitude,
+            "longitude": longitude,
+            "detections": detections,
+            "labels": predicted_labels,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        db = get_db()
+        if writer is not None:
+            writer.enqueue(report_id, record)
+            if mirror is not None:
+                mirror.apply(report_id, record)
+        elif db is not None and is_configured():
+            try:
+                ref = db.reference("reports")
+                ref.child(report_id).set(record)
+                if mirror is not None:
+                    mirror.apply(report_id, record)
+            except Exception as firebase_err:
+                logger.warning(f"Failed to write to Firebase: {firebase_err}")
+
+        image_url = f"/uploads/{saved_filename}"
+        return {
+            "success": True,
+            "id": report_id,
+            "labels": predicted_labels,
+            "image": saved_filename,
+            "image_url": image_url,
+            "latitude": latitude,
+            "longitude": longitude,
+        }
 
     @app.before_request
     def _log_request():
@@ -42,23 +144,56 @@ def create_app():
     def health():
         return {"status": "ok"}, 200
 
+    @app.get("/admin/firebase-writer")
+    def firebase_writer_stats():
+        """Write-behind queue depth, flush latency and failures"""
+        if writer is None:
+            return {"enabled": False}, 200
+        return {"enabled": True, **writer.stats()}, 200
+
     @app.get("/uploads/<path:filename>")
     def get_uploaded_file(filename: str):
         return send_from_directory(UPLOAD_DIR, filename, as_attachment=False)
 
     @app.get("/reports")
     def list_reports():
+        """
+        One page of reports: ?limit=&order_by=key|created_at&direction=asc|desc&cursor=
+
+        Newest first by default. next_cursor in the response fetches the
+        following page and carries its own ordering.
+        """
+        limit = request.args.get("limit", REPORTS_PAGE_SIZE, type=int)
+        if limit < 1 or limit > REPORTS_MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {REPORTS_MAX_PAGE_SIZE}"}), 400
+        order_by = request.args.get("order_by", "created_at")
+        direction = request.args.get("direction", "desc")
+        if order_by not in report_mirror.ORDERS or direction not in ("asc", "desc"):
+            return jsonify({"error": "order_by must be key or created_at, direction asc or desc"}), 400
+        descending = direction == "desc"
+        after = None
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                order_by, descending, after = report_mirror.decode_cursor(cursor)
+            except ValueError as err:
+                return jsonify({"error": str(err)}), 400
+
         db = get_db()
         if db is None or not is_configured():
-            return jsonify({"reports": []}), 200
+            return jsonify({"reports": [], "next_cursor": None}), 200
         try:
-            ref = db.reference("reports")
-            data = ref.get() or {}
-            reports = list(data.values())
-            return jsonify({"reports": reports}), 200
+            if mirror is not None and mirror.ready.is_set():
+                reports, next_cursor = mirror.page(order_by, descending, limit, after)
+            else:
+                reports, next_cursor = report_mirror.fetch_page(db.reference("reports"), order_by, descending, limit, after)
+            return jsonify({"reports": reports, "next_cursor": next_cursor}), 200
+        except report_mirror.MissingIndexError as err:
+            logger.error(str(err))
+            return jsonify({"error": str(err)}), 500
         except Exception as err:
             logger.warning(f"Failed to fetch reports: {err}")
-            return jsonify({"reports": []}), 200
+            return jsonify({"error": "Failed to fetch reports"}), 502
 
     @app.post("/predict")
     def predict():
@@ -88,37 +223,121 @@ def create_app():
         except ValueError:
             return jsonify({"error": "Invalid coordinates"}), 400
 
-        detections = []
-        predicted_labels = ["unsorted_waste"] if os.path.getsize(save_path) > 0 else []
+        return jsonify(_save_report(report_id, saved_filename, save_path, latitude, longitude)), 200
 
-        record = {
-            "id": report_id,
-            "image_filename": saved_filename,
-            "latitude": latitude,
-            "longitude": longitude,
-            "detections": detections,
-            "labels": predicted_labels,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-        }
+    # Resumable uploads (tus 1.0): create with Upload-Length and Upload-Metadata
+    # (filename, lat, lng), PATCH chunks at the current offset, HEAD for the offset.
+    # The PATCH that completes an upload answers with the /predict response.
 
-        db = get_db()
-        if db is not None and is_configured():
-            try:
-                ref = db.reference("reports")
-                ref.child(report_id).set(record)
-            except Exception as firebase_err:
-                logger.warning(f"Failed to write to Firebase: {firebase_err}")
+    def _tus(response, **headers):
+        response.headers["Tus-Resumable"] = resumable.TUS_VERSION
+        for name, value in headers.items():
+            response.headers[name.replace("_", "-")] = str(value)
+        return response
 
-        image_url = f"/uploads/{saved_filename}"
-        return jsonify({
-            "success": True,
-            "id": report_id,
-            "labels": predicted_labels,
-            "image": saved_filename,
-            "image_url": image_url,
-            "latitude": latitude,
-            "longitude": longitude,
-        }), 200
+    def _tus_error(err):
+        return _tus(jsonify({"error": err.message})), err.status_code
+
+    @app.route("/resumable-uploads", methods=["OPTIONS"], provide_automatic_options=False)
+    def resumable_options():
+        return _tus(app.response_class(status=204), Tus_Version=resumable.TUS_VERSION,
+                    Tus_Extension=resumable.TUS_EXTENSIONS, Tus_Max_Size=uploads.max_bytes)
+
+    @app.post("/resumable-uploads")
+    def create_resumable_upload():
+        if time.time() - last_gc[0] > RESUMABLE_GC_MINUTES * 60:
+            last_gc[0] = time.time()
+            removed = uploads.collect_garbage()
+            if removed:
+                logger.info(f"Removed {removed} expired resumable upload(s)")
+        try:
+            length = int(request.headers.get("Upload-Length", ""))
+        except ValueError:
+            return _tus(jsonify({"error": "Upload-Length header is required"})), 400
+        try:
+            metadata = resumable.parse_metadata(request.headers.get("Upload-Metadata"))
+            for key in ("lat", "lng"):
+                if metadata.get(key):
+                    float(metadata[key])
+        except resumable.UploadError as err:
+            return _tus_error(err)
+        except ValueError:
+            return _tus(jsonify({"error": "Invalid coordinates"})), 400
+        filename = secure_filename(metadata.get("filename") or "")
+        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        if ext and ext not in ALLOWED_EXTENSIONS:
+            return _tus(jsonify({"error": f"Unsupported file type: {ext}"})), 400
+
+        try:
+            state = uploads.create(length, metadata)
+        except resumable.UploadError as err:
+            return _tus_error(err)
+        return _tus(app.response_class(status=201), Location=f"/resumable-uploads/{state['id']}", Upload_Offset=0,
+                    Upload_Expires=formatdate(state["expires_at"], usegmt=True))
+
+    @app.route("/resumable-uploads/<upload_id>", methods=["HEAD"])
+    def resumable_upload_offset(upload_id):
+        try:
+            state = uploads.get(upload_id)
+        except resumable.UploadError as err:
+            return _tus(app.response_class(status=err.status_code))
+        return _tus(app.response_class(status=200), Upload_Offset=state["offset"], Upload_Length=state["length"],
+                    Upload_Expires=formatdate(state["expires_at"], usegmt=True), Cache_Control="no-store")
+
+    @app.get("/resumable-uploads/<upload_id>")
+    def resumable_upload_status(upload_id):
+        """Progress and, once complete, the /predict response of the upload"""
+        try:
+            state = uploads.get(upload_id)
+        except resumable.UploadError as err:
+            return _tus_error(err)
+        return jsonify({key: state[key] for key in ("id", "state", "offset", "length", "result")}), 200
+
+    @app.patch("/resumable-uploads/<upload_id>")
+    def append_resumable_upload(upload_id):
+        if request.mimetype != "application/offset+octet-stream":
+            return _tus(jsonify({"error": "Content-Type must be application/offset+octet-stream"})), 415
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return _tus(jsonify({"error": "Upload-Offset header is required"})), 400
+        if request.content_length is None:
+            return _tus(jsonify({"error": "Content-Length header is required"})), 411
+
+        try:
+            state, completed = uploads.append(upload_id, offset, request.stream, request.content_length)
+        except resumable.UploadError as err:
+            return _tus_error(err)
+        if not completed:
+            return _tus(app.response_class(status=204), Upload_Offset=state["offset"])
+
+        metadata = state["metadata"]
+        try:
+            filename = secure_filename(metadata.get("filename") or "")
+            ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+            report_id = str(uuid.uuid4())
+            saved_filename = f"{report_id}.{ext or 'jpg'}"
+            save_path = os.path.join(UPLOAD_DIR, saved_filename)
+            shutil.move(uploads.data_path(upload_id), save_path)
+
+            latitude = float(metadata["lat"]) if metadata.get("lat") else None
+            longitude = float(metadata["lng"]) if metadata.get("lng") else None
+            result = _save_report(report_id, saved_filename, save_path, latitude, longitude)
+        except Exception as err:
+            # Don't leave the upload in 'processing': retries would get 409 until it expires
+            logger.exception(f"Resumable upload {upload_id} failed")
+            uploads.fail(upload_id, f"{type(err).__name__}: {err}")
+            return _tus(jsonify({"error": "Failed to process the upload"})), 500
+        uploads.finish(upload_id, result)
+        return _tus(jsonify(result), Upload_Offset=state["offset"]), 200
+
+    @app.delete("/resumable-uploads/<upload_id>")
+    def delete_resumable_upload(upload_id):
+        try:
+            uploads.delete(upload_id)
+        except resumable.UploadError as err:
+            return _tus_error(err)
+        return _tus(app.response_class(status=204))
 
     return app
 
@@ -1,4 +1,7 @@
+import copy
 import os
+import threading
+from collections import OrderedDict
 
 _admin = None
 _db = None
@@ -9,6 +12,9 @@ def _init_if_needed():
     global _admin, _db, _configured
     if _admin is not None:
         return
+    if os.environ.get("FIREBASE_BACKEND", "firebase").lower() == "local":
+        use_local_database()
+        return
     try:
         import firebase_admin
         from firebase_admin import credentials, db
@@ -43,3 +49,230 @@ def get_db():
 def is_configured():
     _init_if_needed()
     return _configured
+
+
+def use_local_database(database=None):
+    """
+    Serve get_db() from an in-process LocalDatabase instead of Firebase
+
+    Also selected with FIREBASE_BACKEND=local. Returns the database so tests
+    can seed it or pass their own.
+    """
+    global _admin, _db, _configured
+    _db = database if database is not None else LocalDatabase()
+    _admin = _db
+    _configured = True
+    return _db
+
+
+# ---------------------------------------------------------------------------
+# Local stand-in for firebase_admin.db
+#
+# Covers what the app uses: reference()/child(), get/set/update/delete,
+# ordered and limited queries and listen() with 'put'/'patch' events.
+# ---------------------------------------------------------------------------
+
+def _split(path):
+    return tuple(part for part in (path or "").split("/") if part)
+
+
+def _path(parts):
+    return "/" + "/".join(parts)
+
+
+def _order_rank(value):
+    """Firebase sort order: null, false, true, numbers, strings, objects"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+class LocalEvent:
+    """Same attributes as firebase_admin.db.Event"""
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class LocalListenerRegistration:
+    def __init__(self, database, entry):
+        self._database = database
+        self._entry = entry
+
+    def close(self):
+        with self._database._lock:
+            if self._entry in self._database._listeners:
+                self._database._listeners.remove(self._entry)
+
+
+class LocalDatabase:
+    """In-memory JSON tree with the firebase_admin.db reference API"""
+
+    def __init__(self, data=None):
+        self._root = copy.deepcopy(data) if data else {}
+        self._lock = threading.RLock()
+        self._listeners = []  # [(path parts, callback)]
+
+    def reference(self, path="/"):
+        return LocalReference(self, _split(path))
+
+    def _get(self, parts):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _set(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        node = self._root
+        trail = []
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                if value is None:
+                    return
+                node[part] = {}
+            trail.append((node, part))
+            node = node[part]
+        if value is None:
+            node.pop(parts[-1], None)
+            # Firebase has no empty objects: prune emptied parents
+            for parent, part in reversed(trail):
+                if parent[part]:
+                    break
+                del parent[part]
+        else:
+            node[parts[-1]] = value
+
+    def _write(self, parts, changes, event_type):
+        """Apply {relative parts: value} under parts and notify listeners"""
+        with self._lock:
+            for rel, value in changes.items():
+                self._set(parts + rel, copy.deepcopy(value))
+            listeners = list(self._listeners)
+            events = []
+            for listen_parts, callback in listeners:
+                if parts[:len(listen_parts)] == listen_parts:
+                    rel = parts[len(listen_parts):]
+                    if event_type == "put":
+                        data = copy.deepcopy(changes[()])
+                    else:
+                        data = {"/".join(k): copy.deepcopy(v) for k, v in changes.items()}
+                    events.append((callback, LocalEvent(event_type, _path(rel), data)))
+                elif listen_parts[:len(parts)] == parts:
+                    events.append((callback, LocalEvent("put", "/", copy.deepcopy(self._get(listen_parts)))))
+        for callback, event in events:
+            callback(event)
+
+    def _listen(self, parts, callback):
+        entry = (parts, callback)
+        with self._lock:
+            self._listeners.append(entry)
+            snapshot = copy.deepcopy(self._get(parts))
+        callback(LocalEvent("put", "/", snapshot))
+        return LocalListenerRegistration(self, entry)
+
+
+class LocalQuery:
+    def __init__(self, reference, order_by, child=None):
+        self._reference = reference
+        self._order_by = order_by
+        self._child = child
+        self._start = None
+        self._end = None
+        self._first = None
+        self._last = None
+
+    def start_at(self, value):
+        self._start = value
+        return self
+
+    def end_at(self, value):
+        self._end = value
+        return self
+
+    def limit_to_first(self, limit):
+        self._first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        self._last = limit
+        return self
+
+    def _value(self, key, item):
+        if self._order_by == "key":
+            return key
+        if self._order_by == "value":
+            return item
+        return item.get(self._child) if isinstance(item, dict) else None
+
+    def get(self):
+        data = self._reference.get()
+        if not isinstance(data, dict):
+            return data
+        items = sorted(data.items(), key=lambda kv: (_order_rank(self._value(*kv)), kv[0]))
+        if self._start is not None:
+            items = [kv for kv in items if _order_rank(self._value(*kv)) >= _order_rank(self._start)]
+        if self._end is not None:
+            items = [kv for kv in items if _order_rank(self._value(*kv)) <= _order_rank(self._end)]
+        if self._first is not None:
+            items = items[:self._first]
+        if self._last is not None:
+            items = items[-self._last:] if self._last else []
+        return OrderedDict(items)
+
+
+class LocalReference:
+    def __init__(self, database, parts):
+        self._database = database
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return _path(self._parts)
+
+    def child(self, path):
+        return LocalReference(self._database, self._parts + _split(path))
+
+    def get(self):
+        with self._database._lock:
+            return copy.deepcopy(self._database._get(self._parts))
+
+    def set(self, value):
+        self._database._write(self._parts, {(): value}, "put")
+
+    def update(self, value):
+        """Multi-path update: keys may be nested paths such as 'id/status'"""
+        if not value:
+            raise ValueError("Update argument must be a non-empty dictionary")
+        self._database._write(self._parts, {_split(k): v for k, v in value.items()}, "patch")
+
+    def delete(self):
+        self._database._write(self._parts, {(): None}, "put")
+
+    def listen(self, callback):
+        return self._database._listen(self._parts, callback)
+
+    def order_by_key(self):
+        return LocalQuery(self, "key")
+
+    def order_by_child(self, path):
+        return LocalQuery(self, "child", path)
+
+    def order_by_value(self):
+        return LocalQuery(self, "value")
@@ -0,0 +1,280 @@
+"""
+Write-behind queue for Firebase report writes
+
+Requests hand records to WriteBehindWriter.enqueue(), which appends them to
+an on-disk journal and returns; a background thread coalesces whatever is
+pending into one multi-path update() per batch. Failed batches stay pending
+and are retried with exponential backoff, and the journal is replayed on
+start-up so records accepted before a crash or restart are not lost.
+
+Several processes can share one journal path (the debug reloader's parent
+and child, several workers): each journals to <path>.<pid> and holds an
+flock on <path>.<pid>.lock while it runs. On start-up a writer also takes
+over the journals whose lock it can get, i.e. those of processes that have
+stopped, and sends their pending writes. Without fcntl (Windows) only the
+process's own and the unsuffixed legacy journal are replayed.
+"""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _try_lock(journal_path):
+    """Open and lock the lock file of journal_path, None if a running process holds it"""
+    fd = os.open(journal_path + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+    if fcntl is None:
+        return fd
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class WriteBehindWriter:
+    """
+    Background writer batching {key: record} writes under one Firebase reference
+
+    Args:
+        ref: reference the keys are written under (e.g. db.reference("reports"))
+        journal_path: append-only JSON lines file of accepted writes, suffixed with the pid
+        max_batch: most keys sent in one update()
+        max_wait: seconds to keep collecting after the first pending write
+        fsync: fsync the journal on every enqueue (survives power loss, not just restarts)
+    """
+
+    def __init__(self, ref, journal_path, max_batch=500, max_wait=0.05, fsync=True,
+                 backoff_base=0.5, backoff_max=60.0, compact_bytes=1024 * 1024):
+        self.ref = ref
+        self.base_path = journal_path
+        self.journal_path = f"{journal_path}.{os.getpid()}"
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.fsync = fsync
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.compact_bytes = compact_bytes
+
+        self._pending = {}   # key -> (seq, record, enqueued_at), newest write per key wins
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._journal_lock = threading.Lock()
+        self._stop = False
+        self._thread = None
+
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_flush_ms = None
+        self._flush_ms_total = 0.0
+
+        # Held for the life of the writer: tells other processes this journal is in use
+        self._lock_fd = _try_lock(self.journal_path)
+        self._replay()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _journal_paths(self):
+        """Every journal of base_path: the legacy unsuffixed one and one per process"""
+        directory, name = os.path.split(os.path.abspath(self.base_path))
+        if fcntl is None:
+            return [self.base_path, self.journal_path]
+        pattern = re.compile(re.escape(name) + r"(\.\d+)?$")
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, n) for n in sorted(names) if pattern.match(n)]
+
+    def _replay(self):
+        """Load writes accepted but not confirmed before this or another stopped process shut down"""
+        own = os.path.abspath(self.journal_path)
+        adopted = []  # (journal path, lock fd) of stopped processes
+        now = time.time()
+        for path in self._journal_paths():
+            if os.path.abspath(path) != own:
+                fd = _try_lock(path)
+                if fd is None:
+                    continue  # its process is running and sends its own writes
+                adopted.append((path, fd))
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+                    self._seq += 1
+                    self._pending[entry["key"]] = (self._seq, entry["value"], now)
+        if self._pending:
+            logger.info(f"Firebase writer replaying {len(self._pending)} journaled write(s)"
+                        f"{f', {len(adopted)} journal(s) taken over' if adopted else ''}")
+        # The adopted writes are in our journal before the others are removed
+        self._rewrite_journal()
+        for path, fd in adopted:
+            for stale in (path, path + ".tmp", path + ".lock"):
+                _remove(stale)
+            os.close(fd)
+
+    def _rewrite_journal(self):
+        """Replace the journal with just the pending writes"""
+        tmp = self.journal_path + ".tmp"
+        with self._lock:
+            entries = [{"key": k, "value": v[1]} for k, v in self._pending.items()]
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="firebase-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def enqueue(self, key, record):
+        """Accept a write: journal it and return without waiting for Firebase"""
+        line = json.dumps({"key": key, "value": record}, separators=(",", ":")) + "\n"
+        # Journal and queue under one lock so a compaction never drops an accepted write
+        with self._journal_lock:
+            try:
+                self._journal.write(line)
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+            except OSError as err:
+                logger.warning(f"Firebase writer could not journal {key}, kept in memory only: {err}")
+            with self._wakeup:
+                self._seq += 1
+                self._pending[key] = (self._seq, record, time.time())
+                self._wakeup.notify()
+        self.start()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._pending and not self._stop:
+                    self._wakeup.wait()
+                if self._stop and not self._pending:
+                    return
+            # Let concurrent requests pile into the same update()
+            if self.max_wait > 0 and not self._stop:
+                time.sleep(self.max_wait)
+            if not self.flush():
+                if self._stop:
+                    return  # still journaled, replayed on next start
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (self.consecutive_failures - 1))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def flush(self):
+        """Send up to max_batch pending writes in one update(), True if nothing failed"""
+        with self._lock:
+            batch = dict(list(self._pending.items())[:self.max_batch])
+        if not batch:
+            return True
+
+        t0 = time.perf_counter()
+        try:
+            self.ref.update({key: record for key, (_, record, _) in batch.items()})
+        except Exception as err:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(err)
+            logger.warning(f"Firebase writer failed to flush {len(batch)} write(s) "
+                           f"(attempt {self.consecutive_failures}): {err}")
+            return False
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        with self._lock:
+            for key, (seq, _, _) in batch.items():
+                # A newer write to the same key arrived meanwhile: keep that one pending
+                if key in self._pending and self._pending[key][0] == seq:
+                    del self._pending[key]
+            remaining = len(self._pending)
+        self.flushed += len(batch)
+        self.batches += 1
+        self.consecutive_failures = 0
+        self.last_flush_ms = round(elapsed_ms, 1)
+        self._flush_ms_total += elapsed_ms
+
+        self._maybe_compact(remaining)
+        return True
+
+    def _maybe_compact(self, remaining):
+        with self._journal_lock:
+            try:
+                size = self._journal.tell()
+            except (OSError, ValueError):
+                return
+            if remaining and size < self.compact_bytes:
+                return
+            self._journal.close()
+            try:
+                self._rewrite_journal()
+            finally:
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def close(self, timeout=5.0):
+        """Stop the thread after trying to drain for up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while self.depth() and self.consecutive_failures == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._wakeup:
+            self._stop = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+        with self._journal_lock:
+            self._journal.close()
+            if not self.depth():
+                # Nothing left to replay: don't leave a journal per past process behind
+                _remove(self.journal_path)
+                _remove(self.journal_path + ".lock")
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            depth = len(self._pending)
+            oldest = min((v[2] for v in self._pending.values()), default=None)
+        return {
+            "queue_depth": depth,
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "avg_batch": round(self.flushed / self.batches, 1) if self.batches else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self._flush_ms_total / self.batches, 1) if self.batches else None,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,308 @@
+"""
+Paged reads of the Firebase 'reports' node and an optional local mirror
+
+fetch_page() runs ordered, limited Firebase queries (by key or created_at)
+and returns an opaque cursor for the next page, so a request never pulls
+the whole node. Ordering by created_at needs ".indexOn": ["created_at"] on
+/reports in the database rules (database.rules.json, see the README);
+without it Firebase rejects the query and fetch_page raises MissingIndexError.
+
+ReportMirror keeps a copy of the node current from a Firebase listener
+(one snapshot, then incremental put/patch events) in memory or in a SQLite
+file and serves the same pages without a Firebase round trip.
+"""
+import base64
+import bisect
+import copy
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ORDERS = ("key", "created_at")
+
+
+class MissingIndexError(RuntimeError):
+    """Firebase refused an ordered query because the rules lack the .indexOn for it"""
+
+
+def _is_missing_index(err):
+    # Firebase answers 400 'Index not defined, add ".indexOn": "created_at", for path "/reports", to the rules'
+    return "indexOn" in str(err) or "Index not defined" in str(err)
+
+
+def _position(order_by, key, record):
+    """Sort position of a report: (key,) or (created_at, key)"""
+    if order_by == "key":
+        return (key,)
+    created_at = record.get("created_at") if isinstance(record, dict) else None
+    return (created_at or "", key)
+
+
+def encode_cursor(order_by, descending, position):
+    raw = json.dumps([order_by, bool(descending), *position], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(order_by, descending, position) of a cursor, ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        order_by, descending, *position = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if order_by not in ORDERS or len(position) != (1 if order_by == "key" else 2):
+        raise ValueError("Invalid cursor")
+    return order_by, bool(descending), tuple(position)
+
+
+def _finish(order_by, descending, rows, limit):
+    """Records of a page plus the cursor for the next one, rows holding up to limit + 1 (key, record)"""
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        key, record = page[-1]
+        next_cursor = encode_cursor(order_by, descending, _position(order_by, key, record))
+    return [record for _, record in page], next_cursor
+
+
+def fetch_page(ref, order_by="created_at", descending=True, limit=50, after=None):
+    """
+    One page of reports straight from Firebase
+
+    Args:
+        ref: reference to the reports node
+        order_by: 'key' or 'created_at'
+        descending: newest / highest first
+        limit: reports per page
+        after: position (from decode_cursor) of the last report already returned
+
+    Returns:
+        (records, next_cursor), next_cursor is None on the last page
+    """
+    # start_at/end_at are inclusive and compare only the ordered value, so
+    # fetch one extra row plus any ties with the cursor and filter them here
+    fetch = limit + 1
+    while True:
+        query = ref.order_by_key() if order_by == "key" else ref.order_by_child("created_at")
+        try:
+            if descending:
+                if after is not None:
+                    query = query.end_at(after[0])
+                items = list(reversed(list((query.limit_to_last(fetch).get() or {}).items())))
+            else:
+                if after is not None:
+                    query = query.start_at(after[0])
+                items = list((query.limit_to_first(fetch).get() or {}).items())
+        except Exception as err:
+            if _is_missing_index(err):
+                raise MissingIndexError(f'No ".indexOn" for {order_by} on /reports, deploy database.rules.json') from err
+            raise
+
+        rows = items
+        if after is not None:
+            rows = [(k, v) for k, v in items
+                    if (_position(order_by, k, v) < after if descending else _position(order_by, k, v) > after)]
+        if len(rows) > limit or len(items) < fetch:
+            return _finish(order_by, descending, rows, limit)
+        fetch *= 2
+
+
+class MemoryStore:
+    """Reports in a dict with sorted position lists for paging"""
+
+    def __init__(self):
+        self._records = {}
+        self._index = {order_by: [] for order_by in ORDERS}
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key):
+        return self._records.get(key)
+
+    def replace_all(self, records):
+        self._records = dict(records)
+        for order_by in ORDERS:
+            self._index[order_by] = sorted(_position(order_by, k, v) for k, v in self._records.items())
+
+    def put(self, key, record):
+        """Insert, replace or (record None) remove one report"""
+        previous = self._records.pop(key, None)
+        for order_by, index in self._index.items():
+            if previous is not None:
+                i = bisect.bisect_left(index, _position(order_by, key, previous))
+                del index[i]
+            if record is not None:
+                bisect.insort(index, _position(order_by, key, record))
+        if record is not None:
+            self._records[key] = record
+
+    def page(self, order_by, descending, limit, after):
+        index = self._index[order_by]
+        if descending:
+            end = len(index) if after is None else bisect.bisect_left(index, after)
+            positions = reversed(index[max(0, end - limit - 1):end])
+        else:
+            start = 0 if after is None else bisect.bisect_right(index, after)
+            positions = index[start:start + limit + 1]
+        return [(p[-1], self._records[p[-1]]) for p in positions]
+
+
+class SQLiteStore:
+    """Reports in a SQLite file, so a restart can serve pages before the next snapshot"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS reports (
+                key TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                record TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_reports_created_at ON reports (created_at, key)")
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def get(self, key):
+        row = self._conn.execute("SELECT record FROM reports WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _row(self, key, record):
+        return key, _position("created_at", key, record)[0], json.dumps(record, separators=(",", ":"))
+
+    def replace_all(self, records):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM reports")
+            self._conn.executemany("INSERT INTO reports VALUES (?, ?, ?)",
+                                   (self._row(k, v) for k, v in records.items()))
+
+    def put(self, key, record):
+        if record is None:
+            self._conn.execute("DELETE FROM reports WHERE key = ?", (key,))
+        else:
+            self._conn.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?)", self._row(key, record))
+
+    def page(self, order_by, descending, limit, after):
+        columns = "key" if order_by == "key" else "created_at, key"
+        direction = "DESC" if descending else "ASC"
+        where = ""
+        params = []
+        if after is not None:
+            placeholders = ", ".join("?" * len(after))
+            where = f"WHERE ({columns}) {'<' if descending else '>'} ({placeholders})"
+            params.extend(after)
+        order = ", ".join(f"{c} {direction}" for c in columns.split(", "))
+        rows = self._conn.execute(
+            f"SELECT key, record FROM reports {where} ORDER BY {order} LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+        return [(key, json.loads(record)) for key, record in rows]
+
+
+class ReportMirror:
+    """
+    Local copy of a Firebase node kept current by a listener
+
+    Pages are served from the store once the listener's first snapshot has
+    arrived (ready); until then callers should read from Firebase.
+    """
+
+    def __init__(self, ref, store=None):
+        self.ref = ref
+        self.store = store if store is not None else MemoryStore()
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._registration = None
+        self.events = 0
+        self.last_event_at = None
+
+    def start(self):
+        """Register the listener; Firebase delivers the first snapshot from its own thread"""
+        self._registration = self.ref.listen(self._on_event)
+        return self
+
+    def stop(self):
+        if self._registration is not None:
+            self._registration.close()
+            self._registration = None
+        self.ready.clear()
+
+    def apply(self, key, record):
+        """Apply a write this process made, so it is readable before the listener echoes it"""
+        with self._lock:
+            self.store.put(key, record)
+
+    def _on_event(self, event):
+        try:
+            with self._lock:
+                self._apply_event(event.event_type, [p for p in (event.path or "").split("/") if p], event.data)
+            self.events += 1
+            self.last_event_at = time.time()
+        except Exception as err:
+            logger.warning(f"Report mirror failed to apply {event.event_type} at {event.path}: {err}")
+            return
+        if not self.ready.is_set() and event.event_type == "put" and event.path in ("/", ""):
+            logger.info(f"Report mirror loaded {len(self.store)} reports")
+            self.ready.set()
+
+    def _apply_event(self, event_type, parts, data):
+        if not parts:
+            if event_type == "put":
+                self.store.replace_all(data if isinstance(data, dict) else {})
+            else:
+                # Multi-path patch: each key may itself be a nested path
+                for path, value in (data or {}).items():
+                    self._apply_event("put", [p for p in path.split("/") if p], value)
+            return
+
+        key, nested = parts[0], parts[1:]
+        if not nested:
+            if event_type == "put":
+                self.store.put(key, data)
+                return
+            record = copy.deepcopy(self.store.get(key)) or {}
+            for path, value in (data or {}).items():
+                _set_path(record, [p for p in path.split("/") if p], value)
+            self.store.put(key, record or None)
+            return
+
+        record = copy.deepcopy(self.store.get(key)) or {}
+        if event_type == "put":
+            _set_path(record, nested, data)
+        else:
+            for path, value in (data or {}).items():
+                _set_path(record, nested + [p for p in path.split("/") if p], value)
+        self.store.put(key, record or None)
+
+    def page(self, order_by="created_at", descending=True, limit=50, after=None):
+        """Same contract as fetch_page(), served from the store"""
+        with self._lock:
+            rows = self.store.page(order_by, descending, limit, after)
+        return _finish(order_by, descending, rows, limit)
+
+    def stats(self):
+        return {
+            "ready": self.ready.is_set(),
+            "reports": len(self.store),
+            "events": self.events,
+            "last_event_at": self.last_event_at,
+        }
+
+
+def _set_path(node, parts, value):
+    for part in parts[:-1]:
+        if not isinstance(node.get(part), dict):
+            node[part] = {}
+        node = node[part]
+    if value is None:
+        node.pop(parts[-1], None)
+    else:
+        node[parts[-1]] = value
@@ -0,0 +1,226 @@
+"""
+Resumable uploads (tus 1.0 core protocol + creation/termination/expiration)
+
+Chunks PATCHed at the current offset are appended to a staging file next to
+a JSON state file, so an upload interrupted by a dropped connection resumes
+from the last byte received instead of starting over.
+"""
+import base64
+import json
+import os
+import re
+import time
+import uuid
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination,expiration"
+
+STATE_UPLOADING = "uploading"
+STATE_PROCESSING = "processing"
+STATE_COMPLETE = "complete"
+STATE_FAILED = "failed"
+
+LOCK_STALE_SECONDS = 600
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """Protocol error with the HTTP status to answer with"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def parse_metadata(header):
+    """Upload-Metadata ('key base64value,key2 ...') to a dict of strings"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value).decode("utf-8") if value else ""
+        except ValueError:
+            raise UploadError(400, f"Invalid Upload-Metadata value for '{key}'")
+    return metadata
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadStore:
+    """Staged uploads under root, safe to share between worker processes"""
+
+    def __init__(self, root, max_bytes, expiry_seconds):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.expiry_seconds = expiry_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, upload_id):
+        if not _ID_RE.match(upload_id or ""):
+            raise UploadError(404, "Upload not found")
+        base = os.path.join(self.root, upload_id)
+        return base + ".json", base + ".part", base + ".lock"
+
+    def data_path(self, upload_id):
+        return self._paths(upload_id)[1]
+
+    def _write_state(self, state):
+        state_path = self._paths(state["id"])[0]
+        state = {k: v for k, v in state.items() if k != "offset"}
+        with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(state_path + ".tmp", state_path)
+
+    def get(self, upload_id):
+        state_path, data_path, _ = self._paths(upload_id)
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            raise UploadError(404, "Upload not found")
+        if state["expires_at"] < time.time():
+            raise UploadError(410, "Upload expired")
+        if state["state"] == STATE_UPLOADING:
+            state["offset"] = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        else:
+            state["offset"] = state["length"]
+        return state
+
+    def create(self, length, metadata):
+        if length < 1:
+            raise UploadError(400, "Upload-Length must be positive")
+        if length > self.max_bytes:
+            raise UploadError(413, f"Upload-Length exceeds the {self.max_bytes} byte limit")
+        now = time.time()
+        state = {
+            "id": uuid.uuid4().hex,
+            "length": length,
+            "metadata": metadata,
+            "state": STATE_UPLOADING,
+            "expires_at": now + self.expiry_seconds,
+            "result": None,
+        }
+        open(self.data_path(state["id"]), "wb").close()
+        self._write_state(state)
+        return {**state, "offset": 0}
+
+    def _lock(self, upload_id):
+        path = self._paths(upload_id)[2]
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS
+            except FileNotFoundError:
+                stale = True
+            if not stale:
+                raise UploadError(423, "Upload is being written by another request")
+            _remove(path)
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        return path
+
+    def append(self, upload_id, offset, stream, length):
+        """
+        Append length bytes read from stream at offset
+
+        Returns:
+            tuple: (state, completed) - with completed the caller processes
+                   data_path(upload_id) and then calls finish()
+        """
+        lock_path = self._lock(upload_id)
+        try:
+            state = self.get(upload_id)
+            if state["state"] != STATE_UPLOADING:
+                raise UploadError(409, f"Upload is already {state['state']}")
+            if offset != state["offset"]:
+                raise UploadError(409, f"Upload-Offset {offset} does not match the current offset {state['offset']}")
+            if offset + length > state["length"]:
+                raise UploadError(413, "Chunk runs past Upload-Length")
+
+            with open(self.data_path(upload_id), "ab") as f:
+                # Keep what arrived even if the connection drops mid-chunk
+                remaining = length
+                while remaining > 0:
+                    block = stream.read(min(remaining, 64 * 1024))
+                    if not block:
+                        break
+                    f.write(block)
+                    remaining -= len(block)
+                f.flush()
+                os.fsync(f.fileno())
+            state["offset"] = os.path.getsize(self.data_path(upload_id))
+
+            completed = state["offset"] == state["length"]
+            if completed:
+                state["state"] = STATE_PROCESSING
+                state["processing_at"] = time.time()
+                self._write_state(state)
+            return state, completed
+        finally:
+            _remove(lock_path)
+
+    def finish(self, upload_id, result):
+        """Record the response of the completed upload and drop the staged bytes"""
+        state = self.get(upload_id)
+        state.update(state=STATE_COMPLETE, result=result)
+        self._write_state(state)
+        _remove(self.data_path(upload_id))
+
+    def fail(self, upload_id, message):
+        """Record that processing the completed upload failed and drop the staged bytes"""
+        state = self.get(upload_id)
+        state.update(state=STATE_FAILED, result={"error": message})
+        self._write_state(state)
+        _remove(self.data_path(upload_id))
+
+    def delete(self, upload_id):
+        lock_path = self._lock(upload_id)
+        try:
+            self.get(upload_id)
+            for path in self._paths(upload_id)[:2]:
+                _remove(path)
+        finally:
+            _remove(lock_path)
+
+    def collect_garbage(self, now=None):
+        """
+        Remove expired uploads and orphaned staging files, returns the number of uploads removed
+
+        Uploads still processing after LOCK_STALE_SECONDS lost their process
+        and are marked failed, so the client uploads the image again.
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        for entry in os.scandir(self.root):
+            upload_id, _, ext = entry.name.partition(".")
+            if not _ID_RE.match(upload_id):
+                continue
+            state_path = self._paths(upload_id)[0]
+            if ext == "json":
+                try:
+                    with open(state_path, encoding="utf-8") as f:
+                        state = json.load(f)
+                    expired = state["expires_at"] < now
+                except (OSError, ValueError, KeyError):
+                    expired = True
+                if expired:
+                    for path in self._paths(upload_id):
+                        _remove(path)
+                    removed += 1
+                elif (state["state"] == STATE_PROCESSING
+                      and now - state.get("processing_at", state["expires_at"] - self.expiry_seconds) > LOCK_STALE_SECONDS):
+                    self.fail(upload_id, "Processing was interrupted, upload the image again")
+            elif not os.path.exists(state_path) and now - entry.stat().st_mtime > LOCK_STALE_SECONDS:
+                _remove(entry.path)
+        return removed
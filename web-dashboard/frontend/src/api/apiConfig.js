@@ -20,8 +20,10 @@ export const API_ENDPOINTS = {
   REPORTS: "/reports",
   REPORT_BY_ID: (id) => `/reports/${id}`,
   REPORTS_IN_AREA: "/reports-in-area",
+  REPORTS_NEARBY: "/reports/nearby",
   UPLOAD_REPORT: "/upload-report",
   UPLOADS: (filename) => `/uploads/${filename}`,
+  TILES: "/tiles/{z}/{x}/{y}.mvt",
 };
 
 /**
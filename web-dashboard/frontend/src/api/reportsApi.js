@@ -65,6 +65,9 @@ async function apiFetch(url, options = {}, retryCount = 0) {
   const fetchOptions = {
     ...options,
     headers,
+    // Send the API's last_write cookie back, so our own writes are read from the
+    // primary instead of a lagging replica (no custom header: GETs stay simple requests)
+    credentials: "include",
   };
 
   try {
@@ -374,8 +377,60 @@ export async function fetchReportsInArea(bbox) {
   }
 }
 
+/**
+ * Fetch the reports closest to a point, nearest first
+ * @param {number} lat - Latitude
+ * @param {number} lon - Longitude
+ * @param {Object} [options]
+ * @param {number} [options.radiusM] - Only reports within this many metres
+ * @param {number} [options.limit=20] - Maximum number of reports
+ * @param {string} [options.status] - Filter by status
+ * @returns {Promise<Array>} Normalized reports, each with distance_m
+ */
+export async function fetchNearbyReports(lat, lon, { radiusM, limit = 20, status } = {}) {
+  if (lat == null || lon == null || isNaN(lat) || isNaN(lon)) {
+    throw new Error("Invalid location: lat and lon are required");
+  }
+
+  try {
+    const params = new URLSearchParams({
+      lat: String(lat),
+      lon: String(lon),
+      limit: String(limit),
+    });
+    if (radiusM != null) params.set("radius_m", String(radiusM));
+    if (status) params.set("status", status);
+
+    const result = await apiFetch(`${BASE_URL}/reports/nearby?${params.toString()}`, {
+      method: "GET",
+    });
+
+    return normalizeReports(result.data || []);
+  } catch (error) {
+    console.error("Failed to fetch nearby reports:", error);
+    throw new Error(`Failed to fetch nearby reports: ${error.message}`);
+  }
+}
+
+/**
+ * Generate an Idempotency-Key for one logical upload
+ * @returns {string} Random UUID
+ */
+function createIdempotencyKey() {
+  if (typeof crypto !== "undefined" && crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  // Fallback for non-secure contexts where randomUUID is unavailable
+  return "xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx".replace(/[xy]/g, (c) => {
+    const r = (Math.random() * 16) | 0;
+    return (c === "x" ? r : (r & 0x3) | 0x8).toString(16);
+  });
+}
+
 /**
  * Upload report
+ * The same Idempotency-Key is sent on every retry, so a retry after a lost
+ * response returns the original report instead of creating a duplicate.
  * @param {FormData} formData - FormData containing image and metadata
  * @returns {Promise<Object>} Normalized report object
  */
@@ -388,6 +443,7 @@ export async function uploadReport(formData) {
     const result = await apiFetch(`${BASE_URL}/upload-report`, {
       method: "POST",
       body: formData,
+      headers: { "Idempotency-Key": createIdempotencyKey() },
       // Don't set Content-Type header - browser will set it with boundary for FormData
     });
 
@@ -426,6 +482,26 @@ export function getImageUrl(imagePath) {
   return `${baseUrl}${path}`;
 }
 
+/**
+ * Get the URL of a resized rendition of an image
+ * Maps /uploads/<name> and /annotated/<name> to /media/<kind>/<size>/<name>
+ * @param {string} imagePath - image_path or boxed_image_path from API
+ * @param {string} size - "thumb" (160px) or "medium" (640px)
+ * @returns {string|null} Full image URL or null if invalid
+ */
+export function getDerivativeUrl(imagePath, size = "thumb") {
+  if (!imagePath || typeof imagePath !== "string") {
+    return null;
+  }
+
+  const match = imagePath.match(/^\/?(uploads|annotated)\/(.+)$/);
+  if (!match) {
+    return getImageUrl(imagePath);
+  }
+
+  return getImageUrl(`/media/${match[1]}/${size}/${match[2]}`);
+}
+
 /**
  * Update report status
  * @param {number|string} id - Report ID
@@ -446,6 +522,26 @@ export async function updateReportStatus(id, status) {
   }
 }
 
+/**
+ * Update the status of many reports in one request
+ * @param {Array<number>} ids - Report IDs
+ * @param {string} status - New status
+ * @returns {Promise<Object>} Per-report outcomes ({report_id, outcome})
+ */
+export async function bulkUpdateReportStatus(ids, status) {
+  try {
+    const result = await apiFetch(`${BASE_URL}/reports/bulk-status`, {
+      method: "PATCH",
+      body: JSON.stringify({ report_ids: ids, status }),
+    });
+
+    return result.data;
+  } catch (error) {
+    console.error("Failed to bulk update report status:", error);
+    throw new Error(`Failed to bulk update report status: ${error.message}`);
+  }
+}
+
 /**
  * Get API base URL
  * @returns {string}
@@ -1,5 +1,5 @@
 import StatusBadge from "./StatusBadge";
-import { getImageUrl } from "../api/reportsApi";
+import { getImageUrl, getDerivativeUrl } from "../api/reportsApi";
 import { convertUTCtoIST } from "../utils/timezone";
 
 import SecureImage from "./SecureImage";
@@ -38,7 +38,7 @@ export default function ReportModal({ report, onClose, loading }) {
                                         <div className="relative group mb-4">
                                             <p className="text-xs text-gray-500 mb-1">Detected Object:</p>
                                             <SecureImage
-                                                src={report.boxed_image_path}
+                                                src={getDerivativeUrl(report.boxed_image_path, "medium")}
                                                 alt="Detected Processed Image"
                                                 className="w-full h-auto rounded-lg border border-green-500/50 shadow-md object-cover"
                                                 onError={(e) => (e.target.style.display = "none")}
@@ -50,7 +50,7 @@ export default function ReportModal({ report, onClose, loading }) {
                                         <div className="relative group">
                                             {report.boxed_image_path && <p className="text-xs text-gray-500 mb-1">Original Image:</p>}
                                             <SecureImage
-                                                src={report.image_path}
+                                                src={getDerivativeUrl(report.image_path, "medium")}
                                                 alt="Report Evidence"
                                                 className="w-full h-auto rounded-lg border border-gray-600 shadow-md object-cover transition duration-300 group-hover:scale-[1.02]"
                                                 onError={(e) => {
@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { fetchAllReports, getImageUrl } from "../api/reportsApi";
+import { fetchAllReports, getDerivativeUrl } from "../api/reportsApi";
 import eventBus from "../data/eventBus";
 import { useRefresh } from "../context/RefreshContext.jsx";
 import { convertUTCtoIST, getISTDateKey } from "../utils/timezone";
@@ -122,14 +122,14 @@ export default function DashboardHome() {
                     <div className="w-10 h-10 bg-gray-700 rounded overflow-hidden border border-gray-600">
                       {r.boxed_image_path ? (
                         <img
-                          src={getImageUrl(r.boxed_image_path)}
+                          src={getDerivativeUrl(r.boxed_image_path, "thumb")}
                           alt="Boxed"
                           className="w-full h-full object-cover"
                           onError={(e) => { e.target.style.display = 'none'; }}
                         />
                       ) : r.image_path ? (
                         <img
-                          src={getImageUrl(r.image_path)}
+                          src={getDerivativeUrl(r.image_path, "thumb")}
                           alt="Thumb"
                           className="w-full h-full object-cover"
                           onError={(e) => { e.target.style.display = 'none'; }}
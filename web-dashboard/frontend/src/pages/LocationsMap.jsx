@@ -8,7 +8,7 @@ import MarkerClusterGroup from "@changey/react-leaflet-markercluster";
 import "leaflet.markercluster/dist/MarkerCluster.css";
 import "leaflet.markercluster/dist/MarkerCluster.Default.css";
 
-import { fetchAllReports, getImageUrl } from "../api/reportsApi";
+import { fetchAllReports, getDerivativeUrl } from "../api/reportsApi";
 import { useEffect, useState, useRef } from "react";
 import eventBus from "../data/eventBus";
 import { useRefresh } from "../context/RefreshContext.jsx";
@@ -212,7 +212,7 @@ export default function LocationsMap() {
                     <div className="mb-2 w-full h-32 bg-gray-200 rounded overflow-hidden">
                       <b>Detected Image:</b> <br />
                       <img
-                        src={getImageUrl(p.boxed_image_path)}
+                        src={getDerivativeUrl(p.boxed_image_path, "medium")}
                         alt="Detection preview"
                         className="w-full h-full object-cover rounded border border-gray-400"
                         onError={(e) => { e.target.style.display = 'none'; }}
@@ -221,7 +221,7 @@ export default function LocationsMap() {
                   ) : p.image_path ? (
                     <div className="mb-2 w-full h-32 bg-gray-200 rounded overflow-hidden">
                       <img
-                        src={getImageUrl(p.image_path)}
+                        src={getDerivativeUrl(p.image_path, "medium")}
                         alt="Report"
                         className="w-full h-full object-cover"
                         onError={(e) => { e.target.style.display = 'none'; }}
@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { fetchAllReports, fetchReportsByStatus, fetchReportById, getImageUrl } from "../api/reportsApi";
+import { fetchAllReports, fetchReportsByStatus, fetchReportById, getDerivativeUrl } from "../api/reportsApi";
 import eventBus from "../data/eventBus";
 import { useRefresh } from "../context/RefreshContext.jsx";
 import { convertUTCtoIST } from "../utils/timezone";
@@ -160,7 +160,7 @@ export default function Reports() {
                       <div className="w-12 h-12 bg-gray-700 rounded overflow-hidden border border-gray-600">
                         {r.boxed_image_path ? (
                           <img
-                            src={getImageUrl(r.boxed_image_path)}
+                            src={getDerivativeUrl(r.boxed_image_path, "thumb")}
                             alt="Boxed"
                             className="w-full h-full object-cover"
                             loading="lazy"
@@ -168,7 +168,7 @@ export default function Reports() {
                           />
                         ) : r.image_path ? (
                           <img
-                            src={getImageUrl(r.image_path)}
+                            src={getDerivativeUrl(r.image_path, "thumb")}
                             alt="Thumb"
                             className="w-full h-full object-cover"
                             loading="lazy"